@@ -0,0 +1,178 @@
+"""Asynchronous, batched writer for ``advise_logs``.
+
+``/advise`` hands its telemetry row to ``AdviseLogWriter.log`` and returns; nothing on the
+request path touches the database. Rows wait in a bounded in-process queue
+(``ADVISE_LOG_QUEUE_MAX``) and a background thread COPYs them to ``advise_logs`` once
+``ADVISE_LOG_BATCH`` rows are pending or ``ADVISE_LOG_FLUSH_MS`` has passed since the
+oldest one arrived. ``asked_at`` is taken at enqueue time (naive UTC, which is how readers
+compare it: ``NOW() AT TIME ZONE 'UTC'``), so batching does not skew it. The connection uses
+the same ``DB_*`` settings as the API's ``db()``.
+
+When the queue is full (DB slow or down) new rows are dropped and counted; a batch whose
+COPY fails is dropped too, as the old best-effort insert did. The queue is drained on
+shutdown. Metrics:
+
+- ``advise_log_latency_seconds`` (enqueue -> committed), ``advise_log_flush_seconds``
+- ``advise_log_written_total``, ``advise_log_dropped_total{reason}`` (``queue_full``, ``db_error``)
+- ``advise_log_queue_depth`` gauge
+"""
+from __future__ import annotations
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import psycopg
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+ADVISE_LOG_BATCH = int(os.getenv("ADVISE_LOG_BATCH", "200"))
+ADVISE_LOG_FLUSH_MS = int(os.getenv("ADVISE_LOG_FLUSH_MS", "500"))
+ADVISE_LOG_QUEUE_MAX = int(os.getenv("ADVISE_LOG_QUEUE_MAX", "10000"))
+ADVISE_LOG_ENABLED = os.getenv("ADVISE_LOG", "1") == "1"
+
+# (enqueued monotonic, asked_at, user_query, name, signature, intent, success, notes)
+Row = Tuple[float, datetime, Optional[str], Optional[str], Optional[str], Optional[str], bool, Optional[str]]
+_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class AdviseLogWriter:
+    def __init__(
+        self,
+        db_url: Optional[str] = None,
+        batch_size: int = ADVISE_LOG_BATCH,
+        flush_ms: int = ADVISE_LOG_FLUSH_MS,
+        queue_max: int = ADVISE_LOG_QUEUE_MAX,
+        start: bool = True,
+    ):
+        self.db_url = db_url
+        self.batch_size = max(1, batch_size)
+        self.flush_sec = flush_ms / 1000
+        self._q: "queue.Queue[Row]" = queue.Queue(maxsize=queue_max)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if start:
+            self._thread = threading.Thread(target=self._run, name="advise-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def log(self, user_query: Optional[str], name: Optional[str], signature: Optional[str],
+            intent: Optional[str], success: bool = True, notes: Optional[str] = None) -> bool:
+        """Enqueue one row without blocking; False (and a drop count) when the queue is full."""
+        asked_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        try:
+            self._q.put_nowait((time.monotonic(), asked_at, user_query, name, signature, intent, success, notes))
+        except queue.Full:
+            metrics.inc("advise_log_dropped_total", {"reason": "queue_full"})
+            return False
+        return True
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+    def _take(self, first_timeout: Optional[float]) -> List[Row]:
+        """Wait up to ``first_timeout`` for a row (None: do not wait), then collect until the
+        batch is full or, while running, until the oldest row has waited ``flush_sec``."""
+        try:
+            first = self._q.get(timeout=first_timeout) if first_timeout else self._q.get_nowait()
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first[0] + self.flush_sec if first_timeout else 0.0
+        while len(batch) < self.batch_size:
+            wait = deadline - time.monotonic()
+            try:
+                batch.append(self._q.get(timeout=wait) if wait > 0 and not self._stop.is_set() else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _connect(self) -> psycopg.Connection:
+        if self.db_url:
+            return psycopg.connect(self.db_url, connect_timeout=5)
+        return psycopg.connect(
+            host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
+            dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+            connect_timeout=5,
+        )
+
+    def _write(self, batch: List[Row]) -> int:
+        t0 = time.perf_counter()
+        try:
+            with self._connect() as cx, cx.cursor() as cur:
+                with cur.copy(
+                    "COPY advise_logs (asked_at, user_query, name, signature, intent, success, notes) FROM STDIN"
+                ) as cp:
+                    for row in batch:
+                        cp.write_row(row[1:])
+        except Exception as e:
+            log.warning("advise_logs flush failed (%s rows dropped): %s", len(batch), e)
+            metrics.inc("advise_log_dropped_total", {"reason": "db_error"}, len(batch))
+            return 0
+        done = time.monotonic()
+        metrics.observe("advise_log_flush_seconds", time.perf_counter() - t0)
+        for row in batch:
+            metrics.observe("advise_log_latency_seconds", done - row[0], buckets=_LATENCY_BUCKETS)
+        metrics.inc("advise_log_written_total", value=len(batch))
+        return len(batch)
+
+    def flush(self) -> int:
+        """Write everything queued right now (used on shutdown and in tests)."""
+        written = 0
+        while True:
+            batch = self._take(None)
+            if not batch:
+                break
+            written += self._write(batch)
+        metrics.set_gauge("advise_log_queue_depth", self._q.qsize())
+        return written
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._take(0.5)
+            metrics.set_gauge("advise_log_queue_depth", self._q.qsize())
+            if batch:
+                self._write(batch)
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self.flush()
+
+
+class _NullWriter(AdviseLogWriter):
+    def __init__(self):
+        super().__init__(db_url="", start=False)
+
+    def log(self, *args, **kwargs) -> bool:
+        return False
+
+
+_WRITER: Optional[AdviseLogWriter] = None
+_LOCK = threading.Lock()
+
+
+def get_advise_log_writer() -> AdviseLogWriter:
+    """Process-wide writer, started on first use (a no-op one with ``ADVISE_LOG=0``)."""
+    global _WRITER
+    if _WRITER is None:
+        with _LOCK:
+            if _WRITER is None:
+                _WRITER = AdviseLogWriter() if ADVISE_LOG_ENABLED else _NullWriter()
+    return _WRITER
+
+
+def close_advise_log_writer() -> None:
+    """Drain and stop the writer if one was started (API shutdown)."""
+    if _WRITER is not None:
+        _WRITER.close()
+
+
+__all__ = ["AdviseLogWriter", "get_advise_log_writer", "close_advise_log_writer"]
@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional, List
 from .monograph_service import compose_for_signature
 from . import dbio
+from .profiling import stage
 import time
 
 _CACHE: dict[str, tuple[float, dict]] = {}
@@ -67,19 +68,35 @@ def build_cheaper_text(sig: str, salts: List[str], alt: Dict[str, Any]) -> str:
     return " ".join(p for p in parts if p)
 
 def advise_for(signature: str, brand_name: Optional[str], intent: str, red_flag: bool) -> Dict[str, Any]:
-    salts = dbio.get_salts(signature)
+    with stage("advise.salts"):
+        salts = dbio.get_salts(signature)
     salt_names = [s["salt_name"] for s in salts] if salts else []
 
-    try:
-        mono = compose_for_signature(salt_names) or {"sections": {}, "sources": []}
-    except Exception:
-        mono = {"sections": {}, "sources": []}
-    monosec = mono.get("sections", {})
+    with stage("advise.monograph"):
+        try:
+            mono = compose_for_signature(salt_names) or {"sections": {}, "sources": []}
+        except Exception:
+            mono = {"sections": {}, "sources": []}
 
-    alt = _cache_get(f"alt:{signature}")
-    if not alt:
-        alt = dbio.get_alternatives(signature)
-        _cache_put(f"alt:{signature}", alt)
+    with stage("advise.alternatives"):
+        alt = _cache_get(f"alt:{signature}")
+        if not alt:
+            alt = dbio.get_alternatives(signature)
+            _cache_put(f"alt:{signature}", alt)
+
+    return advise_from(signature, brand_name, intent, red_flag, salt_names, mono, alt)
+
+def advise_from(
+    signature: str,
+    brand_name: Optional[str],
+    intent: str,
+    red_flag: bool,
+    salt_names: List[str],
+    mono: Dict[str, Any],
+    alt: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Build the deterministic answer from already-fetched salts, monograph and alternatives."""
+    monosec = mono.get("sections") or {}
 
     if red_flag and intent in ("how_to_take", "precautions", "summary", "uses", "side_effects"):
         core_text = (
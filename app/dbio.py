@@ -1,14 +1,20 @@
-import os, psycopg
-from typing import Any, Dict, List, Optional
+import os, re, logging, statistics, psycopg
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from . import metrics
+from .profiling import ProfiledCursor
+
+log = logging.getLogger(__name__)
 
 
 def db():
     return psycopg.connect(
         host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS")
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        cursor_factory=ProfiledCursor,
     )
 
 
+@metrics.timer("db_query_seconds", {"query": "dbio.get_signature_by_name"})
 def get_signature_by_name(name: str) -> Optional[str]:
     like = f"%{name}%"
     with db() as conn, conn.cursor() as cur:
@@ -25,22 +31,187 @@ def get_signature_by_name(name: str) -> Optional[str]:
         return row[0] if row else None
 
 
+@metrics.timer("db_query_seconds", {"query": "dbio.get_salts"})
 def get_salts(sig: str) -> List[Dict[str, Any]]:
-    with db() as conn, conn.cursor() as cur:
+    with db() as conn:
+        salts = signature_salts(conn, sig)
+        if salts is not None:
+            return salts
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+              SELECT ps.salt_name, ps.salt_pos
+              FROM products_in p JOIN product_salts ps ON ps.product_id = p.id
+              WHERE p.salt_signature=%s ORDER BY ps.salt_pos, ps.salt_name
+            """,
+                (sig,),
+            )
+            rows = cur.fetchall()
+    # Same shape as the signatures row: first spelling per (normalized name, pos)
+    return dedup_salt_rows(rows)
+
+
+_WS = re.compile(r"\s+")
+
+
+def dedup_salt_rows(rows: Iterable[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """One entry per case/whitespace-normalized name at its lowest position, whitespace collapsed.
+
+    Products listing the same combo in a different order (Paracetamol+Caffeine vs
+    Caffeine+Paracetamol) must not list a salt twice; on ties the first spelling wins.
+    Ordered by (salt_pos, salt_name).
+    """
+    best: Dict[str, Tuple[int, str]] = {}
+    for name, pos in rows:
+        clean = _WS.sub(" ", name.strip())
+        key = clean.lower()
+        if key not in best or pos < best[key][0]:
+            best[key] = (pos, clean)
+    return [{"salt_pos": pos, "salt_name": clean} for pos, clean in sorted(best.values())]
+
+
+def signature_salts(conn, sig: str) -> Optional[List[Dict[str, Any]]]:
+    """Canonical salt list from ``signatures`` (primary-key lookup).
+
+    None when the signature has no row yet, or the table does not exist (schema chunk not
+    applied); callers then fall back to the products_in/product_salts join.
+    """
+    try:
+        row = conn.execute("SELECT salts FROM signatures WHERE salt_signature=%s", (sig,)).fetchone()
+    except psycopg.errors.UndefinedTable:
+        conn.rollback()
+        metrics.inc("signature_lookup_total", {"result": "no_table"})
+        return None
+    metrics.inc("signature_lookup_total", {"result": "hit" if row else "miss"})
+    return row[0] if row else None
+
+
+# Same canonical list as dedup_salt_rows: one entry per case-folded, whitespace-collapsed
+# name at its lowest salt_pos (first spelling by salt_name on ties), ordered by (salt_pos, salt_name).
+_REFRESH_SIGNATURES_SQL = r"""
+WITH salts AS (
+  SELECT salt_signature,
+         jsonb_agg(jsonb_build_object('salt_pos', salt_pos, 'salt_name', clean) ORDER BY salt_pos, clean COLLATE "C") AS salts
+  FROM (
+    SELECT DISTINCT ON (p.salt_signature, lower(n.clean))
+           p.salt_signature, ps.salt_pos, ps.salt_name, n.clean
+    FROM products_in p
+    JOIN product_salts ps ON ps.product_id = p.id
+    CROSS JOIN LATERAL (SELECT btrim(regexp_replace(ps.salt_name, '\s+', ' ', 'g')) AS clean) n
+    WHERE p.salt_signature IS NOT NULL {scope}
+    ORDER BY p.salt_signature, lower(n.clean), ps.salt_pos, ps.salt_name
+  ) d
+  GROUP BY salt_signature
+), prod AS (
+  SELECT p.salt_signature,
+         count(*) AS product_count,
+         min(p.rxcuis) AS rxcuis,  -- identical across a signature (it is built from them)
+         min(p.mrp_inr) AS min_mrp,
+         percentile_cont(0.5) WITHIN GROUP (ORDER BY p.mrp_inr) AS median_mrp,
+         max(p.mrp_inr) AS max_mrp
+  FROM products_in p
+  WHERE p.salt_signature IS NOT NULL {scope}
+  GROUP BY p.salt_signature
+)
+INSERT INTO signatures AS s (salt_signature, salts, rxcuis, product_count, min_mrp, median_mrp, max_mrp)
+SELECT prod.salt_signature, COALESCE(salts.salts, '[]'::jsonb), prod.rxcuis, prod.product_count,
+       prod.min_mrp, round(prod.median_mrp::numeric, 2), prod.max_mrp
+FROM prod LEFT JOIN salts USING (salt_signature)
+ON CONFLICT (salt_signature) DO UPDATE SET
+  salts = EXCLUDED.salts, rxcuis = EXCLUDED.rxcuis, product_count = EXCLUDED.product_count,
+  min_mrp = EXCLUDED.min_mrp, median_mrp = EXCLUDED.median_mrp, max_mrp = EXCLUDED.max_mrp, updated_at = now()
+WHERE (s.salts, s.rxcuis, s.product_count, s.min_mrp, s.median_mrp, s.max_mrp)
+  IS DISTINCT FROM (EXCLUDED.salts, EXCLUDED.rxcuis, EXCLUDED.product_count, EXCLUDED.min_mrp, EXCLUDED.median_mrp, EXCLUDED.max_mrp)
+"""
+
+
+def refresh_signatures(conn, signatures: Optional[Iterable[str]] = None) -> Tuple[int, int]:
+    """Rebuild ``signatures`` rows from products_in/product_salts, set-based.
+
+    ``signatures`` limits the refresh to those keys (pass both old and new signatures of
+    re-mapped products); None rebuilds the whole table. Unchanged rows are not rewritten,
+    rows whose signature no longer has products are deleted. Runs in its own transaction
+    (a savepoint inside an open one) and returns (upserted, deleted); (0, 0) with a warning
+    when the table does not exist yet.
+    """
+    params: Dict[str, Any] = {}
+    scope = scope_s = ""
+    if signatures is not None:
+        params["sigs"] = sorted({s for s in signatures if s})
+        if not params["sigs"]:
+            return 0, 0
+        scope = "AND p.salt_signature = ANY(%(sigs)s)"
+        scope_s = "s.salt_signature = ANY(%(sigs)s) AND"
+    try:
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute(_REFRESH_SIGNATURES_SQL.format(scope=scope), params)
+            upserted = cur.rowcount
+            cur.execute(
+                f"""DELETE FROM signatures s WHERE {scope_s}
+                    NOT EXISTS (SELECT 1 FROM products_in p WHERE p.salt_signature = s.salt_signature)""",
+                params,
+            )
+            deleted = cur.rowcount
+    except psycopg.errors.UndefinedTable:
+        log.warning("signatures table missing; apply db/schema_chunk_signatures.sql (make migrate-ext)")
+        return 0, 0
+    return upserted, deleted
+
+
+# Tables carrying computed signatures -> whether they also store rxcuis
+_SIGNATURE_TABLES = {"products_in": True, "janaushadhi_products": False, "nppa_ceiling_prices": False}
+
+
+def bulk_update_signatures(conn, table: str, rows: Iterable[Tuple[int, Optional[List[str]], Optional[str]]]) -> int:
+    """Apply (id, rxcuis, salt_signature) rows to ``table`` with one COPY + ``UPDATE ... FROM``.
+
+    Rows whose values are unchanged are not touched (no ``updated_at`` churn, no WAL, no
+    reindex downstream); ``rxcuis`` is ignored for tables without that column. Returns the
+    number of rows changed; the caller commits.
+    """
+    if table not in _SIGNATURE_TABLES:
+        raise ValueError(f"not a signature table: {table}")
+    cols = ["rxcuis", "salt_signature"] if _SIGNATURE_TABLES[table] else ["salt_signature"]
+    target, old, new = ", ".join(cols), ", ".join(f"t.{c}" for c in cols), ", ".join(f"u.{c}" for c in cols)
+    with conn.cursor() as cur:
         cur.execute(
-            """
-          SELECT ps.salt_name, ps.salt_pos
-          FROM products_in p JOIN product_salts ps ON ps.product_id = p.id
-          WHERE p.salt_signature=%s ORDER BY ps.salt_pos
-        """,
-            (sig,),
+            "CREATE TEMP TABLE IF NOT EXISTS _signature_updates "
+            "(id INTEGER PRIMARY KEY, rxcuis TEXT[], salt_signature TEXT) ON COMMIT DELETE ROWS"
         )
-        rows = cur.fetchall()
-    seen = set(); out: List[Dict[str, Any]] = []
-    for name, pos in rows:
-        if name not in seen:
-            out.append({"salt_name": name, "salt_pos": pos}); seen.add(name)
-    return out
+        cur.execute("TRUNCATE _signature_updates")
+        n = 0
+        with cur.copy("COPY _signature_updates (id, rxcuis, salt_signature) FROM STDIN") as cp:
+            for row in rows:
+                cp.write_row(row)
+                n += 1
+        if not n:
+            return 0
+        cur.execute("ANALYZE _signature_updates")
+        cur.execute(
+            f"""UPDATE {table} t SET ({target}, updated_at) = ({new}, NOW())
+                FROM _signature_updates u
+                WHERE t.id = u.id AND ({old}) IS DISTINCT FROM ({new})"""
+        )
+        return cur.rowcount
+
+
+def price_summary(prices: List[float], jana_prices: List[float], ceiling: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Observed price spread over brand + Jan Aushadhi MRPs (None when there are no prices)."""
+    sorted_all = sorted(prices + jana_prices)
+    if not sorted_all:
+        return None
+    n = len(sorted_all)
+    return {
+        "min_price": sorted_all[0],
+        "q1": sorted_all[n // 4],
+        "median": statistics.median(sorted_all),
+        "q3": sorted_all[(3 * n) // 4],
+        "max_price": sorted_all[-1],
+        "count": n,
+        "n_brands": len(prices),
+        "n_jana": len(jana_prices),
+        "nppa_ceiling": ceiling,
+    }
 
 
 def get_alternatives(sig: str) -> Dict[str, Any]:
@@ -50,20 +221,9 @@ def get_alternatives(sig: str) -> Dict[str, Any]:
     ceiling = nppa_by_signature(sig)
     prices = [b["mrp_inr"] for b in brands if b["mrp_inr"] is not None]
     jana_prices = [j["mrp_inr"] for j in jana if j["mrp_inr"] is not None]
-    all_prices = prices + jana_prices
-    summary = None
-    if all_prices:
-        summary = {
-            "min_price": min(all_prices),
-            "max_price": max(all_prices),
-            "count": len(all_prices),
-            "n_brands": len(prices),
-            "n_jana": len(jana_prices),
-            "nppa_ceiling": ceiling,
-        }
     return {
         "brands": brands,
         "janaushadhi": jana,
         "nppa_ceiling_price": ceiling,
-        "price_summary": summary,
+        "price_summary": price_summary(prices, jana_prices, ceiling),
     }
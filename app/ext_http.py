@@ -3,7 +3,8 @@ from __future__ import annotations
 
 Simple exponential backoff (cap 5 tries) with jitter; only 5xx/timeouts retried.
 """
-import os, random, time
+import os, random, time, threading
+from collections import deque
 from typing import Optional, Dict, Any
 import requests
 
@@ -11,6 +12,47 @@ TIMEOUT = int(os.getenv("EXTERNAL_REQUEST_TIMEOUT_SEC", "20"))
 BACKOFF_MAX = int(os.getenv("EXTERNAL_BACKOFF_MAX_SEC", "60"))
 
 
+class UpstreamError(RuntimeError):
+    """Upstream could not answer (error status, throttled or external calls disabled), as
+    opposed to answering that it has nothing for the term."""
+
+
+class RateLimiter:
+    """Thread-safe sliding-window limiter (calls per minute) shared by a source's callers.
+
+    ``max_wait`` caps how long one caller may block; request paths keep the soft 5s cap,
+    batch jobs set it to None to wait for a free slot and stay strictly within the limit.
+    ``window`` shortens the window for per-second limits (``per_min`` calls per ``window``
+    seconds).
+    """
+
+    def __init__(self, per_min: int, max_wait: Optional[float] = 5.0, window: float = 60.0):
+        self.per_min = per_min
+        self.max_wait = max_wait
+        self.window = window
+        self._window: deque = deque()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                while self._window and now - self._window[0] > self.window:
+                    self._window.popleft()
+                if len(self._window) < self.per_min:
+                    self._window.append(now)
+                    return
+                sleep_for = self.window - (now - self._window[0]) + 0.01
+                if self.max_wait is not None:
+                    if waited >= self.max_wait:
+                        self._window.append(now)
+                        return
+                    sleep_for = min(sleep_for, self.max_wait - waited)
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+
 def get(url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
     tries = 0
     last_exc = None
@@ -0,0 +1,141 @@
+"""Background health probes with cached results.
+
+Each component (database, search backend, DailyMed, openFDA) is probed by a background
+thread on its own interval: ``HEALTH_PROBE_INTERVAL_SEC`` for critical dependencies and
+``HEALTH_EXTERNAL_INTERVAL_SEC`` for upstream sources, so load-balancer checks never cause
+DB connections or external traffic themselves. ``/livez``, ``/readyz`` and ``/health`` read
+the cached state only.
+
+Readiness requires every critical component to be up and probed within
+``HEALTH_STALE_SEC`` (a wedged probe thread therefore turns the instance unready).
+
+Metrics: ``health_probe_seconds{component}`` histogram and ``health_component_up{component}``.
+"""
+from __future__ import annotations
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+PROBE_INTERVAL_SEC = float(os.getenv("HEALTH_PROBE_INTERVAL_SEC", "5"))
+EXTERNAL_INTERVAL_SEC = float(os.getenv("HEALTH_EXTERNAL_INTERVAL_SEC", "60"))
+STALE_SEC = float(os.getenv("HEALTH_STALE_SEC", "30"))
+
+_PROBE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 3.0, 10.0)
+
+
+@dataclass
+class _Probe:
+    name: str
+    fn: Callable[[], Any]  # returns truthy when up, or raises
+    interval: float
+    critical: bool
+    ok: Optional[bool] = None
+    error: Optional[str] = None
+    latency_ms: Optional[float] = None
+    checked_at: float = 0.0  # time.time() of the last completed probe
+    next_due: float = 0.0  # monotonic
+
+
+class HealthProber:
+    def __init__(self, stale_sec: float = STALE_SEC):
+        self.stale_sec = stale_sec
+        self.started_at = time.time()
+        self._probes: Dict[str, _Probe] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, fn: Callable[[], Any], interval: float = PROBE_INTERVAL_SEC, critical: bool = True) -> None:
+        with self._lock:
+            self._probes[name] = _Probe(name, fn, interval, critical)
+        self._wake.set()
+
+    def probe(self, name: str) -> bool:
+        p = self._probes[name]
+        t0 = time.perf_counter()
+        try:
+            ok, err = bool(p.fn()), None
+        except Exception as e:
+            ok, err = False, f"{e.__class__.__name__}: {str(e)[:120]}"
+        dt = time.perf_counter() - t0
+        metrics.observe("health_probe_seconds", dt, {"component": name}, buckets=_PROBE_BUCKETS)
+        metrics.set_gauge("health_component_up", 1.0 if ok else 0.0, {"component": name}, merge="min")
+        with self._lock:
+            p.ok, p.error, p.latency_ms = ok, err, round(dt * 1000, 2)
+            p.checked_at = time.time()
+            p.next_due = time.monotonic() + p.interval
+        if not ok and err:
+            log.warning("health probe %s failed: %s", name, err)
+        return ok
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                due = [p.name for p in self._probes.values() if p.next_due <= now]
+            for name in due:
+                self.probe(name)
+            with self._lock:
+                nxt = min((p.next_due for p in self._probes.values()), default=now + PROBE_INTERVAL_SEC)
+            self._wake.wait(max(0.05, nxt - time.monotonic()))
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Probe critical components once inline (so the first readiness answer is real),
+        then keep probing in the background. Idempotent."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+            critical = [p.name for p in self._probes.values() if p.critical]
+        for name in critical:
+            self.probe(name)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return {
+                p.name: {
+                    "ok": p.ok,
+                    "error": p.error,
+                    "latency_ms": p.latency_ms,
+                    "age_sec": round(now - p.checked_at, 1) if p.checked_at else None,
+                    "critical": p.critical,
+                }
+                for p in self._probes.values()
+            }
+
+    def ready(self) -> Tuple[bool, List[str]]:
+        """(ready, reasons): critical components must be up and recently probed."""
+        now = time.time()
+        reasons = []
+        with self._lock:
+            for p in self._probes.values():
+                if not p.critical:
+                    continue
+                if p.ok is None:
+                    reasons.append(f"{p.name}: not probed yet")
+                elif not p.ok:
+                    reasons.append(f"{p.name}: down")
+                elif now - p.checked_at > self.stale_sec:
+                    reasons.append(f"{p.name}: stale ({now - p.checked_at:.0f}s)")
+        return not reasons, reasons
+
+    def uptime_sec(self) -> float:
+        return round(time.time() - self.started_at, 1)
+
+
+__all__ = ["HealthProber", "PROBE_INTERVAL_SEC", "EXTERNAL_INTERVAL_SEC", "STALE_SEC"]
@@ -1,20 +1,30 @@
 from __future__ import annotations
-import os, re, requests
-from typing import Optional, Dict, Any
+import os, re, time, asyncio, operator, threading, requests
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Callable, AsyncIterator, Tuple
+from typing_extensions import Annotated
 from pydantic import BaseModel, Field
-from langgraph.graph import StateGraph, END
-from app.llm_service import build_llm_service
+from app.llm_service import build_llm_service, accept_rewrite
+from app.intent import has_red_flags
+from app.advise_log_writer import get_advise_log_writer
+from app.session_store import build_session_store
+from app.brand_matcher import get_brand_matcher
+from app import metrics
 
 API_BASE = os.getenv("API_BASE_URL", "http://localhost:8000")
 AGENT_LOCAL = os.getenv("AGENT_LOCAL", "1") in ("1","true","yes")
+# Wall-clock budget for one agent turn; nodes that start after it are skipped
+AGENT_TURN_TIMEOUT_MS = int(os.getenv("AGENT_TURN_TIMEOUT_MS", "8000"))
+HTTP_TIMEOUT_SEC = 30.0
 
-_local_search = None
+_LOCAL: Optional[SimpleNamespace] = None
+_LOCAL_LOCK = threading.Lock()
 
-# --- Simple memory per session_id
-_SESSION: Dict[str, Dict[str, Any]] = {}
+# --- Session memory per session_id (bounded LRU + idle TTL; optional PG write-behind)
+_SESSIONS = build_session_store()
 
 def _mem(session_id: str) -> Dict[str, Any]:
-    return _SESSION.setdefault(session_id, {"last_brand": None, "last_signature": None, "last_intent": None})
+    return _SESSIONS.get(session_id)
 
 # --- very light intent parse (could reuse main intent classifier later)
 _INTENT_PATTERNS = {
@@ -34,26 +44,41 @@ def classify_intent(text: str) -> str:
 
 # --- HTTP helper
 
-def http_get(path: str, params: Dict[str, Any], allow_404: bool = False) -> Any:
+def _local_handles() -> SimpleNamespace:
+    """In-process service handles, resolved once (imports app.main lazily: it imports us)."""
+    global _LOCAL
+    if _LOCAL is None:
+        with _LOCAL_LOCK:
+            if _LOCAL is None:
+                from app.main import get_search_service, get_signature_by_name, get_monograph_by_signature, salts_by_signature, alternatives, MONOGRAPH_COMPOSE_BUDGET_MS  # type: ignore
+                from app.monograph_service import compose_on_miss  # type: ignore
+                from app.advise_service import advise_for  # type: ignore
+                _LOCAL = SimpleNamespace(
+                    search=get_search_service(),
+                    get_signature_by_name=get_signature_by_name,
+                    get_monograph_by_signature=get_monograph_by_signature,
+                    salts_by_signature=salts_by_signature,
+                    alternatives=alternatives,
+                    compose_on_miss=compose_on_miss,
+                    compose_budget_s=MONOGRAPH_COMPOSE_BUDGET_MS / 1000.0,
+                    advise_for=advise_for,
+                )
+    return _LOCAL
+
+
+def http_get(path: str, params: Dict[str, Any], allow_404: bool = False, timeout: float = HTTP_TIMEOUT_SEC) -> Any:
     if AGENT_LOCAL:
-        global _local_search
-        if _local_search is None:
-            from app.search_service import build_search_service
-            _local_search = build_search_service()
-        from app.main import get_signature_by_name as api_get_signature_by_name  # type: ignore
-        from app.main import get_monograph_by_signature as api_get_monograph_by_signature  # type: ignore
-        from app.main import salts_by_signature as api_salts_by_signature, brands_by_signature as api_brands_by_signature, jana_by_signature as api_jana_by_signature, nppa_by_signature_or_generic as api_nppa_by_signature_or_generic  # type: ignore
-        from app.advise_service import advise_for as api_advise_for  # type: ignore
+        api = _local_handles()
         # In-process fast path mirrors subset of API endpoints; ignores pagination extras.
         try:
             if path == "/search":
                 query = params.get("query")
                 limit = int(params.get("limit", 10))
-                hits = _local_search.search_brands(query, limit=limit)  # type: ignore
+                hits = api.search.search_brands(query, limit=limit)
                 return {"query": query, "hits": hits}
             if path == "/resolve":
                 name = params.get("name")
-                sig = api_get_signature_by_name(name)
+                sig = api.get_signature_by_name(name)
                 if not sig:
                     if allow_404:
                         return None
@@ -62,35 +87,37 @@ def http_get(path: str, params: Dict[str, Any], allow_404: bool = False) -> Any:
                 return {"matches": [{"salt_signature": sig, "brand_name": name}]}
             if path == "/monograph":
                 sig = params.get("signature")
-                doc = api_get_monograph_by_signature(sig)
+                doc = api.get_monograph_by_signature(sig)
+                if not doc:
+                    # Same bounded path as /monograph (cache tables within the compose budget), but
+                    # a first turn waits out the rest of its deadline for the upstream compose
+                    terms = [s["salt_name"] for s in api.salts_by_signature(sig)]
+                    doc, _ = api.compose_on_miss(sig, terms, min(timeout, api.compose_budget_s), wait_s=timeout)
                 if not doc:
                     return None if allow_404 else {}
                 return {"title": doc.get("title"), "signature": sig, "sources": doc.get("sources", []), "sections": doc.get("sections", {})}
             if path == "/alternatives":
-                sig = params.get("signature")
-                salts = api_salts_by_signature(sig)
-                brands = api_brands_by_signature(sig)
-                jana = api_jana_by_signature(sig)
-                ceiling = api_nppa_by_signature_or_generic(sig)
-                return {"signature": sig, "salts": salts, "brands": brands, "janaushadhi": jana, "nppa_ceiling_price": ceiling}
+                return api.alternatives(signature=params.get("signature"))
             if path == "/advise":
                 sig = params.get("signature")
                 intent = params.get("intent")
-                query = params.get("query")
-                ans = api_advise_for(sig, None, intent, False)
-                return ans
+                return api.advise_for(sig, None, intent, False)
         except Exception:
             if allow_404:
                 return None
             return {}
     url = f"{API_BASE}{path}"
-    r = requests.get(url, params=params, timeout=30)
+    r = requests.get(url, params=params, timeout=timeout)
     if allow_404 and r.status_code == 404:
         return None
     r.raise_for_status()
     return r.json()
 
 
+def _merge_timings(a: Optional[Dict[str, float]], b: Optional[Dict[str, float]]) -> Dict[str, float]:
+    return {**(a or {}), **(b or {})}
+
+
 class AgentState(BaseModel):
     session_id: str = Field(default="default")
     user_text: str
@@ -100,17 +127,67 @@ class AgentState(BaseModel):
     monograph: Optional[Dict[str, Any]] = None
     alternatives: Optional[Dict[str, Any]] = None
     answer: Optional[str] = None
+    # per-node wall time; reducer lets parallel branches report independently
+    timings_ms: Annotated[Dict[str, float], _merge_timings] = Field(default_factory=dict)
+    # time.monotonic() deadline for the whole turn (None = no limit)
+    deadline: Optional[float] = None
+    timed_out: Annotated[bool, operator.or_] = False
+    # streaming turns run the LLM rewrite outside the graph so tokens can be forwarded
+    stream_rewrite: bool = False
+
+
+def _remaining(state: AgentState) -> float:
+    if state.deadline is None:
+        return HTTP_TIMEOUT_SEC
+    return state.deadline - time.monotonic()
+
+
+def _http_timeout(state: AgentState) -> float:
+    return max(0.1, min(HTTP_TIMEOUT_SEC, _remaining(state)))
+
+
+# compose only reads state, so it always runs and turns whatever was fetched into an answer
+_SKIP_WHEN_LATE = {"resolve_signature", "fetch_monograph", "fetch_alternatives", "rewrite_fluency"}
+
+
+# Nodes return partial updates (not the whole state) so the fetch_monograph and
+# fetch_alternatives branches can run in the same superstep without conflicting writes.
+def _timed(name: str, fn: Callable[[AgentState], Dict[str, Any]]):
+    def run(state: AgentState) -> Dict[str, Any]:
+        if name in _SKIP_WHEN_LATE and _remaining(state) <= 0:
+            return {"timed_out": True, "timings_ms": {name: 0.0}}
+        t0 = time.perf_counter()
+        out = fn(state) or {}
+        dt = time.perf_counter() - t0
+        metrics.observe("agent_node_seconds", dt, {"node": name})
+        out["timings_ms"] = {name: round(dt * 1000, 2)}
+        return out
+    return run
 
 
 _QUESTION_STOPWORDS = {
     "what","any","please","tell","give","show","list","which","how","is","are","do","does","can"
 }
 
-def node_parse(state: AgentState) -> AgentState:
+def _match_brand(text: str):
+    matcher = get_brand_matcher()
+    return matcher.find(text) if matcher is not None else None
+
+
+def node_parse(state: AgentState) -> Dict[str, Any]:
     m = _mem(state.session_id)
     text = state.user_text.strip()
     intent = classify_intent(text)
     brand = state.brand
+    signature = state.signature
+    if not brand:
+        hit = _match_brand(text)
+        if hit is not None:
+            brand = hit.name
+            if hit.signature and signature is None:
+                # unambiguous catalog mention: resolve_signature skips /search + /resolve
+                signature = hit.signature
+                _SESSIONS.update(state.session_id, last_brand=brand, last_signature=signature, last_intent=intent)
     if not brand:
         # Collect capitalized tokens and choose first non-question stopword
         candidates = re.findall(r"[A-Z][A-Za-z0-9\-]+", text)
@@ -118,23 +195,20 @@ def node_parse(state: AgentState) -> AgentState:
             if tok.lower() not in _QUESTION_STOPWORDS and len(tok) > 2:
                 brand = tok
                 break
-    state.intent = intent
     if not brand:
         brand = m.get("last_brand")
-    state.brand = brand
-    if state.signature is None:
-        state.signature = m.get("last_signature")
-    return state
+    if signature is None:
+        signature = m.get("last_signature")
+    return {"intent": intent, "brand": brand, "signature": signature}
 
 
-def node_resolve_signature(state: AgentState) -> AgentState:
+def node_resolve_signature(state: AgentState) -> Dict[str, Any]:
     if state.signature:
-        return state
+        return {}
     if not state.brand:
-        state.answer = "Please tell me the medicine brand name."
-        return state
+        return {"answer": "Please tell me the medicine brand name."}
     original = state.brand
-    sr = http_get("/search", {"query": original, "limit": 5})
+    sr = http_get("/search", {"query": original, "limit": 5}, timeout=_http_timeout(state))
     candidates = sr.get("hits", []) if isinstance(sr, dict) else []
     brand = original
     if candidates:
@@ -144,107 +218,234 @@ def node_resolve_signature(state: AgentState) -> AgentState:
             brand = match.get("brand_name", original)
         else:
             brand = candidates[0].get("brand_name", original)
-    state.brand = brand
-    rr = http_get("/resolve", {"name": brand, "limit": 1})
+    rr = http_get("/resolve", {"name": brand, "limit": 1}, timeout=_http_timeout(state))
     items = rr.get("matches") if isinstance(rr, dict) else rr
     if not items:
-        state.answer = f"I couldn't find {brand} in the catalog."
-        return state
+        return {"brand": brand, "answer": f"I couldn't find {brand} in the catalog."}
     sig = items[0].get("salt_signature")
-    state.signature = sig
-    m = _mem(state.session_id)
-    m["last_brand"] = brand
-    m["last_signature"] = sig
-    m["last_intent"] = state.intent
-    return state
+    _SESSIONS.update(state.session_id, last_brand=brand, last_signature=sig, last_intent=state.intent)
+    return {"brand": brand, "signature": sig}
 
 
-def node_fetch_monograph(state: AgentState) -> AgentState:
+def node_fetch_monograph(state: AgentState) -> Dict[str, Any]:
     if not state.signature:
-        return state
-    mr = http_get("/monograph", {"signature": state.signature}, allow_404=True)
-    if mr:
-        state.monograph = mr
-    return state
+        return {}
+    mr = http_get("/monograph", {"signature": state.signature}, allow_404=True, timeout=_http_timeout(state))
+    # a 202 (compose pending) carries no sections
+    if mr and "sections" in mr:
+        return {"monograph": mr}
+    return {}
 
 
-def node_fetch_alternatives(state: AgentState) -> AgentState:
+def node_fetch_alternatives(state: AgentState) -> Dict[str, Any]:
     if not state.signature:
-        return state
-    ar = http_get("/alternatives", {"signature": state.signature})
-    state.alternatives = ar
-    return state
+        return {}
+    return {"alternatives": http_get("/alternatives", {"signature": state.signature}, timeout=_http_timeout(state))}
 
 
-def node_compose(state: AgentState) -> AgentState:
+def node_compose(state: AgentState) -> Dict[str, Any]:
+    """Build the answer from the branches' results instead of re-fetching via /advise."""
     if not state.signature:
-        return state
-    adv = http_get(
-        "/advise",
-        {"signature": state.signature, "query": state.user_text, "intent": state.intent or "summary"},
-    )
-    state.answer = adv.get("answer") or "Sorry, I don't have enough information."
-    if adv.get("alternatives"):
-        state.alternatives = adv["alternatives"]
-    return state
-
-
-def node_output(state: AgentState) -> AgentState:  # passthrough
-    return state
-
-
-_graph = StateGraph(AgentState)
-_graph.add_node("parse", node_parse)
-_graph.add_node("resolve_signature", node_resolve_signature)
-_graph.add_node("fetch_monograph", node_fetch_monograph)
-_graph.add_node("fetch_alternatives", node_fetch_alternatives)
-_graph.add_node("compose", node_compose)
-_graph.add_node("output", node_output)
+        return {}
+    from app.advise_service import advise_from
+    alt = state.alternatives or {}
+    salt_names = [s.get("salt_name") for s in (alt.get("salts") or []) if s.get("salt_name")]
+    mono = state.monograph or {"sections": {}, "sources": []}
+    intent = state.intent or "summary"
+    adv = advise_from(state.signature, None, intent, has_red_flags(state.user_text), salt_names, mono, alt)
+    # Same advise_logs row /advise wrote for agent turns (feeds the cache refresher's popularity)
+    get_advise_log_writer().log(state.user_text, state.brand, state.signature, intent, True, "agent")
+    return {"answer": adv.get("answer") or "Sorry, I don't have enough information."}
+
+
+def node_output(state: AgentState) -> Dict[str, Any]:  # passthrough
+    return {}
+
+
 _LLM = build_llm_service()
 
-def node_rewrite_fluency(state: AgentState) -> AgentState:
-    if not state.answer or _LLM is None:
-        return state
+def node_rewrite_fluency(state: AgentState) -> Dict[str, Any]:
+    if not state.answer or _LLM is None or state.stream_rewrite:
+        return {}
     try:
-        state.answer = _LLM.rewrite(state.answer)
+        return {"answer": _LLM.rewrite(state.answer)}
     except Exception:
-        pass
-    return state
-
-_graph.add_node("rewrite_fluency", node_rewrite_fluency)
-
-_graph.set_entry_point("parse")
-_graph.add_edge("parse", "resolve_signature")
-_graph.add_edge("resolve_signature", "fetch_monograph")
-_graph.add_edge("fetch_monograph", "fetch_alternatives")
-_graph.add_edge("fetch_alternatives", "compose")
-_graph.add_edge("compose", "rewrite_fluency")
-_graph.add_edge("rewrite_fluency", "output")
-_graph.add_edge("output", END)
-
-app_graph = _graph.compile()
-
-
-def run_turn(session_id: str, text: str) -> Dict[str, Any]:
-    st = AgentState(session_id=session_id, user_text=text)
-    out = app_graph.invoke(st)
-    # langgraph may return a plain mapping instead of the model instance
-    if hasattr(out, "brand"):
-        brand = out.brand; signature = out.signature; intent = out.intent; answer = out.answer
-        have_m = bool(getattr(out, "monograph", None))
-        have_a = bool(getattr(out, "alternatives", None))
-    else:  # mapping fallback
-        brand = out.get("brand")
-        signature = out.get("signature")
-        intent = out.get("intent")
-        answer = out.get("answer")
-        have_m = bool(out.get("monograph"))
-        have_a = bool(out.get("alternatives"))
+        return {}
+
+
+def build_graph():
+    from langgraph.graph import StateGraph, END  # heavy (langchain_core, langsmith); kept off import
+
+    graph = StateGraph(AgentState)
+    for name, fn in (
+        ("parse", node_parse),
+        ("resolve_signature", node_resolve_signature),
+        ("fetch_monograph", node_fetch_monograph),
+        ("fetch_alternatives", node_fetch_alternatives),
+        ("compose", node_compose),
+        ("rewrite_fluency", node_rewrite_fluency),
+        ("output", node_output),
+    ):
+        graph.add_node(name, _timed(name, fn))
+
+    graph.set_entry_point("parse")
+    graph.add_edge("parse", "resolve_signature")
+    # monograph and alternatives fetch run as parallel branches, joined at compose
+    graph.add_edge("resolve_signature", "fetch_monograph")
+    graph.add_edge("resolve_signature", "fetch_alternatives")
+    graph.add_edge(["fetch_monograph", "fetch_alternatives"], "compose")
+    graph.add_edge("compose", "rewrite_fluency")
+    graph.add_edge("rewrite_fluency", "output")
+    graph.add_edge("output", END)
+    return graph.compile()
+
+
+_GRAPH = None
+_GRAPH_LOCK = threading.Lock()
+
+
+def get_graph():
+    """Compiled agent graph, built on first turn (or by the API's startup warm-up)."""
+    global _GRAPH
+    if _GRAPH is None:
+        with _GRAPH_LOCK:
+            if _GRAPH is None:
+                _GRAPH = build_graph()
+    return _GRAPH
+
+
+def _partial_answer(out: Dict[str, Any]) -> Optional[str]:
+    """Best answer available from an interrupted turn's last state snapshot."""
+    if out.get("answer"):
+        return out["answer"]
+    if out.get("signature"):
+        try:
+            return node_compose(AgentState(**out)).get("answer")
+        except Exception:
+            pass
+    return "Sorry, that took too long. Please try again."
+
+
+def _reply(out: Any, total_ms: float, timed_out: bool = False) -> Dict[str, Any]:
+    # langgraph may return the model instance or a plain mapping
+    if hasattr(out, "model_dump"):
+        out = out.model_dump()
+    out = dict(out or {})
+    timings = dict(out.get("timings_ms") or {})
+    timings["total"] = total_ms
     return {
-        "brand": brand,
-        "signature": signature,
-        "intent": intent,
-        "answer": answer,
-        "have_monograph": have_m,
-        "have_alternatives": have_a,
+        "brand": out.get("brand"),
+        "signature": out.get("signature"),
+        "intent": out.get("intent"),
+        "answer": out.get("answer"),
+        "have_monograph": bool(out.get("monograph")),
+        "have_alternatives": bool(out.get("alternatives")),
+        "timings_ms": timings,
+        "timed_out": timed_out or bool(out.get("timed_out")),
     }
+
+
+def _await_budget(st: AgentState) -> Optional[float]:
+    """Seconds the async entry points wait on the graph / LLM stream (None = no limit).
+
+    Includes a small grace so nodes can notice the deadline themselves and finish normally.
+    """
+    if st.deadline is None:
+        return None
+    return max(0.0, st.deadline - time.monotonic()) + 0.25
+
+
+def _initial_state(session_id: str, text: str, timeout_ms: Optional[int], stream_rewrite: bool = False) -> AgentState:
+    budget_ms = AGENT_TURN_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    deadline = time.monotonic() + budget_ms / 1000 if budget_ms > 0 else None
+    return AgentState(session_id=session_id, user_text=text, deadline=deadline, stream_rewrite=stream_rewrite)
+
+
+def run_turn(session_id: str, text: str, timeout_ms: Optional[int] = None) -> Dict[str, Any]:
+    st = _initial_state(session_id, text, timeout_ms)
+    t0 = time.perf_counter()
+    out = get_graph().invoke(st)
+    return _reply(out, round((time.perf_counter() - t0) * 1000, 2))
+
+
+async def arun_turn(session_id: str, text: str, timeout_ms: Optional[int] = None) -> Dict[str, Any]:
+    """Async turn for the API: sync nodes run on the executor, so concurrent chats do not
+    block the event loop. Nodes skip work once the deadline passes; if one is still
+    blocked at the deadline the last completed superstep is answered from directly."""
+    st = _initial_state(session_id, text, timeout_ms)
+    t0 = time.perf_counter()
+    last: Dict[str, Any] = st.model_dump()
+
+    async def consume():
+        async for values in get_graph().astream(st, stream_mode="values"):
+            last.update(values.model_dump() if hasattr(values, "model_dump") else values)
+
+    try:
+        await asyncio.wait_for(consume(), timeout=_await_budget(st))
+    except asyncio.TimeoutError:
+        last["answer"] = _partial_answer(last)
+        return _reply(last, round((time.perf_counter() - t0) * 1000, 2), timed_out=True)
+    return _reply(last, round((time.perf_counter() - t0) * 1000, 2))
+
+
+async def astream_turn(session_id: str, text: str, timeout_ms: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(event, data)`` as the turn progresses:
+
+    ``resolved`` (brand, signature) -> ``price_summary`` -> ``answer`` (deterministic)
+    -> ``token`` chunks of the LLM rewrite, when enabled -> ``done`` (the same payload
+    as /agent/message; its answer is the validated rewrite or the deterministic one).
+    The turn deadline bounds the graph and the rewrite as in ``arun_turn``: once it passes,
+    ``done`` carries the best partial answer with ``timed_out`` set.
+    """
+    st = _initial_state(session_id, text, timeout_ms, stream_rewrite=True)
+    t0 = time.perf_counter()
+    state: Dict[str, Any] = st.model_dump()
+    resolved = False
+    updates = get_graph().astream(st, stream_mode="updates").__aiter__()
+    while True:
+        try:
+            update = await asyncio.wait_for(updates.__anext__(), timeout=_await_budget(st))
+        except StopAsyncIteration:
+            break
+        except asyncio.TimeoutError:
+            # Same bound as /agent/message: answer from what was fetched so far, skip the rewrite
+            state["answer"] = _partial_answer(state)
+            yield "done", _reply(state, round((time.perf_counter() - t0) * 1000, 2), timed_out=True)
+            return
+        for node, delta in update.items():
+            delta = dict(delta or {})
+            timings = delta.pop("timings_ms", None)
+            if timings:
+                state["timings_ms"] = _merge_timings(state.get("timings_ms"), timings)
+            state["timed_out"] = state.get("timed_out") or delta.pop("timed_out", False)
+            state.update(delta)
+            if not resolved and state.get("signature") and node in ("parse", "resolve_signature"):
+                resolved = True
+                yield "resolved", {"brand": state.get("brand"), "signature": state["signature"]}
+            elif node == "fetch_alternatives" and "alternatives" in delta:
+                yield "price_summary", {"signature": state.get("signature"), "price_summary": (delta["alternatives"] or {}).get("price_summary")}
+            elif node in ("resolve_signature", "compose") and delta.get("answer"):
+                yield "answer", {"answer": state.get("answer")}
+
+    answer = state.get("answer")
+    if answer and _LLM is not None and _remaining(st) > 0:
+        loop = asyncio.get_running_loop()
+        chunks: List[str] = []
+        t_llm = time.perf_counter()
+        try:
+            it = iter(_LLM.stream_rewrite(answer))
+            while True:
+                chunk = await asyncio.wait_for(loop.run_in_executor(None, next, it, None), timeout=_await_budget(st))
+                if chunk is None:
+                    break
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
+            state["answer"] = accept_rewrite(answer, "".join(chunks))
+        except asyncio.TimeoutError:
+            state["answer"] = answer
+            state["timed_out"] = True
+        except Exception:
+            state["answer"] = answer
+        state["timings_ms"] = _merge_timings(state.get("timings_ms"), {"rewrite_fluency": round((time.perf_counter() - t_llm) * 1000, 2)})
+    yield "done", _reply(state, round((time.perf_counter() - t0) * 1000, 2))
+
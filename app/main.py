@@ -1,17 +1,79 @@
-import os, psycopg, time, statistics, re, requests
-from typing import List, Optional, Tuple, Dict, Any
+import os, psycopg, time, re, json, requests, asyncio, logging, threading
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple, Dict, Any, Callable
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from app.search_service import build_search_service, PGSearchService, OpenSearchService
-from app.monograph_service import MonographService, _MONO_SERVICE
-from app.langgraph_agent import run_turn
-from app import metrics
+from app.search_service import build_search_service, SearchService, PGSearchService, OpenSearchService
+from app.monograph_service import MonographService, get_monograph_service, compose_on_miss
+from app import metrics, profiling
+from app.profiling import ProfiledCursor
+from app.dbio import dedup_salt_rows, price_summary, signature_salts
+from app.health import HealthProber, EXTERNAL_INTERVAL_SEC as HEALTH_EXTERNAL_INTERVAL_SEC
 
 load_dotenv()
-app = FastAPI(title="India Medicine Bot - MVP (Chunks 1-7)")
+log = logging.getLogger(__name__)
+
+# Nothing heavy happens at import: the search backend (OpenSearch ping), agent graph
+# (langgraph import + compile), brand matcher and health probes are built on first use,
+# and the lifespan warm-up builds them concurrently before the first request.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+STARTUP_WARMUP_TIMEOUT_SEC = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SEC", "20"))
+
+
+def _warm_agent_graph() -> None:
+    from app.langgraph_agent import get_graph
+    get_graph()
+
+
+def _warm_brand_matcher() -> None:
+    from app.brand_matcher import get_brand_matcher
+    get_brand_matcher()
+
+
+_WARMUP_STEPS: Dict[str, Callable[[], Any]] = {
+    "search": lambda: get_search_service(),
+    "agent_graph": _warm_agent_graph,
+    "brand_matcher": _warm_brand_matcher,
+    "health": lambda: _health.start(),
+}
+
+
+def _run_warmup_step(name: str, fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:  # the request path retries lazily
+        log.warning("startup warm-up %s failed: %s", name, e)
+    dt = time.perf_counter() - t0
+    metrics.set_gauge("startup_warmup_seconds", dt, {"step": name}, merge="max")
+    return dt
+
+
+async def warm_up(timeout: float = STARTUP_WARMUP_TIMEOUT_SEC) -> Dict[str, Optional[float]]:
+    """Run every warm-up step concurrently; returns seconds per step (None if still running
+    at ``timeout``: it keeps going in the background and requests build lazily meanwhile)."""
+    loop = asyncio.get_running_loop()
+    futs = {name: loop.run_in_executor(None, _run_warmup_step, name, fn) for name, fn in _WARMUP_STEPS.items()}
+    done, _ = await asyncio.wait(futs.values(), timeout=timeout)
+    return {name: round(f.result(), 3) if f in done else None for name, f in futs.items()}
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    if STARTUP_WARMUP:
+        t0 = time.perf_counter()
+        steps = await warm_up()
+        metrics.set_gauge("startup_warmup_total_seconds", time.perf_counter() - t0, merge="max")
+        log.info("startup warm-up done in %.2fs: %s", time.perf_counter() - t0, steps)
+    yield
+    _health.stop()
+    close_advise_log_writer()
+
+
+app = FastAPI(title="India Medicine Bot - MVP (Chunks 1-7)", lifespan=lifespan)
 
 # Allow local frontend dev servers
 app.add_middleware(
@@ -26,7 +88,80 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-_search_service = build_search_service()
+
+
+@app.middleware("http")
+async def request_timing(request, call_next):
+    # One histogram for every handler, labelled by route template (for SSE: time to headers)
+    t0 = time.perf_counter()
+    status = "500"
+    metrics.inc_gauge("http_requests_in_flight", 1)
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        metrics.inc_gauge("http_requests_in_flight", -1)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - t0,
+            {"route": route, "method": request.method, "status": status},
+        )
+
+
+@app.middleware("http")
+async def request_profiling(request: Request, call_next):
+    # Opt-in (X-Profile + X-Admin-Token) or sampled; see app/profiling.py
+    explicit = profiling.requested(request.headers, request.query_params)
+    if not explicit and not profiling.sampled():
+        return await call_next(request)
+    prof = profiling.Profile(f"{request.method} {request.url.path}" + (f"?{request.url.query}" if request.url.query else ""))
+    token = profiling.activate(prof)
+    try:
+        response = await call_next(request)
+    finally:
+        profiling.deactivate(token)
+    prof.finish()
+    if not explicit:
+        profiling.record_sample(prof)
+        return response
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-length", "content-type")}
+    headers["Server-Timing"] = prof.server_timing()
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        response.headers["Server-Timing"] = headers["Server-Timing"]
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data["_profile"] = prof.breakdown()
+        return JSONResponse(data, status_code=response.status_code, headers=headers)
+    return Response(body, status_code=response.status_code, headers=headers, media_type=response.headers.get("content-type"))
+
+
+_SEARCH: Optional[SearchService] = None
+_SEARCH_LOCK = threading.Lock()
+
+
+def get_search_service() -> SearchService:
+    """Search backend, selected (and OpenSearch pinged) on first use instead of at import."""
+    global _SEARCH
+    if _SEARCH is None:
+        with _SEARCH_LOCK:
+            if _SEARCH is None:
+                _SEARCH = build_search_service()
+    return _SEARCH
+
+
+def __getattr__(name: str):
+    # keeps ``from app.main import _search_service`` working
+    if name == "_search_service":
+        return get_search_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Optional OpenTelemetry instrumentation (no-op if not configured)
 try:
@@ -63,7 +198,8 @@ def _cache_put_sig(name_norm: str, sig: str):
 def db():
     return psycopg.connect(
         host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS")
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        cursor_factory=ProfiledCursor,
     )
 
 class Salt(BaseModel):
@@ -83,41 +219,72 @@ class Brand(BaseModel):
     rxcuis: Optional[List[str]] = None
     salt_signature: Optional[str] = None
 
+def _probe_db() -> bool:
+    with psycopg.connect(
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        connect_timeout=3,
+    ) as conn:
+        conn.execute("SELECT 1;")
+    return True
+
+
+def _probe_search() -> bool:
+    svc = get_search_service()
+    if isinstance(svc, OpenSearchService):
+        return svc.is_alive()
+    return True
+
+
+def _probe_url(url: str) -> Callable[[], bool]:
+    def probe() -> bool:
+        requests.get(url, timeout=3)  # any HTTP answer means the upstream is reachable
+        return True
+    return probe
+
+
+_health = HealthProber()
+_health.register("db", _probe_db)
+_health.register("search", _probe_search)
+if os.getenv("NO_EXTERNAL", "0") != "1":
+    for _name, _url in [
+        ("dailymed", os.getenv("DAILYMED_BASE", "https://dailymed.nlm.nih.gov")),
+        ("openfda", os.getenv("OPENFDA_BASE", "https://api.fda.gov/drug/label.json")),
+    ]:
+        _health.register(_name, _probe_url(_url), interval=HEALTH_EXTERNAL_INTERVAL_SEC, critical=False)
+
+
+@app.get("/livez")
+def livez():
+    """Process is up and serving; never touches dependencies."""
+    return {"ok": True, "uptime_sec": _health.uptime_sec()}
+
+
+@app.get("/readyz")
+def readyz():
+    _health.start()
+    ready, reasons = _health.ready()
+    body = {"ready": ready, "reasons": reasons}
+    return body if ready else JSONResponse(body, status_code=503)
+
+
 @app.get("/health")
 def health():
-    db_ok = False
-    db_err = None
-    try:
-        with db() as conn, conn.cursor() as cur:
-            cur.execute("SELECT 1;")
-        db_ok = True
-    except Exception as e:
-        db_err = f"{e.__class__.__name__}: {str(e)[:120]}"
-    search_backend = type(_search_service).__name__
-    search_ok = True
-    if isinstance(_search_service, OpenSearchService):
-        try:
-            search_ok = _search_service.is_alive()
-        except Exception:
-            search_ok = False
-    external = {}
-    if os.getenv("NO_EXTERNAL", "0") != "1":
-        for name, url in [
-            ("dailymed", os.getenv("DAILYMED_BASE", "https://dailymed.nlm.nih.gov")),
-            ("openfda", os.getenv("OPENFDA_BASE", "https://api.fda.gov/drug/label.json")),
-        ]:
-            try:
-                requests.get(url, timeout=3)
-                external[name] = "ok"
-            except Exception:
-                external[name] = "fail"
+    _health.start()
+    st = _health.status()
+    db_st, search_st = st["db"], st["search"]
+    external = {
+        name: ("ok" if c["ok"] else "fail" if c["ok"] is False else "pending")
+        for name, c in st.items() if not c["critical"]
+    }
     return {
-        "ok": db_ok and search_ok,
-        "db": db_ok,
-        "db_error": db_err,
-        "search_backend": search_backend,
-        "search_ok": search_ok,
+        "ok": bool(db_st["ok"] and search_st["ok"]),
+        "db": bool(db_st["ok"]),
+        "db_error": db_st["error"],
+        "search_backend": type(get_search_service()).__name__,
+        "search_ok": bool(search_st["ok"]),
         "external": external,
+        "probes": st,
     }
 
 @app.get("/resolve")
@@ -193,7 +360,7 @@ class SearchResponse(BaseModel):
 
 @app.get("/search", response_model=SearchResponse)
 def search(query: str = Query(..., min_length=1), limit: int = 10):
-    hits = _search_service.search_brands(query, limit=limit)
+    hits = get_search_service().search_brands(query, limit=limit)
     return {"query": query, "hits": hits}
 
 DISCLAIMER = (
@@ -204,6 +371,7 @@ DISCLAIMER = (
 from typing import Dict, Any
 
 
+@metrics.timer("db_query_seconds", {"query": "get_signature_by_name"})
 def get_signature_by_name(name: str) -> Optional[str]:
     key = name.strip().lower()
     cached = _cache_get_sig(key)
@@ -228,6 +396,7 @@ def get_signature_by_name(name: str) -> Optional[str]:
     return sig
 
 
+@metrics.timer("db_query_seconds", {"query": "get_monograph_by_signature"})
 def get_monograph_by_signature(sig: str) -> Optional[Dict[str, Any]]:
     with db() as conn, conn.cursor() as cur:
         cur.execute(
@@ -244,6 +413,10 @@ def get_monograph_by_signature(sig: str) -> Optional[Dict[str, Any]]:
         title, sources, sections = row
         return {"title": title, "sources": sources, "sections": sections}
 
+# Compose-on-miss: cache-only compose budget on the request path, retry hint for 202s
+MONOGRAPH_COMPOSE_BUDGET_MS = int(os.getenv("MONOGRAPH_COMPOSE_BUDGET_MS", "300"))
+MONOGRAPH_RETRY_AFTER_SEC = int(os.getenv("MONOGRAPH_RETRY_AFTER_SEC", "5"))
+
 @app.get("/monograph")
 def monograph(signature: Optional[str] = None, name: Optional[str] = None):
     if not signature and not name:
@@ -257,7 +430,16 @@ def monograph(signature: Optional[str] = None, name: Optional[str] = None):
 
     doc = get_monograph_by_signature(sig)
     if not doc:
-        raise HTTPException(status_code=404, detail="Monograph not found for signature")
+        terms = [s["salt_name"] for s in salts_by_signature(sig)]
+        doc, status = compose_on_miss(sig, terms, MONOGRAPH_COMPOSE_BUDGET_MS / 1000.0)
+        if status == "pending":
+            return JSONResponse(
+                status_code=202,
+                content={"signature": sig, "status": "pending", "retry_after": MONOGRAPH_RETRY_AFTER_SEC},
+                headers={"Retry-After": str(MONOGRAPH_RETRY_AFTER_SEC)},
+            )
+        if not doc:
+            raise HTTPException(status_code=404, detail="Monograph not found for signature")
 
     # Attempt fallback merge if any bucket empty (only uses/precautions/side_effects)
     sections = doc["sections"] or {}
@@ -267,7 +449,8 @@ def monograph(signature: Optional[str] = None, name: Optional[str] = None):
         try:
             salts = salts_by_signature(sig)
             terms = [s["salt_name"] for s in salts]
-            sections = _MONO_SERVICE.merge_fallbacks(terms, sections)
+            # Cache tables only: upstream fills happen in the background compose, not here
+            sections = get_monograph_service().merge_fallbacks(terms, sections, cache_only=True)
         except Exception:
             pass
     return {
@@ -281,33 +464,28 @@ def monograph(signature: Optional[str] = None, name: Optional[str] = None):
 # --- Chunk 4: alternatives ---
 from typing import Any
 
+@metrics.timer("db_query_seconds", {"query": "salts_by_signature"})
 def salts_by_signature(sig: str) -> List[Dict[str, Any]]:
-    import re
-    with db() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-          SELECT ps.salt_name, ps.salt_pos
-          FROM products_in p
-          JOIN product_salts ps ON ps.product_id=p.id
-          WHERE p.salt_signature=%s
-          ORDER BY ps.salt_pos, ps.salt_name
-        """,
-            (sig,),
-        )
-        rows = cur.fetchall()
+    with db() as conn:
+        salts = signature_salts(conn, sig)  # PK lookup on the signatures table
+        if salts is not None:
+            return salts
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+              SELECT ps.salt_name, ps.salt_pos
+              FROM products_in p
+              JOIN product_salts ps ON ps.product_id=p.id
+              WHERE p.salt_signature=%s
+              ORDER BY ps.salt_pos, ps.salt_name
+            """,
+                (sig,),
+            )
+            rows = cur.fetchall()
     # Normalize whitespace + case for dedup, keep first encountered per (normalized,pos)
-    seen = set()
-    out: List[Dict[str, Any]] = []
-    for name, pos in rows:
-        norm_key = (re.sub(r"\s+", " ", name.strip().lower()), pos)
-        if norm_key in seen:
-            continue
-        seen.add(norm_key)
-        # Return salt name cleaned (single spaces) but preserve original casing heuristically via title if excessive spacing
-        clean = re.sub(r"\s+", " ", name.strip())
-        out.append({"salt_pos": pos, "salt_name": clean})
-    return out
+    return dedup_salt_rows(rows)
 
+@metrics.timer("db_query_seconds", {"query": "brands_by_signature"})
 def brands_by_signature(sig: str) -> List[Dict[str, Any]]:
     with db() as conn, conn.cursor() as cur:
         cur.execute(
@@ -329,6 +507,7 @@ def brands_by_signature(sig: str) -> List[Dict[str, Any]]:
             for r in cur.fetchall()
         ]
 
+@metrics.timer("db_query_seconds", {"query": "jana_by_signature"})
 def jana_by_signature(sig: str) -> List[Dict[str, Any]]:
     with db() as conn, conn.cursor() as cur:
         cur.execute(
@@ -351,12 +530,14 @@ def jana_by_signature(sig: str) -> List[Dict[str, Any]]:
             for r in cur.fetchall()
         ]
 
+@metrics.timer("db_query_seconds", {"query": "nppa_by_signature"})
 def nppa_by_signature(sig: str) -> Optional[float]:
     with db() as conn, conn.cursor() as cur:
         cur.execute("SELECT MIN(ceiling_price) FROM nppa_ceiling_prices WHERE salt_signature=%s", (sig,))
         row = cur.fetchone();
         return float(row[0]) if row and row[0] is not None else None
 
+@metrics.timer("db_query_seconds", {"query": "nppa_by_signature_or_generic"})
 def nppa_by_signature_or_generic(sig: str) -> Optional[float]:
     # First exact signature
     exact = nppa_by_signature(sig)
@@ -401,24 +582,7 @@ def alternatives(signature: Optional[str] = None, name: Optional[str] = None):
 
     prices = [b["mrp_inr"] for b in brands if b["mrp_inr"] is not None]
     jana_prices = [j["mrp_inr"] for j in jana if j["mrp_inr"] is not None]
-    all_prices = prices + jana_prices
-    summary = None
-    if all_prices:
-        sorted_all = sorted(all_prices)
-        q2 = statistics.median(sorted_all)
-        q1 = sorted_all[len(sorted_all)//4]
-        q3 = sorted_all[(3*len(sorted_all))//4]
-        summary = {
-            "min_price": sorted_all[0],
-            "q1": q1,
-            "median": q2,
-            "q3": q3,
-            "max_price": sorted_all[-1],
-            "count": len(sorted_all),
-            "n_brands": len(prices),
-            "n_jana": len(jana_prices),
-            "nppa_ceiling": ceiling,
-        }
+    summary = price_summary(prices, jana_prices, ceiling)
 
     return {
         "signature": sig,
@@ -434,6 +598,7 @@ def alternatives(signature: Optional[str] = None, name: Optional[str] = None):
 from app.intent import classify_intent, has_red_flags
 from app.dbio import get_signature_by_name as dbio_get_signature_by_name
 from app.advise_service import advise_for
+from app.advise_log_writer import get_advise_log_writer, close_advise_log_writer
 
 @app.get("/advise")
 def advise_endpoint(
@@ -458,16 +623,8 @@ def advise_endpoint(
             payload = advise_for(sig, name, intent_final, red_flag=red)
     else:
         payload = advise_for(sig, name, intent_final, red_flag=red)
-    # best-effort telemetry log
-    try:
-        import psycopg
-        with db() as conn, conn.cursor() as cur:
-            cur.execute(
-                """INSERT INTO advise_logs (user_query, name, signature, intent, success, notes) VALUES (%s,%s,%s,%s,%s,%s)""",
-                (query, name, sig, intent_final, True, None),
-            )
-    except Exception:
-        pass
+    # best-effort telemetry log, written in batches off the request path
+    get_advise_log_writer().log(query, name, sig, intent_final, True, None)
     payload["intent"] = intent_final
     payload["red_flag"] = red
     return payload
@@ -484,11 +641,34 @@ class AgentReply(BaseModel):
     answer: Optional[str] = None
     have_monograph: bool = False
     have_alternatives: bool = False
+    timings_ms: Dict[str, float] = {}
+    timed_out: bool = False
 
 @app.post("/agent/message", response_model=AgentReply)
-def agent_message(payload: AgentRequest = Body(...)):
-    out = run_turn(payload.session_id, payload.message)
-    return out
+async def agent_message(payload: AgentRequest = Body(...)):
+    from app.langgraph_agent import arun_turn  # imported on first turn unless warmed up
+    return await arun_turn(payload.session_id, payload.message)
+
+@app.post("/agent/stream")
+async def agent_stream(payload: AgentRequest = Body(...)):
+    """Server-Sent Events version of /agent/message: resolved, price_summary, answer,
+    token (LLM rewrite chunks, when enabled) and a final done event with the full reply."""
+    from app.langgraph_agent import astream_turn
+
+    async def events():
+        async for event, data in astream_turn(payload.session_id, payload.message):
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/admin/profiles/slowest")
+def slowest_profiles(request: Request):
+    if not profiling.authorized(request.headers):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return {"sample_rate": profiling.SAMPLE_RATE, "requests": profiling.slowest()}
 
 # Prometheus metrics endpoint
 @app.get("/metrics", response_class=PlainTextResponse)
@@ -1,21 +1,29 @@
-import os, re, time, json, requests, psycopg
-from typing import Optional, Dict, Any, Tuple
+import os, re, time, json, random, requests, psycopg
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple, List
 from dotenv import load_dotenv
-from lxml import html
+from functools import lru_cache
 from .normalization import norm_term
 from .dailymed_client import search_label, get_sections_by_setid
 from .openfda_client import fetch_by_ingredient
+from .ext_http import RateLimiter
+from . import metrics
+from .profiling import ProfiledCursor, run_in_context
 
 load_dotenv()
 
-SEARCH_URL = "https://wsearch.nlm.nih.gov/ws/query"
+SEARCH_URL = os.getenv("MEDLINE_SEARCH_URL", "https://wsearch.nlm.nih.gov/ws/query")
 HEADERS = {"User-Agent": "india-med-bot/0.1 (educational only)"}
+# NLM asks MedlinePlus web service clients to stay under 85 requests/minute
+RATE_LIMIT_PER_MIN = int(os.getenv("MEDLINE_RATE_LIMIT_PER_MIN", "80"))
+_limiter = RateLimiter(RATE_LIMIT_PER_MIN)
 
 
 def db():
     return psycopg.connect(
         host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS")
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        cursor_factory=ProfiledCursor,
     )
 
 
@@ -32,6 +40,18 @@ def cache_ing_get(term_norm: str) -> Optional[Dict[str, Any]]:
         return {"title": title, "url": url, "sections": sections}
 
 
+def cache_ing_get_many(term_norms: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Bulk variant of cache_ing_get: one ``= ANY`` query for all terms of a signature."""
+    if not term_norms:
+        return {}
+    with db() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT term_norm, topic_title, topic_url, sections FROM medline_cache_by_ingredient WHERE term_norm = ANY(%s)",
+            (list(term_norms),),
+        )
+        return {r[0]: {"title": r[1], "url": r[2], "sections": r[3]} for r in cur.fetchall()}
+
+
 def cache_ing_put(term_norm: str, title: str, url: str, raw: Dict[str, Any], sections: Dict[str, Any]):
     with db() as conn, conn.cursor() as cur:
         cur.execute(
@@ -49,60 +69,121 @@ def cache_ing_put(term_norm: str, title: str, url: str, raw: Dict[str, Any], sec
         )
 
 
+@metrics.timer("external_request_seconds", {"source": "medlineplus"})
 def http_get(url: str, params: dict | None = None, tries: int = 3, pause: float = 0.7):
     last = None
-    for _ in range(tries):
+    for attempt in range(tries):
+        _limiter.wait()
         try:
             r = requests.get(url, params=params or {}, headers=HEADERS, timeout=25)
             if r.status_code == 200:
                 return r
             last = r
+            if 400 <= r.status_code < 500 and r.status_code != 429:
+                break  # client errors won't change on retry
         except requests.RequestException as e:
             last = e
-        time.sleep(pause)
+        if attempt < tries - 1:
+            time.sleep(pause * (2 ** attempt) + random.uniform(0, pause / 2))
     if hasattr(last, "raise_for_status"):
         last.raise_for_status()
     raise RuntimeError(f"HTTP failed for {url} params={params} last={last}")
 
 
+# --- Negative cache: ingredients for which every query variant definitively returned no topic
+NEGATIVE_TTL_DAYS = int(os.getenv("MEDLINE_NEGATIVE_TTL_DAYS", "3"))
+_neg_mem: dict[str, float] = {}
+
+
+def negative_cache_hit(term_norm: str) -> bool:
+    ts = _neg_mem.get(term_norm)
+    if ts is not None:
+        if time.time() - ts <= NEGATIVE_TTL_DAYS * 86400:
+            return True
+        _neg_mem.pop(term_norm, None)
+    try:
+        with db() as conn, conn.cursor() as cur:
+            cur.execute(
+                """SELECT 1 FROM medline_negative_cache
+                WHERE term_norm=%s AND checked_at > NOW() - make_interval(days => %s)""",
+                (term_norm, NEGATIVE_TTL_DAYS),
+            )
+            hit = cur.fetchone() is not None
+    except Exception:
+        return False  # table may not be migrated yet
+    if hit:
+        _neg_mem[term_norm] = time.time()
+    return hit
+
+
+def negative_cache_put(term_norm: str, reason: str = "no_topic") -> None:
+    _neg_mem[term_norm] = time.time()
+    try:
+        with db() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+              INSERT INTO medline_negative_cache (term_norm, reason, checked_at)
+              VALUES (%s,%s,NOW())
+              ON CONFLICT (term_norm) DO UPDATE SET reason=excluded.reason, checked_at=NOW()
+            """,
+                (term_norm, reason),
+            )
+    except Exception:
+        pass
+
+
+@lru_cache(maxsize=None)
+def _xpath(expr: str):
+    """Compiled XPath, built on first use (lxml is only imported once a page is parsed)."""
+    from lxml import etree
+    return etree.XPath(expr)
+
+
+# Only the fields we use: document/@url and its title content
+_SEARCH_DOCS = "/nlmSearchResult/list/document"
+_DOC_TITLE = "string(content[@name='title'])"
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("MEDLINE_SEARCH_WORKERS", "8")), thread_name_prefix="medline-search")
+
+
+def parse_search_documents(xml: bytes | str) -> list[Dict[str, Optional[str]]]:
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+    from lxml import etree
+
+    root = etree.fromstring(xml, parser=etree.XMLParser(resolve_entities=False, huge_tree=True))
+    title = _xpath(_DOC_TITLE)
+    return [{"url": d.get("url") or None, "title": title(d) or None} for d in _xpath(_SEARCH_DOCS)(root)]
+
+
 def medline_search(ingredient: str) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
     """
     Returns (title, url, raw_dict). Strategy:
-    1) Search healthTopics for <ingredient>
-    2) If no good hit, try "<ingredient> oral", then "<ingredient> tablet", then "<ingredient> medication"
-    3) Pick the first document whose title includes the ingredient (case-insensitive); else first doc with a @url.
+    1) Search healthTopics for <ingredient>, "<ingredient> oral", "<ingredient> tablet" and
+       "<ingredient> medication" concurrently.
+    2) Best-ranked hit wins: a document whose title includes the ingredient (case-insensitive)
+       beats a document that only has a @url; ties go to the earlier query variant.
+    3) When every variant answered without any document URL the term goes into the negative
+       cache (MEDLINE_NEGATIVE_TTL_DAYS) and later calls return immediately.
+    raw_dict is a compact {"query", "documents": [{"url", "title"}]} record of the winning variant.
     """
-    import xmltodict, re as _re
-
-    def _try(q: str) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
-        r = http_get(SEARCH_URL, {"db": "healthTopics", "term": q})
-        raw = xmltodict.parse(r.text)
-        docs = raw.get("nlmSearchResult", {}).get("list", {}).get("document", []) or []
-        if isinstance(docs, dict):
-            docs = [docs]
+    if os.getenv("NO_EXTERNAL", "0") in ("1","true","yes"):
+        return None, None, {}
+    term_norm = norm_term(ingredient)
+    if negative_cache_hit(term_norm):
+        return None, None, {}
 
-        pat = _re.compile(_re.escape(ingredient), _re.IGNORECASE)
-        best_title, best_url = None, None
+    pat = re.compile(re.escape(ingredient.strip()), re.IGNORECASE)
 
+    def _try(q: str):
+        docs = parse_search_documents(http_get(SEARCH_URL, {"db": "healthTopics", "term": q}).content)
+        raw = {"query": q, "documents": docs}
         for d in docs:
-            url = d.get("@url") or None
-            title = None
-            for c in d.get("content", []) or []:
-                if c.get("@name") == "title":
-                    title = c.get("#text"); break
-            if url and title and pat.search(title or ""):
-                return title, url, raw
-
+            if d["url"] and d["title"] and pat.search(d["title"]):
+                return 0, d["title"], d["url"], raw
         for d in docs:
-            url = d.get("@url") or None
-            if url:
-                title = None
-                for c in d.get("content", []) or []:
-                    if c.get("@name") == "title":
-                        title = c.get("#text"); break
-                return (title or "MedlinePlus Topic"), url, raw
-
-        return None, None, raw
+            if d["url"]:
+                return 1, (d["title"] or "MedlinePlus Topic"), d["url"], raw
+        return None, None, None, raw
 
     queries = [
         ingredient.strip(),
@@ -110,13 +191,31 @@ def medline_search(ingredient: str) -> Tuple[Optional[str], Optional[str], Dict[
         f"{ingredient} tablet",
         f"{ingredient} medication",
     ]
-    if os.getenv("NO_EXTERNAL", "0") in ("1","true","yes"):
-        return None, None, {}
-    for q in queries:
-        t, u, raw = _try(q)
-        if u:
-            return t, u, raw
-    return None, None, raw
+    futures = [_SEARCH_POOL.submit(run_in_context(_try), q) for q in queries]
+    results: list = [None] * len(queries)
+    failed = False
+    best = None  # (rank, idx)
+    for idx, fut in enumerate(futures):
+        try:
+            results[idx] = fut.result()
+        except Exception:
+            failed = True
+            continue
+        rank = results[idx][0]
+        if rank is not None and (best is None or (rank, idx) < best):
+            best = (rank, idx)
+        if best is not None and best[0] == 0:
+            # Earlier variants are already resolved, nothing can outrank this hit
+            for f in futures[idx + 1:]:
+                f.cancel()
+            break
+    if best is not None:
+        _, title, url, raw = results[best[1]]
+        return title, url, raw
+    if not failed:
+        negative_cache_put(term_norm)
+    last_raw = next((r[3] for r in reversed(results) if r), {})
+    return None, None, last_raw
 
 
 SECTION_KEYS = {
@@ -126,45 +225,56 @@ SECTION_KEYS = {
     "side_effects": ["side effects"],
 }
 
+# Compiled once: heading XPath (on first parse), whitespace collapse and the tag sets used while walking siblings
+_HEADINGS = "//h2|//h3"
+_WS = re.compile(r"\s+")
+_HEADING_TAGS = frozenset(("h2", "h3"))
+_CONTENT_TAGS = frozenset(("p", "ul", "ol", "div"))
+
+
+@lru_cache(maxsize=4096)
+def _classify_heading(title: str) -> Optional[str]:
+    """Map a lowercased heading to its bucket (first match in SECTION_KEYS order).
+
+    MedlinePlus reuses the same few dozen headings on every page, so results are memoized.
+    """
+    for bucket, keys in SECTION_KEYS.items():
+        if any(k in title for k in keys):
+            return bucket
+    return None
+
 
 def extract_sections_from_html(html_text: str) -> Dict[str, Any]:
+    from lxml import html
+
     tree = html.fromstring(html_text)
     sections: Dict[str, str] = {}
 
-    def text_of(node):
-        return re.sub(r"\s+", " ", (node.text_content() or "").strip())
-
-    headings = tree.xpath("//h2|//h3")
-    for i, h in enumerate(headings):
-        title = text_of(h).lower()
+    for h in _xpath(_HEADINGS)(tree):
+        bucket = _classify_heading(_WS.sub(" ", (h.text_content() or "").strip()).lower())
+        if bucket is None:
+            continue  # only walk siblings for headings we keep
         content_nodes = []
         sib = h.getnext()
-        while sib is not None and sib.tag not in ("h2", "h3"):
-            if sib.tag in ("p", "ul", "ol", "div"):
-                content_nodes.append(text_of(sib))
+        while sib is not None and sib.tag not in _HEADING_TAGS:
+            if sib.tag in _CONTENT_TAGS:
+                text = _WS.sub(" ", (sib.text_content() or "").strip())
+                if text:
+                    content_nodes.append(text)
             sib = sib.getnext()
-        content = "\n".join([c for c in content_nodes if c])
-
-        bucket = None
-        if any(k in title for k in SECTION_KEYS["uses"]):
-            bucket = "uses"
-        elif any(k in title for k in SECTION_KEYS["how_to_take"]):
-            bucket = "how_to_take"
-        elif any(k in title for k in SECTION_KEYS["precautions"]):
-            bucket = "precautions"
-        elif any(k in title for k in SECTION_KEYS["side_effects"]):
-            bucket = "side_effects"
-        if bucket and content:
-            sections[bucket] = content
+        if content_nodes:
+            sections[bucket] = "\n".join(content_nodes)
 
     return sections
 
 
-def get_or_fetch_ingredient_topic(ingredient: str) -> Optional[Dict[str, Any]]:
+def get_or_fetch_ingredient_topic(ingredient: str, skip_cache: bool = False) -> Optional[Dict[str, Any]]:
+    """Cached topic, else search + fetch MedlinePlus. ``skip_cache``: a bulk read already missed."""
     key = norm_term(ingredient)
-    cached = cache_ing_get(key)
-    if cached:
-        return cached
+    if not skip_cache:
+        cached = cache_ing_get(key)
+        if cached:
+            return cached
 
     if os.getenv("NO_EXTERNAL", "0") in ("1","true","yes"):
         return None
@@ -178,7 +288,11 @@ def get_or_fetch_ingredient_topic(ingredient: str) -> Optional[Dict[str, Any]]:
     return payload
 
 def get_or_fetch_ingredient_topic_with_fallback(ingredient: str) -> Optional[Dict[str, Any]]:
-    primary = get_or_fetch_ingredient_topic(ingredient)
+    return _with_fallback(ingredient, get_or_fetch_ingredient_topic(ingredient))
+
+
+def _with_fallback(ingredient: str, primary: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """``primary`` (the MedlinePlus topic, if any) when it has sections, else DailyMed / openFDA."""
     if primary and primary.get("sections"):
         return primary
     # DailyMed fallback
@@ -206,3 +320,28 @@ def get_or_fetch_ingredient_topic_with_fallback(ingredient: str) -> Optional[Dic
         except Exception:
             pass
     return primary
+
+
+def cached_ingredient_topics(ingredients: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Cache-only lookup aligned with ``ingredients`` (None where no topic with sections is cached)."""
+    keys = [norm_term(i) for i in ingredients]
+    cached = cache_ing_get_many(list(dict.fromkeys(keys)))
+    return [hit if hit and hit.get("sections") else None for hit in (cached.get(k) for k in keys)]
+
+
+def get_or_fetch_ingredient_topics_with_fallback(ingredients: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Bulk variant aligned with ``ingredients``: cached topics with sections come from a
+    single cache read; only the remaining ingredients take the per-term fetch/fallback path."""
+    keys = [norm_term(i) for i in ingredients]
+    cached = cache_ing_get_many(list(dict.fromkeys(keys)))
+    out: List[Optional[Dict[str, Any]]] = []
+    for ing, key in zip(ingredients, keys):
+        hit = cached.get(key)
+        if hit and hit.get("sections"):
+            out.append(hit)
+        else:
+            # The bulk read is this term's cache lookup: a cached topic without sections goes
+            # straight to the fallbacks, a missing one to MedlinePlus without re-reading the cache
+            primary = hit or get_or_fetch_ingredient_topic(ing, skip_cache=True)
+            out.append(_with_fallback(ing, primary))
+    return out
@@ -1,24 +1,91 @@
-"""Lightweight in-process metrics counters exposed at /metrics.
+"""Lightweight in-process metrics exposed at /metrics.
 
-Provides counter helpers used by external source clients and fallback merge logic.
-Thread-safety: simple GIL-protected increments (no heavy concurrency expected here).
+Provides counter helpers used by external source clients and fallback merge logic,
+plus histograms (latency, seconds), gauges and ``timer`` for per-stage timings.
+
+Thread-safety: counters and histograms are sharded per thread. Each thread only
+writes its own shard, so the hot path needs no lock and no update is lost to a racing
+read-modify-write; shards are merged when /metrics renders. Shards of finished threads
+are folded into a retired shard. Gauges (rare, set-style) sit behind one lock.
+
+Multi-process (several uvicorn workers): set ``METRICS_MULTIPROC_DIR``. Every process
+then publishes its merged values to an mmap'd file ``<dir>/metrics_<pid>.db`` every
+``METRICS_FLUSH_SEC`` and /metrics aggregates all files: counters and histograms are
+summed (files of exited workers keep counting), gauges are merged over live workers
+by the mode given when they are set: ``sum`` (default; in-flight requests, queue
+depths), ``max`` (per-worker durations such as the startup warm-up) or ``min``
+(per-worker up/down flags: 0 as soon as one worker sees the component down).
+Clear the directory when the whole service restarts, as with the Prometheus client.
 """
 
 from __future__ import annotations
+import os
+import json
+import mmap
 import time
-from typing import Dict, Tuple
+import atexit
+import struct
+import asyncio
+import functools
+import threading
+from typing import Dict, Tuple, List, Sequence, Any, Callable
+
+Key = Tuple[str, Tuple[Tuple[str,str], ...]]
 
-_COUNTERS: Dict[Tuple[str, Tuple[Tuple[str,str], ...]], int] = {}
 _START = time.time()
 
+# Seconds; covers cache hits (ms) through slow upstream calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+FLUSH_SEC = float(os.getenv("METRICS_FLUSH_SEC", "1.0"))
+
+
+class _Shard:
+	__slots__ = ("thread", "counters", "hist")
+
+	def __init__(self, thread):
+		self.thread = thread
+		self.counters: Dict[Key, float] = {}
+		# key -> [bucket upper bounds, per-bucket counts (last is +Inf), sum, count]
+		self.hist: Dict[Key, list] = {}
+
+
+_local = threading.local()
+_SHARDS: List[_Shard] = []
+_SHARDS_LOCK = threading.Lock()
+_RETIRED = _Shard(None)
+_GAUGES: Dict[Key, float] = {}
+_GAUGES_LOCK = threading.Lock()
+# gauge name -> cross-process merge mode ("sum" when absent); published with the values
+_GAUGE_MERGE: Dict[str, str] = {}
+GAUGE_MERGE_MODES = ("sum", "max", "min")
+# Optional per-event hook (kind, name, labels, value); used by app.profiling
+_LISTENER: Callable[[str, str, Dict[str,str] | None, float], None] | None = None
+
+def set_listener(fn: Callable[[str, str, Dict[str,str] | None, float], None] | None):
+	global _LISTENER
+	_LISTENER = fn
+
+def _shard() -> _Shard:
+	s = getattr(_local, "shard", None)
+	if s is None:
+		s = _local.shard = _Shard(threading.current_thread())
+		with _SHARDS_LOCK:
+			_SHARDS.append(s)
+	return s
+
 def _key(name: str, labels: Dict[str,str] | None = None):
 	if not labels:
 		return (name, tuple())
 	return (name, tuple(sorted(labels.items())))
 
 def inc(name: str, labels: Dict[str,str] | None = None, value: int = 1):
+	c = _shard().counters
 	k = _key(name, labels)
-	_COUNTERS[k] = _COUNTERS.get(k, 0) + value
+	c[k] = c.get(k, 0) + value
+	if _LISTENER is not None:
+		_LISTENER("counter", name, labels, value)
 
 # Backwards compatibility alias
 def incr(name: str, labels: Dict[str,str] | None = None, value: int = 1):  # pragma: no cover
@@ -42,14 +109,302 @@ def external_error(source: str):
 def fallback_fill(source: str, bucket: str):
 	inc("fallback_fill_total", {"source": source, "bucket": bucket})
 
+def _set_merge(name: str, merge: str | None):
+	if merge is None:
+		return
+	if merge not in GAUGE_MERGE_MODES:
+		raise ValueError(f"unknown gauge merge mode: {merge}")
+	_GAUGE_MERGE[name] = merge
+
+def set_gauge(name: str, value: float, labels: Dict[str,str] | None = None, merge: str | None = None):
+	"""Set a gauge; ``merge`` (sum/max/min) picks how workers' values combine in multi-process mode."""
+	with _GAUGES_LOCK:
+		_set_merge(name, merge)
+		_GAUGES[_key(name, labels)] = value
+
+def inc_gauge(name: str, value: float = 1, labels: Dict[str,str] | None = None, merge: str | None = None):
+	k = _key(name, labels)
+	with _GAUGES_LOCK:
+		_set_merge(name, merge)
+		_GAUGES[k] = _GAUGES.get(k, 0) + value
+
+def observe(name: str, value: float, labels: Dict[str,str] | None = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+	"""Record one sample (seconds for latencies). Buckets are fixed by the first sample of a series."""
+	hist = _shard().hist
+	k = _key(name, labels)
+	h = hist.get(k)
+	if h is None:
+		bounds = tuple(sorted(buckets))
+		h = hist[k] = [bounds, [0] * (len(bounds) + 1), 0.0, 0]
+	bounds, counts = h[0], h[1]
+	i = 0
+	while i < len(bounds) and value > bounds[i]:
+		i += 1
+	counts[i] += 1
+	h[2] += value
+	h[3] += 1
+	if _LISTENER is not None:
+		_LISTENER("histogram", name, labels, value)
+
+class timer:
+	"""Time a block or a function into histogram ``name`` (seconds).
+
+	with metrics.timer("db_query_seconds", {"query": "salts"}): ...
+	@metrics.timer("rxnorm_lookup_seconds")
+	def rxnorm_lookup(...): ...
+	"""
+	def __init__(self, name: str, labels: Dict[str,str] | None = None):
+		self.name = name
+		self.labels = labels
+		self._t0 = 0.0
+
+	def __enter__(self):
+		self._t0 = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		observe(self.name, time.perf_counter() - self._t0, self.labels)
+		return False
+
+	def __call__(self, fn):
+		if asyncio.iscoroutinefunction(fn):
+			@functools.wraps(fn)
+			async def awrapper(*args, **kwargs):
+				with timer(self.name, self.labels):
+					return await fn(*args, **kwargs)
+			return awrapper
+
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			with timer(self.name, self.labels):
+				return fn(*args, **kwargs)
+		return wrapper
+
+# ------------------ merging ------------------
+
+def _merge_counters(into: Dict[Key, float], src: Dict[Key, float]):
+	for k, v in src.items():
+		into[k] = into.get(k, 0) + v
+
+def _merge_hist(into: Dict[Key, list], src: Dict[Key, Any]):
+	for k, (bounds, counts, total, n) in src.items():
+		h = into.get(k)
+		if h is None:
+			into[k] = [tuple(bounds), list(counts), total, n]
+		elif tuple(bounds) == h[0]:
+			h[1] = [a + b for a, b in zip(h[1], counts)]
+			h[2] += total
+			h[3] += n
+
+def _merge_gauges(into: Dict[Key, float], src: Dict[Key, float], modes: Dict[str, str]):
+	for k, v in src.items():
+		if k not in into:
+			into[k] = v
+			continue
+		mode = modes.get(k[0], "sum")
+		if mode == "max":
+			into[k] = max(into[k], v)
+		elif mode == "min":
+			into[k] = min(into[k], v)
+		else:
+			into[k] += v
+
+def _collect_local() -> Tuple[Dict[Key, float], Dict[Key, list], Dict[Key, float]]:
+	"""Merge every thread shard of this process (folding shards of dead threads)."""
+	counters: Dict[Key, float] = {}
+	hist: Dict[Key, list] = {}
+	with _SHARDS_LOCK:
+		live = []
+		for s in _SHARDS:
+			if s.thread is not None and not s.thread.is_alive():
+				# owner is gone: nobody writes this shard any more
+				_merge_counters(_RETIRED.counters, s.counters)
+				_merge_hist(_RETIRED.hist, s.hist)
+			else:
+				live.append(s)
+		_SHARDS[:] = live
+		shards = live + [_RETIRED]
+	for s in shards:
+		# dict() of a plain dict is a single C-level copy under the GIL, safe against
+		# the owning thread inserting concurrently
+		_merge_counters(counters, dict(s.counters))
+		for k, h in dict(s.hist).items():
+			counts = list(h[1])
+			# count derived from the copied buckets so _count always equals the +Inf bucket
+			_merge_hist(hist, {k: (h[0], counts, h[2], sum(counts))})
+	with _GAUGES_LOCK:
+		gauges = dict(_GAUGES)
+	return counters, hist, gauges
+
+# ------------------ multi-process files ------------------
+
+_HEADER = struct.Struct("<QQ")  # seqlock counter (odd while writing), payload length
+_mm_lock = threading.Lock()
+_mm: Dict[str, Any] = {"file": None, "map": None, "seq": 0}
+
+def _encode_key(k: Key):
+	return [k[0], [list(p) for p in k[1]]]
+
+def _decode_key(raw) -> Key:
+	return (raw[0], tuple((a, b) for a, b in raw[1]))
+
+def _path_for(pid: int) -> str:
+	return os.path.join(MULTIPROC_DIR or "", f"metrics_{pid}.db")
+
+def flush_to_file():
+	"""Publish this process's merged values to its mmap file (multi-process mode only)."""
+	if not MULTIPROC_DIR:
+		return
+	counters, hist, gauges = _collect_local()
+	payload = json.dumps({
+		"counters": [[_encode_key(k), v] for k, v in counters.items()],
+		"hist": [[_encode_key(k), list(h[0]), h[1], h[2], h[3]] for k, h in hist.items()],
+		"gauges": [[_encode_key(k), v] for k, v in gauges.items()],
+		"gauge_merge": dict(_GAUGE_MERGE),
+	}).encode("utf-8")
+	need = _HEADER.size + len(payload)
+	with _mm_lock:
+		mm = _mm["map"]
+		if mm is None or len(mm) < need:
+			size = 1 << max(16, need.bit_length())
+			if mm is not None:
+				mm.close()
+				_mm["file"].close()
+			os.makedirs(MULTIPROC_DIR, exist_ok=True)
+			f = open(_path_for(os.getpid()), "a+b")
+			f.truncate(size)
+			mm = mmap.mmap(f.fileno(), size)
+			_mm["file"], _mm["map"] = f, mm
+		seq = _mm["seq"] + 1
+		_HEADER.pack_into(mm, 0, seq, 0)  # odd: readers retry
+		mm[_HEADER.size:need] = payload
+		_mm["seq"] = seq + 1
+		_HEADER.pack_into(mm, 0, seq + 1, len(payload))
+
+def _read_file(path: str):
+	with open(path, "rb") as f:
+		try:
+			mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:  # empty file
+			return None
+		with mm:
+			for _ in range(5):
+				seq, n = _HEADER.unpack_from(mm, 0)
+				data = mm[_HEADER.size:_HEADER.size + n]
+				if seq % 2 == 0 and _HEADER.unpack_from(mm, 0)[0] == seq:
+					return json.loads(data) if n else None
+				time.sleep(0.001)
+	return None
+
+def _pid_alive(pid: int) -> bool:
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		return True
+	return True
+
+def _collect_all():
+	counters, hist, gauges = _collect_local()
+	if not MULTIPROC_DIR or not os.path.isdir(MULTIPROC_DIR):
+		return counters, hist, gauges
+	me = os.getpid()
+	modes = dict(_GAUGE_MERGE)
+	live_gauges = []
+	for fn in os.listdir(MULTIPROC_DIR):
+		if not (fn.startswith("metrics_") and fn.endswith(".db")):
+			continue
+		try:
+			pid = int(fn[len("metrics_"):-len(".db")])
+		except ValueError:
+			continue
+		if pid == me:
+			continue  # live values above are fresher than our own file
+		try:
+			data = _read_file(os.path.join(MULTIPROC_DIR, fn))
+		except (OSError, ValueError):
+			continue
+		if not data:
+			continue
+		_merge_counters(counters, {_decode_key(k): v for k, v in data["counters"]})
+		_merge_hist(hist, {_decode_key(k): (b, c, t, n) for k, b, c, t, n in data["hist"]})
+		if _pid_alive(pid):
+			live_gauges.append({_decode_key(k): v for k, v in data["gauges"]})
+			for name, mode in (data.get("gauge_merge") or {}).items():
+				modes.setdefault(name, mode)
+	# merged after every file is read: a mode may only be known from another worker's file
+	for g in live_gauges:
+		_merge_gauges(gauges, g, modes)
+	return counters, hist, gauges
+
+_flusher_started = False
+
+def _start_flusher():
+	global _flusher_started
+	if _flusher_started or not MULTIPROC_DIR:
+		return
+	_flusher_started = True
+
+	def run():
+		while True:
+			time.sleep(FLUSH_SEC)
+			try:
+				flush_to_file()
+			except Exception:  # never take the worker down over metrics
+				pass
+
+	threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+	atexit.register(flush_to_file)
+
+_start_flusher()
+
+# ------------------ rendering ------------------
+
+def _fmt_labels(labels, extra: str | None = None) -> str:
+	parts = [f"{k}=\"{v}\"" for k,v in labels]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt_le(bound: float) -> str:
+	return repr(float(bound))
+
+def _fmt_num(v: float):
+	return int(v) if float(v).is_integer() else v
+
+def histogram_snapshot() -> Dict[Key, Tuple[Tuple[float, ...], List[int], float, int]]:
+	_, hist, _ = _collect_all()
+	return {k: (h[0], h[1], h[2], h[3]) for k, h in hist.items()}
+
 def snapshot() -> str:
+	counters, hist, gauges = _collect_all()
 	lines = []
-	for (name, labels), value in sorted(_COUNTERS.items()):
+	for (name, labels), value in sorted(counters.items()):
 		if labels:
 			label_txt = ",".join(f"{k}=\"{v}\"" for k,v in labels)
-			lines.append(f"{name}{{{label_txt}}} {value}")
+			lines.append(f"{name}{{{label_txt}}} {_fmt_num(value)}")
 		else:
-			lines.append(f"{name} {value}")
+			lines.append(f"{name} {_fmt_num(value)}")
+	typed = set()
+	for (name, labels), value in sorted(gauges.items()):
+		if name not in typed:
+			lines.append(f"# TYPE {name} gauge")
+			typed.add(name)
+		lines.append(f"{name}{_fmt_labels(labels)} {_fmt_num(value)}")
+	for (name, labels), (bounds, counts, total, n) in sorted(hist.items()):
+		if name not in typed:
+			lines.append(f"# TYPE {name} histogram")
+			typed.add(name)
+		cum = 0
+		for bound, c in zip(bounds, counts):
+			cum += c
+			le = 'le="%s"' % _fmt_le(bound)
+			lines.append(f"{name}_bucket{_fmt_labels(labels, le)} {cum}")
+		inf = 'le="+Inf"'
+		lines.append(f"{name}_bucket{_fmt_labels(labels, inf)} {n}")
+		lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+		lines.append(f"{name}_count{_fmt_labels(labels)} {n}")
 	# gauge
 	lines.append(f"app_uptime_seconds {int(time.time() - _START)}")
 	return "\n".join(lines) + "\n"
@@ -57,11 +412,17 @@ def snapshot() -> str:
 def render_prometheus():  # used by /metrics endpoint
 	return snapshot()
 
-def reset():  # test helper
-	_COUNTERS.clear()
+def reset():  # test helper (this process only)
+	with _SHARDS_LOCK:
+		for s in _SHARDS + [_RETIRED]:
+			s.counters.clear()
+			s.hist.clear()
+	with _GAUGES_LOCK:
+		_GAUGES.clear()
 	global _START
 	_START = time.time()
 
 __all__ = [
-	"cache_hit","cache_miss","external_call","external_success","external_error","fallback_fill","render_prometheus","reset","incr"
+	"cache_hit","cache_miss","external_call","external_success","external_error","fallback_fill","render_prometheus","reset","incr",
+	"observe","timer","set_gauge","inc_gauge","DEFAULT_BUCKETS","flush_to_file","set_listener"
 ]
@@ -0,0 +1,238 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when it carries ``X-Profile: 1`` (or ``?_profile=1``) together with
+``X-Admin-Token`` matching ``PROFILE_ADMIN_TOKEN``, or when it is picked by sampling
+(``PROFILE_SAMPLE_RATE``). The active ``Profile`` lives in a contextvar, so everything the
+handler does on its thread(s) is attributed to it:
+
+- DB queries through ``ProfiledCursor`` (count + time),
+- every ``metrics.timer`` / ``metrics.observe`` sample, as named stages
+  (``db_query:salts_by_signature``, ``ext_lookup:dailymed`` ...), plus explicit ``stage()`` blocks,
+- upstream calls (``external_request_seconds``) per source,
+- cache hits / misses per source and layer.
+
+Explicitly profiled requests get a ``Server-Timing`` header and a ``_profile`` field in JSON
+bodies. Sampled requests are kept in a top-``PROFILE_SLOWEST_N`` list that is logged and
+served at ``/admin/profiles/slowest``.
+"""
+from __future__ import annotations
+import os
+import hmac
+import time
+import heapq
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import psycopg
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN") or None
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+SLOWEST_N = int(os.getenv("PROFILE_SLOWEST_N", "20"))
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("request_profile", default=None)
+
+
+class Profile:
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.t0 = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self._lock = threading.Lock()  # pools may report into the same profile
+        self.stages: Dict[str, List[float]] = {}  # name -> [count, ms]
+        self.db = [0, 0.0]
+        self.external: Dict[str, List[float]] = {}
+        self.cache_hits: Dict[str, int] = {}
+        self.cache_misses: Dict[str, int] = {}
+
+    def add(self, bucket: Dict[str, List[float]], name: str, ms: float) -> None:
+        with self._lock:
+            item = bucket.setdefault(name, [0, 0.0])
+            item[0] += 1
+            item[1] += ms
+
+    def add_db(self, ms: float) -> None:
+        with self._lock:
+            self.db[0] += 1
+            self.db[1] += ms
+
+    def count(self, bucket: Dict[str, int], name: str, n: float = 1) -> None:
+        with self._lock:
+            bucket[name] = bucket.get(name, 0) + int(n)
+
+    def finish(self) -> "Profile":
+        self.total_ms = round((time.perf_counter() - self.t0) * 1000, 2)
+        return self
+
+    def breakdown(self) -> Dict[str, Any]:
+        def rows(bucket):
+            return {k: {"count": int(c), "ms": round(ms, 2)} for k, (c, ms) in sorted(bucket.items(), key=lambda x: -x[1][1])}
+
+        with self._lock:
+            return {
+                "total_ms": self.total_ms,
+                "stages": rows(self.stages),
+                "db": {"queries": self.db[0], "ms": round(self.db[1], 2)},
+                "external": rows(self.external),
+                "cache": {"hits": dict(self.cache_hits), "misses": dict(self.cache_misses)},
+            }
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value (metric names must be tokens)."""
+        def tok(name: str) -> str:
+            return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+        with self._lock:
+            parts = [f'db;dur={self.db[1]:.1f};desc="{self.db[0]} queries"']
+            for src, (n, ms) in self.external.items():
+                parts.append(f'ext_{tok(src)};dur={ms:.1f};desc="{int(n)} calls"')
+            for name, (n, ms) in sorted(self.stages.items(), key=lambda x: -x[1][1])[:10]:
+                parts.append(f"{tok(name)};dur={ms:.1f}")
+        parts.append(f"total;dur={(self.total_ms or 0):.1f}")
+        return ", ".join(parts)
+
+
+def current() -> Optional[Profile]:
+    return _current.get()
+
+
+def activate(profile: Profile):
+    return _current.set(profile)
+
+
+def deactivate(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Attribute a block's wall time to ``name`` when the request is profiled (no-op otherwise)."""
+    prof = _current.get()
+    if prof is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        prof.add(prof.stages, name, (time.perf_counter() - t0) * 1000)
+
+
+def run_in_context(fn):
+    """Wrap a callable submitted to a pool so its work is attributed to the caller's profile."""
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.run(fn, *a, **kw)
+
+
+class ProfiledCursor(psycopg.Cursor):
+    """Cursor that reports query count/time to the active profile (pass as ``cursor_factory``)."""
+
+    def execute(self, query, params=None, **kwargs):
+        prof = _current.get()
+        if prof is None:
+            return super().execute(query, params, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            prof.add_db((time.perf_counter() - t0) * 1000)
+
+    def executemany(self, query, params_seq, **kwargs):
+        prof = _current.get()
+        if prof is None:
+            return super().executemany(query, params_seq, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            prof.add_db((time.perf_counter() - t0) * 1000)
+
+
+def _on_metric(kind: str, name: str, labels: Optional[Dict[str, str]], value: float) -> None:
+    prof = _current.get()
+    if prof is None:
+        return
+    labels = labels or {}
+    if kind == "counter":
+        if name == "cache_hit_total":
+            prof.count(prof.cache_hits, f"{labels.get('source')}/{labels.get('layer')}", value)
+        elif name == "cache_miss_total":
+            prof.count(prof.cache_misses, str(labels.get("source")), value)
+        return
+    if name == "http_request_duration_seconds":
+        return  # the request itself
+    if name == "external_request_seconds":
+        prof.add(prof.external, str(labels.get("source")), value * 1000)
+    stage_name = name[:-len("_seconds")] if name.endswith("_seconds") else name
+    if labels:
+        stage_name += ":" + ",".join(str(v) for _, v in sorted(labels.items()))
+    prof.add(prof.stages, stage_name, value * 1000)
+
+
+metrics.set_listener(_on_metric)
+
+
+# ------------------ request gating + sampling ------------------
+
+def requested(headers, query_params) -> bool:
+    """Explicit profiling: flag + valid admin token (disabled when no token is configured)."""
+    flag = headers.get("x-profile") or query_params.get("_profile")
+    if flag not in ("1", "true", "yes"):
+        return False
+    return authorized(headers)
+
+
+def authorized(headers) -> bool:
+    # constant-time compare; bytes so a non-ASCII header cannot raise
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(
+        (headers.get("x-admin-token") or "").encode(), ADMIN_TOKEN.encode()
+    )
+
+
+def sampled() -> bool:
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+_slowest: List[tuple] = []  # min-heap of (total_ms, seq, label, breakdown)
+_slowest_lock = threading.Lock()
+_seq = 0
+
+
+def record_sample(profile: Profile) -> None:
+    """Keep the slowest N sampled requests; log each one that enters the list."""
+    global _seq
+    entry_ms = profile.total_ms or 0.0
+    with _slowest_lock:
+        _seq += 1
+        if len(_slowest) >= SLOWEST_N and _slowest and entry_ms <= _slowest[0][0]:
+            return
+        item = (entry_ms, _seq, profile.label, profile.breakdown())
+        if len(_slowest) >= SLOWEST_N:
+            heapq.heapreplace(_slowest, item)
+        else:
+            heapq.heappush(_slowest, item)
+    log.info("slow request %s %.1fms %s", profile.label, entry_ms, item[3])
+
+
+def slowest() -> List[Dict[str, Any]]:
+    with _slowest_lock:
+        items = sorted(_slowest, reverse=True)
+    return [{"request": label, "total_ms": ms, "profile": bd} for ms, _, label, bd in items]
+
+
+def reset_samples() -> None:  # test helper
+    with _slowest_lock:
+        _slowest.clear()
+
+
+__all__ = [
+    "Profile", "ProfiledCursor", "stage", "current", "activate", "deactivate", "run_in_context",
+    "requested", "authorized", "sampled", "record_sample", "slowest",
+]
@@ -1,3 +1,6 @@
+# Bump whenever LLM_SYSTEM_PROMPT / LLM_USER_TEMPLATE change: it is part of the rewrite cache key.
+PROMPT_VERSION = "1"
+
 LLM_SYSTEM_PROMPT = """You rewrite patient-facing medicine answers for clarity ONLY.
 
 CRITICAL RULES (do not break these):
@@ -1,10 +1,17 @@
 import os, time, json, random, requests, psycopg
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
 from dotenv import load_dotenv
 from .normalization import norm_term, alias_if_needed
+from .ext_http import RateLimiter
+from . import metrics
 
 load_dotenv()
 RX_BASE = "https://rxnav.nlm.nih.gov/REST"
+# RxNav allows 20 requests/second per IP; enforced per second so a burst of workers cannot exceed it.
+# Callers are batch scripts, so they wait for a free slot.
+RATE_LIMIT_PER_MIN = int(os.getenv("RXNORM_RATE_LIMIT_PER_MIN", "600"))
+_limiter = RateLimiter(max(1, RATE_LIMIT_PER_MIN // 60), max_wait=None, window=1.0)
 
 def db():
     return psycopg.connect(
@@ -13,17 +20,25 @@ def db():
     )
 
 def http_get(url: str, params: dict, tries: int = 3, pause: float = 0.6):
+    """GET through the shared limiter; timeouts and 5xx are retried with exponential backoff.
+
+    Any 4xx (including 429: RxNav is already throttling us) is raised without retrying.
+    """
     last = None
-    for _ in range(tries):
+    for attempt in range(tries):
+        if attempt:
+            time.sleep(pause * 2 ** (attempt - 1) + random.uniform(0, pause / 2))
+        _limiter.wait()
         try:
             r = requests.get(url, params=params, timeout=20)
-            if r.status_code == 200:
-                return r
-            last = r
         except requests.RequestException as e:
             last = e
-    # exponential backoff with jitter
-    time.sleep(pause + random.uniform(0, pause/2))
+            continue
+        if r.status_code == 200:
+            return r
+        last = r
+        if r.status_code < 500:
+            break
     if hasattr(last, "raise_for_status"):
         last.raise_for_status()
     raise RuntimeError(f"HTTP failed for {url} params={params} last={last}")
@@ -56,6 +71,7 @@ def cache_err(term_norm: str, reason: str):
             (term_norm, reason),
         )
 
+@metrics.timer("rxnorm_lookup_seconds")
 def rxnorm_lookup(term: str) -> Tuple[List[str], dict | None]:
     """Return list of RxCUIs for a term, plus raw payload for trace/debug."""
     key = norm_term(term)
@@ -99,3 +115,26 @@ def rxnorm_lookup(term: str) -> Tuple[List[str], dict | None]:
         cache_err(key, "no_rxcui")
 
     return rxcuis, data
+
+def resolve_terms(terms: Iterable[str], workers: int = 8) -> Dict[str, List[str]]:
+    """Look up each distinct term once, ``workers`` at a time; {term: rxcuis}.
+
+    Terms are deduplicated by ``norm_term`` and all spellings of a term share its result.
+    A lookup that raises counts as unresolved ([]); it is not cached, so a later run retries it.
+    """
+    by_key: Dict[str, List[str]] = {}
+    for t in terms:
+        if t:
+            by_key.setdefault(norm_term(t), []).append(t)
+    if not by_key:
+        return {}
+
+    def one(spellings: List[str]) -> List[str]:
+        try:
+            return rxnorm_lookup(spellings[0])[0]
+        except Exception:
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(by_key))), thread_name_prefix="rxnorm-resolve") as pool:
+        results = pool.map(one, by_key.values())
+        return {t: rxcuis for spellings, rxcuis in zip(by_key.values(), results) for t in spellings}
@@ -3,8 +3,9 @@ import os
 import logging
 from typing import List, Dict, Optional, Any
 import psycopg
-from opensearchpy import OpenSearch, helpers
 from datetime import datetime
+from . import metrics
+from .profiling import ProfiledCursor
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +35,7 @@ class PGSearchService(SearchService):
     def __init__(self, conn_str: str):
         self.conn_str = conn_str
 
+    @metrics.timer("search_seconds", {"backend": "pg"})
     def search_brands(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         sql = """
         SELECT p.id, p.brand_name, p.mrp_inr, p.manufacturer, p.salt_signature,
@@ -47,7 +49,7 @@ class PGSearchService(SearchService):
         LIMIT %(limit)s;
         """
         q = f"%{query}%"
-        with psycopg.connect(self.conn_str) as cx:
+        with psycopg.connect(self.conn_str, cursor_factory=ProfiledCursor) as cx:
             rows = cx.execute(sql, {"q": q, "limit": limit}).fetchall()
         return [
             {
@@ -71,6 +73,8 @@ class OpenSearchService(SearchService):
       OS_INDEX_PREFIX (base prefix, used when alias disabled)  
     """
     def __init__(self, url: str, user: str, pwd: str, index_prefix: str = "medbot"):
+        from opensearchpy import OpenSearch  # only imported when this backend is selected
+
         use_ssl = url.startswith("https://")
         self.client = OpenSearch(
             hosts=[url],
@@ -195,6 +199,8 @@ class OpenSearchService(SearchService):
                             "salts": r[5] or [],
                         },
                     }
+            from opensearchpy import helpers
+
             # Larger timeout to avoid ConnectionTimeout on sizable corpora; single final refresh.
             helpers.bulk(
                 self.client,
@@ -207,6 +213,7 @@ class OpenSearchService(SearchService):
         log.info("Indexed %s documents to %s", count, self.index or self.alias)
         return count
 
+    @metrics.timer("search_seconds", {"backend": "opensearch"})
     def search_brands(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         self.ensure_index()
         q = {
@@ -0,0 +1,11 @@
+-- Chunk: agent session memory (AGENT_SESSION_BACKEND=pg)
+-- Written behind by app/session_store.py in batches; rows idle longer than
+-- AGENT_SESSION_TTL_SEC are ignored on read and can be purged at will.
+
+CREATE TABLE IF NOT EXISTS agent_sessions (
+  session_id TEXT PRIMARY KEY,
+  data JSONB NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_updated_at ON agent_sessions(updated_at);
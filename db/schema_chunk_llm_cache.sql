@@ -0,0 +1,11 @@
+-- Chunk: LLM rewrite cache
+-- cache_key = sha256(prompt_version, model, temperature, input answer); see app/llm_service.rewrite_key.
+-- Rows never go stale for their key; bump PROMPT_VERSION (app/prompts.py) to invalidate.
+
+CREATE TABLE IF NOT EXISTS llm_rewrite_cache (
+  cache_key TEXT PRIMARY KEY,
+  model TEXT NOT NULL,
+  prompt_version TEXT NOT NULL,
+  output TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
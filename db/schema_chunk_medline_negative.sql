@@ -0,0 +1,9 @@
+-- Chunk: MedlinePlus negative cache
+-- Ingredients for which every search variant returned no health topic.
+-- Entries older than MEDLINE_NEGATIVE_TTL_DAYS are ignored (and overwritten on the next miss).
+
+CREATE TABLE IF NOT EXISTS medline_negative_cache (
+  term_norm TEXT PRIMARY KEY,
+  reason TEXT,
+  checked_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,16 @@
+-- Chunk: signature-level lookup table
+-- One row per products_in.salt_signature, rebuilt by app/dbio.refresh_signatures (called by
+-- compute_signatures.py and the catalog ingest scripts). Request paths read salts with a PK
+-- lookup here instead of joining every product of the signature to product_salts.
+-- Idempotent; safe to run multiple times.
+
+CREATE TABLE IF NOT EXISTS signatures (
+  salt_signature TEXT PRIMARY KEY,
+  salts JSONB NOT NULL,                -- canonical ordered [{"salt_pos", "salt_name"}], as salts_by_signature returns
+  rxcuis TEXT[],
+  product_count INTEGER NOT NULL,
+  min_mrp NUMERIC,
+  median_mrp NUMERIC,
+  max_mrp NUMERIC,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
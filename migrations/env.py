@@ -0,0 +1,51 @@
+"""Alembic environment: raw-SQL migrations (no ORM models), psycopg 3 driver.
+
+The URL is taken from ``-x db_url=...``, else ``DATABASE_URL``, else the ``DB_*`` variables
+the API uses.
+"""
+import os
+from logging.config import fileConfig
+from urllib.parse import quote
+
+from alembic import context
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, pool
+
+load_dotenv()
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+
+def _db_url() -> str:
+    url = context.get_x_argument(as_dictionary=True).get("db_url") or os.getenv("DATABASE_URL")
+    if not url:
+        url = "postgresql://{}:{}@{}:{}/{}".format(
+            quote(os.getenv("DB_USER", "appuser")), quote(os.getenv("DB_PASS", "apppass")),
+            os.getenv("DB_HOST", "localhost"), os.getenv("DB_PORT", "5432"), os.getenv("DB_NAME", "medbot"),
+        )
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=_db_url(), target_metadata=None, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    engine = create_engine(_db_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=None)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
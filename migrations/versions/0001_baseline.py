@@ -0,0 +1,25 @@
+"""Baseline: the schema created by db/schema.sql and db/schema_chunk*.sql
+
+Those files stay the way to create tables (they are idempotent); migrations start from the
+state they produce. Nothing to do here: on an existing database ``alembic upgrade head``
+records this revision and applies the ones after it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+"""
+from typing import Sequence, Union
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
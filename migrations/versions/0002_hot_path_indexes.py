@@ -0,0 +1,70 @@
+"""Indexes for the hot request-path queries, built concurrently
+
+- products_in (salt_signature, brand_name): brands_by_signature (filter + ORDER BY), the
+  salts_by_signature / dbio.get_salts join fallback, the NPPA generic fallback, the cache
+  refresher's sig_terms and refresh_signatures.
+- advise_logs (asked_at): the cache refresher's traffic window.
+- products_in brand_name trigram GIN: the ``brand_name ILIKE '%...%'`` lookups
+  (/resolve, name -> signature, PG search backend). Needs pg_trgm from contrib; skipped
+  with a warning where the extension is not available.
+
+product_salts needs nothing new: its primary key (product_id, salt_pos) already serves
+``product_id = ...`` lookups.
+
+CONCURRENTLY cannot run in a transaction, so each statement runs in an autocommit block.
+An index left INVALID by an interrupted build is dropped and rebuilt.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger("alembic.runtime.migration")
+
+INDEXES = [
+    ("idx_products_in_salt_signature", "products_in (salt_signature, brand_name)"),
+    ("idx_advise_logs_asked_at", "advise_logs (asked_at)"),
+]
+TRGM_INDEX = ("idx_products_in_brand_trgm", "products_in USING gin (brand_name gin_trgm_ops)")
+
+
+def _create_concurrently(name: str, target: str) -> None:
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, target in INDEXES:
+            _create_concurrently(name, target)
+        bind = op.get_bind()
+        if bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar():
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            _create_concurrently(*TRGM_INDEX)
+        else:
+            log.warning("pg_trgm not available: skipping %s (ILIKE lookups stay sequential)", TRGM_INDEX[0])
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in [TRGM_INDEX] + INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,135 @@
+"""Benchmark medline_client.extract_sections_from_html against the previous extractor.
+
+Runs both implementations over a corpus of saved MedlinePlus pages (``*.html`` under
+``--corpus``), asserts they produce identical sections for every page and reports
+pages/sec for each. Without a saved corpus, ``--synthetic N`` generates pages that
+mirror the MedlinePlus drug-info layout so the benchmark still runs offline.
+
+Usage:
+  python scripts/bench_medline_extract.py --corpus data_cache/medline_pages
+  python scripts/bench_medline_extract.py --synthetic 200 --repeat 5
+"""
+import re, sys, time, random, argparse
+from pathlib import Path
+from typing import Dict, Any, List
+
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from lxml import html
+from app.medline_client import extract_sections_from_html, SECTION_KEYS
+
+
+def reference_extract(html_text: str) -> Dict[str, Any]:
+    """Previous implementation, kept verbatim as the equivalence oracle."""
+    tree = html.fromstring(html_text)
+    sections: Dict[str, str] = {}
+
+    def text_of(node):
+        return re.sub(r"\s+", " ", (node.text_content() or "").strip())
+
+    headings = tree.xpath("//h2|//h3")
+    for i, h in enumerate(headings):
+        title = text_of(h).lower()
+        content_nodes = []
+        sib = h.getnext()
+        while sib is not None and sib.tag not in ("h2", "h3"):
+            if sib.tag in ("p", "ul", "ol", "div"):
+                content_nodes.append(text_of(sib))
+            sib = sib.getnext()
+        content = "\n".join([c for c in content_nodes if c])
+
+        bucket = None
+        if any(k in title for k in SECTION_KEYS["uses"]):
+            bucket = "uses"
+        elif any(k in title for k in SECTION_KEYS["how_to_take"]):
+            bucket = "how_to_take"
+        elif any(k in title for k in SECTION_KEYS["precautions"]):
+            bucket = "precautions"
+        elif any(k in title for k in SECTION_KEYS["side_effects"]):
+            bucket = "side_effects"
+        if bucket and content:
+            sections[bucket] = content
+
+    return sections
+
+
+_HEADINGS = [
+    "Why is this medication prescribed?",
+    "How should this medicine be used?",
+    "Other uses for this medicine",
+    "What special precautions should I follow?",
+    "What special dietary instructions should I follow?",
+    "What should I do if I forget a dose?",
+    "What side effects can this medication cause?",
+    "What should I know about storage and disposal of this medication?",
+    "In case of emergency/overdose",
+    "What other information should I know?",
+    "Brand names",
+]
+_WORDS = ("medication tablet doctor pharmacist infection dose daily take stomach "
+          "kidney liver allergic reaction symptoms prescription capsule water food").split()
+
+
+def synthetic_page(rng: random.Random) -> str:
+    def para(n):
+        return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+    parts = ["<html><head><title>Drug</title></head><body><div id='mplus-content'><article>"]
+    parts.append("<nav><h3>On this page</h3><ul>" + "".join(f"<li>{h}</li>" for h in _HEADINGS) + "</ul></nav>")
+    for h in _HEADINGS:
+        parts.append(f"<section><div class='section'><h2>{h}</h2>")
+        for _ in range(rng.randint(1, 4)):
+            if rng.random() < 0.3:
+                parts.append("<ul>" + "".join(f"<li>{para(8)}</li>" for _ in range(rng.randint(2, 6))) + "</ul>")
+            else:
+                parts.append(f"<p>{para(rng.randint(20, 80))}</p>")
+        parts.append("<!-- related --><span>skip</span></div></section>")
+    parts.append("</article></div></body></html>")
+    return "".join(parts)
+
+
+def load_corpus(args) -> List[str]:
+    pages: List[str] = []
+    if args.corpus:
+        pages = [p.read_text(errors="ignore") for p in sorted(Path(args.corpus).glob("*.html"))]
+    if not pages:
+        rng = random.Random(42)
+        pages = [synthetic_page(rng) for _ in range(args.synthetic)]
+    return pages
+
+
+def bench(fn, pages: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in pages:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark MedlinePlus section extraction")
+    ap.add_argument("--corpus", default="data_cache/medline_pages", help="Directory of saved MedlinePlus *.html pages")
+    ap.add_argument("--synthetic", type=int, default=200, help="Synthetic pages when the corpus is empty")
+    ap.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = ap.parse_args(argv)
+
+    pages = load_corpus(args)
+    mismatches = [i for i, p in enumerate(pages) if reference_extract(p) != extract_sections_from_html(p)]
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} pages, first index={mismatches[0]}")
+        return 1
+    old = bench(reference_extract, pages, args.repeat)
+    new = bench(extract_sections_from_html, pages, args.repeat)
+    n = len(pages)
+    print(f"pages={n} identical=yes")
+    print(f"reference : {n / old:8.1f} pages/s ({old * 1000 / n:.3f} ms/page)")
+    print(f"current   : {n / new:8.1f} pages/s ({new * 1000 / n:.3f} ms/page)")
+    print(f"speedup   : {old / new:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
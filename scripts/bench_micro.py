@@ -0,0 +1,236 @@
+"""Micro-benchmarks for the pure functions on every request path.
+
+Each case runs a fixed, seeded corpus (user questions, salt rows shaped like a popular
+signature, DailyMed/openFDA-style section lists, alternatives payloads) through one
+function and reports ops/sec (best of ``--repeat`` timed passes) and the peak transient
+allocation per call measured with tracemalloc. No database or network is touched.
+
+Results are compared against ``benchmarks/micro_baseline.json``: a case slower than
+``baseline * (1 - --max-regression)`` or allocating notably more per call is flagged and
+the exit status is 1. Refresh with ``--save-baseline`` after an intended change (numbers
+are only comparable on the same machine).
+
+Usage:
+  python scripts/bench_micro.py
+  python scripts/bench_micro.py --filter intent --repeat 10
+  python scripts/bench_micro.py --save-baseline
+"""
+import os, sys, json, time, random, argparse, platform, tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+os.environ.setdefault("NO_EXTERNAL", "1")
+
+from app.intent import classify_intent, has_red_flags
+from app.langgraph_agent import classify_intent as agent_classify_intent
+from app.normalization import norm_term
+from app.dbio import dedup_salt_rows, price_summary
+from app.monograph_service import MonographService
+from app.advise_service import build_cheaper_text
+
+DEFAULT_BASELINE = _ROOT / "benchmarks" / "micro_baseline.json"
+
+QUESTIONS = [
+    "what is augmentin 625 duo used for",
+    "side effects of crocin advance",
+    "how to take dolo 650 before or after food",
+    "is pan 40 safe in pregnancy",
+    "cheaper alternative to azithral 500",
+    "any generic for glycomet gp 1",
+    "can I take combiflam with alcohol",
+    "dose of calpol for a 5 year old child",
+    "telma 40 price",
+    "montair lc side effects drowsiness",
+    "what are the precautions for thyronorm 50",
+    "is there a jan aushadhi version of ecosprin 75",
+    "liver problems with paracetamol overdose",
+    "info about shelcal 500",
+    "my mother has kidney disease can she take brufen",
+    "how do i take becosules capsules",
+    "rash after taking cefixime",
+    "augmentin",
+    "Dolo 650",
+    "PAN-D capsule uses",
+    "what is the nppa ceiling price of atorvastatin 10mg",
+    "cetirizine makes me sleepy is that normal",
+    "substitute for rosuvas 10 that costs less",
+    "breastfeeding and amoxicillin",
+    "when to take omeprazole morning or night",
+    "warning signs for metformin",
+    "ok thanks",
+    "tell me about vitamin d3 60000 iu sachet dosage for elderly",
+    "heart failure patient taking amlodipine",
+    "Crocin   Cold &amp; Flu  ",
+]
+NAMES = [
+    "Paracetamol", "  Amoxicillin  Trihydrate ", "Clavulanic Acid", "PANTOPRAZOLE SODIUM", "Vitamin D3™",
+    "Methylcobalamin\t", "Calcium Carbonate", "levocetirizine dihydrochloride", "Azithromycin", "Metformin Hydrochloride",
+]
+
+
+def _salt_rows(rng: random.Random) -> List[List[Tuple[str, int]]]:
+    """Rows as salts_by_signature reads them: one small, one combo, one paracetamol-sized signature."""
+    corpora = []
+    for products, salts in ((12, ["Cetirizine"]), (400, ["Amoxicillin", "Clavulanic Acid"]), (3000, ["Paracetamol"])):
+        rows = []
+        for _ in range(products):
+            for pos, s in enumerate(salts, start=1):
+                r = rng.random()
+                rows.append((s.upper() if r < 0.05 else f" {s}  " if r < 0.1 else s, pos))
+        rows.sort(key=lambda x: (x[1], x[0]))
+        corpora.append(rows)
+    return corpora
+
+
+def _sections(rng: random.Random, n: int) -> List[str]:
+    words = "take this medicine with food tell your doctor if you have liver kidney disease rash nausea".split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(30, 120))) for _ in range(n)]
+
+
+def _alternatives(rng: random.Random) -> List[Dict[str, Any]]:
+    out = []
+    for n_brands, n_jana in ((3, 0), (60, 2), (2500, 12)):
+        brands = [{"id": i, "brand_name": f"Brand {i}", "manufacturer": "X", "mrp_inr": round(rng.uniform(5, 500), 2)}
+                  for i in range(n_brands)]
+        jana = [{"generic_name": "Paracetamol", "strength": "500 mg", "dosage_form": "Tablet", "pack": "10",
+                 "mrp_inr": round(rng.uniform(2, 30), 2)} for _ in range(n_jana)]
+        prices = [b["mrp_inr"] for b in brands]
+        jana_prices = [j["mrp_inr"] for j in jana]
+        out.append({"brands": brands, "janaushadhi": jana, "prices": prices, "jana_prices": jana_prices,
+                    "price_summary": price_summary(prices, jana_prices, 18.5)})
+    return out
+
+
+def build_cases() -> List[Tuple[str, Callable, List[tuple]]]:
+    """(name, fn, corpus); one op is one fn(*args) call."""
+    rng = random.Random(1234)
+    q = [(x,) for x in QUESTIONS]
+    salt_corpora = _salt_rows(rng)
+    merge = []
+    for _ in range(20):
+        dst = _sections(rng, rng.randint(0, 2))
+        src = _sections(rng, rng.randint(2, 12)) + dst[:1]  # fallbacks repeat primary text at times
+        merge.append((dst, src))
+    alts = _alternatives(rng)
+    return [
+        ("intent.classify_intent", classify_intent, q),
+        ("intent.has_red_flags", has_red_flags, q),
+        ("agent.classify_intent", agent_classify_intent, q),
+        ("normalization.norm_term", norm_term, [(n,) for n in NAMES]),
+        ("dbio.dedup_salt_rows", dedup_salt_rows, [(rows,) for rows in salt_corpora]),
+        # dst is copied per call (the real merge mutates it)
+        ("monograph._merge_lists", lambda dst, src: MonographService._merge_lists(list(dst), src), merge),
+        ("advise.build_cheaper_text", build_cheaper_text, [("1000", ["Paracetamol"], a) for a in alts]),
+        ("dbio.price_summary", price_summary, [(a["prices"], a["jana_prices"], 18.5) for a in alts]),
+    ]
+
+
+def time_case(fn: Callable, corpus: List[tuple], repeat: int, min_time: float) -> float:
+    """Best ops/sec over ``repeat`` passes, each looping the corpus for at least ``min_time``."""
+    loops = 1
+    while True:  # calibrate
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            for args in corpus:
+                fn(*args)
+        dt = time.perf_counter() - t0
+        if dt >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(dt, 1e-9)))
+    best = dt
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            for args in corpus:
+                fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return loops * len(corpus) / best
+
+
+def _peak_per_call(fn: Callable, corpus: List[tuple]) -> float:
+    total = 0
+    tracemalloc.start()
+    try:
+        for args in corpus:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(*args)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / len(corpus)
+
+
+def alloc_case(fn: Callable, corpus: List[tuple]) -> float:
+    """Mean peak transient allocation per call (bytes), net of the measuring loop itself."""
+    overhead = _peak_per_call(lambda *a: None, corpus)
+    return max(0.0, _peak_per_call(fn, corpus) - overhead)
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float, max_alloc_growth: float) -> List[str]:
+    problems = []
+    for name, cur in result["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        if cur["ops_per_sec"] < base["ops_per_sec"] * (1 - max_regression):
+            problems.append(f"{name}: {cur['ops_per_sec']:,.0f} ops/s < baseline {base['ops_per_sec']:,.0f}")
+        grown = cur["alloc_bytes_per_op"] - base["alloc_bytes_per_op"]
+        if grown > 256 and cur["alloc_bytes_per_op"] > base["alloc_bytes_per_op"] * (1 + max_alloc_growth):
+            problems.append(f"{name}: {cur['alloc_bytes_per_op']:,.0f} B/op > baseline {base['alloc_bytes_per_op']:,.0f}")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Micro-benchmarks for pure hot-path functions")
+    ap.add_argument("--filter", help="Only cases whose name contains this substring")
+    ap.add_argument("--repeat", type=int, default=5, help="Timed passes per case (best is reported)")
+    ap.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timed pass")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    ap.add_argument("--no-baseline", action="store_true", help="Skip the baseline comparison")
+    ap.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    ap.add_argument("--max-regression", type=float, default=0.3, help="Allowed fractional ops/sec drop")
+    ap.add_argument("--max-alloc-growth", type=float, default=0.5, help="Allowed fractional B/op growth")
+    ap.add_argument("--out", help="Also write this run's results as JSON")
+    args = ap.parse_args(argv)
+
+    result: Dict[str, Any] = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "cases": {},
+    }
+    print(f"{'case':<30}{'ops/s':>14}{'us/op':>10}{'B/op':>10}")
+    for name, fn, corpus in build_cases():
+        if args.filter and args.filter not in name:
+            continue
+        ops = time_case(fn, corpus, args.repeat, args.min_time)
+        alloc = alloc_case(fn, corpus)
+        result["cases"][name] = {"ops_per_sec": round(ops, 1), "us_per_op": round(1e6 / ops, 3),
+                                 "alloc_bytes_per_op": round(alloc, 1), "corpus": len(corpus)}
+        print(f"{name:<30}{ops:>14,.0f}{1e6 / ops:>10.2f}{alloc:>10,.0f}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2) + "\n")
+    if args.save_baseline:
+        Path(args.baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.baseline).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if args.no_baseline or not Path(args.baseline).exists():
+        return 0
+    problems = compare(result, json.loads(Path(args.baseline).read_text()), args.max_regression, args.max_alloc_growth)
+    if problems:
+        print("\nREGRESSIONS vs baseline:")
+        for p in problems:
+            print(f"  - {p}")
+        return 1
+    print("\nno regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
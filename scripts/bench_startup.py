@@ -0,0 +1,162 @@
+"""Cold-start benchmark for the API process.
+
+Runs ``import app.main`` in fresh interpreters and reports:
+
+- wall-clock import time (median of ``--repeat`` runs),
+- per-module cost from ``python -X importtime``: the slowest modules by cumulative time,
+  self time summed per top-level package, and every ``app.*`` module,
+- optionally (``--warmup``) the lifespan warm-up steps (search backend, agent graph,
+  brand matcher, health probes) as ``app.main.warm_up()`` times them; this one needs the
+  database from ``.env``/environment.
+
+Heavy subsystems must stay off the import path: if any ``--forbid`` module (default
+langgraph, opensearchpy, lxml) is imported by ``app.main`` the run fails. The import time is
+compared against ``benchmarks/startup_baseline.json`` (``--max-regression``, ignoring
+deltas under ``--min-delta-ms``); refresh with ``--save-baseline``.
+
+Usage:
+  python scripts/bench_startup.py
+  python scripts/bench_startup.py --warmup --top 30
+  python scripts/bench_startup.py --save-baseline
+"""
+import os, sys, json, time, argparse, platform, statistics, subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_BASELINE = _ROOT / "benchmarks" / "startup_baseline.json"
+DEFAULT_FORBID = "langgraph,opensearchpy,lxml"
+
+_WALL = "import sys, time; t = time.perf_counter(); import {mod}; print(time.perf_counter() - t); print(','.join(sys.modules))"
+_WARMUP = "import json, asyncio, {mod} as m; print(json.dumps(asyncio.run(m.warm_up())))"
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("NO_EXTERNAL", "1")
+    env["PYTHONPATH"] = str(_ROOT) + (os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else "")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    out = subprocess.run([sys.executable, *args], cwd=_ROOT, env=_child_env(), capture_output=True, text=True, timeout=300)
+    if out.returncode != 0:
+        raise SystemExit(f"child failed ({' '.join(args[:2])}):\n{out.stderr[-2000:]}")
+    return out
+
+
+def wall_import(module: str, repeat: int) -> Tuple[List[float], List[str]]:
+    """Seconds per fresh-interpreter import, plus the module names loaded by the last run."""
+    times, loaded = [], []
+    for _ in range(repeat):
+        lines = _run(["-c", _WALL.format(mod=module)]).stdout.strip().splitlines()
+        times.append(float(lines[-2]))
+        loaded = lines[-1].split(",")
+    return times, loaded
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for each ``import time:`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def import_profile(module: str) -> List[Tuple[str, int, int]]:
+    return parse_importtime(_run(["-X", "importtime", "-c", f"import {module}"]).stderr)
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> List[Tuple[str, int]]:
+    """Self time summed per top-level package, slowest first."""
+    agg: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        pkg = name.split(".", 1)[0]
+        agg[pkg] = agg.get(pkg, 0) + self_us
+    return sorted(agg.items(), key=lambda kv: -kv[1])
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float, min_delta_ms: float) -> List[str]:
+    base = baseline.get("import_ms")
+    cur = result["import_ms"]
+    if base and cur > base * (1 + max_regression) and cur - base >= min_delta_ms:
+        return [f"import {result['module']}: {cur:.0f} ms > baseline {base:.0f} ms"]
+    return []
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cold-start (import + warm-up) benchmark for the API")
+    ap.add_argument("--module", default="app.main")
+    ap.add_argument("--repeat", type=int, default=5, help="Fresh-interpreter imports timed (median reported)")
+    ap.add_argument("--top", type=int, default=15, help="Slowest modules / packages to list")
+    ap.add_argument("--warmup", action="store_true", help="Also time the lifespan warm-up steps (needs the DB)")
+    ap.add_argument("--forbid", default=DEFAULT_FORBID, help="Comma-separated modules that must not load at import")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    ap.add_argument("--no-baseline", action="store_true", help="Skip the baseline comparison")
+    ap.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    ap.add_argument("--max-regression", type=float, default=0.3, help="Allowed fractional import-time growth")
+    ap.add_argument("--min-delta-ms", type=float, default=50.0, help="Ignore import-time growth below this")
+    ap.add_argument("--out", help="Also write this run's results as JSON")
+    args = ap.parse_args(argv)
+
+    times, loaded = wall_import(args.module, args.repeat)
+    rows = import_profile(args.module)
+    import_ms = statistics.median(times) * 1000
+    result: Dict[str, Any] = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "module": args.module,
+        "import_ms": round(import_ms, 1),
+        "import_ms_runs": [round(t * 1000, 1) for t in times],
+        "modules_loaded": len(loaded),
+        "packages": {pkg: round(us / 1000, 2) for pkg, us in by_package(rows)[:args.top]},
+        "app_modules": {name: round(cum / 1000, 2) for name, _, cum in rows if name.startswith("app.")},
+    }
+
+    print(f"import {args.module}: {import_ms:.0f} ms median of {args.repeat} "
+          f"(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f}); {len(loaded)} modules loaded\n")
+    print(f"{'slowest modules (cumulative)':<52}{'cum ms':>10}{'self ms':>10}")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{name:<52}{cum_us / 1000:>10.1f}{self_us / 1000:>10.1f}")
+    print(f"\n{'self time by package':<52}{'ms':>10}")
+    for pkg, ms in result["packages"].items():
+        print(f"{pkg:<52}{ms:>10.1f}")
+    print(f"\n{'app modules (cumulative)':<52}{'ms':>10}")
+    for name, ms in sorted(result["app_modules"].items(), key=lambda kv: -kv[1]):
+        print(f"{name:<52}{ms:>10.1f}")
+
+    if args.warmup:
+        steps = json.loads(_run(["-c", _WARMUP.format(mod=args.module)]).stdout.strip().splitlines()[-1])
+        result["warmup_sec"] = steps
+        print(f"\n{'warm-up step (concurrent)':<52}{'sec':>10}")
+        for name, sec in steps.items():
+            print(f"{name:<52}{'timeout' if sec is None else f'{sec:.3f}':>10}")
+
+    problems = []
+    forbidden = [m for m in args.forbid.split(",") if m and m in loaded]
+    if forbidden:
+        problems.append(f"heavy modules imported by {args.module}: {', '.join(forbidden)}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2) + "\n")
+    if args.save_baseline:
+        Path(args.baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.baseline).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nbaseline saved to {args.baseline}")
+    elif not args.no_baseline and Path(args.baseline).exists():
+        problems += compare(result, json.loads(Path(args.baseline).read_text()), args.max_regression, args.min_delta_ms)
+    if problems:
+        print("\nREGRESSIONS:")
+        for p in problems:
+            print(f"  - {p}")
+        return 1
+    print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -11,6 +11,7 @@ except Exception:
     pass
 
 from app.rxnorm_client import rxnorm_lookup
+from app.dbio import refresh_signatures, bulk_update_signatures
 
 load_dotenv()
 
@@ -59,12 +60,12 @@ def iter_products(with_signatures: bool | None, limit: int | None):
     return out
 
 def update_product_batch(cur, batch_updates):
-    for pid, rxcuis_sorted in batch_updates:
-        sig = "-".join(rxcuis_sorted) if rxcuis_sorted else None
-        cur.execute(
-            """UPDATE products_in SET rxcuis=%s, salt_signature=%s, updated_at=NOW() WHERE id=%s""",
-            (rxcuis_sorted if rxcuis_sorted else None, sig, pid),
-        )
+    """One COPY + UPDATE ... FROM per batch; rows whose signature is unchanged are skipped."""
+    return bulk_update_signatures(
+        cur.connection,
+        "products_in",
+        ((pid, rx or None, "-".join(rx) if rx else None) for pid, rx in batch_updates),
+    )
 
 # -------------------------------------
 # Main computation with progress monitoring
@@ -86,9 +87,10 @@ def compute(args):
     unresolved = 0
     processed = 0
     batch_updates: list[tuple[int, list[str]]] = []
+    affected_sigs: set[str] = set()  # old + new signatures, refreshed in the signatures table
     next_progress = args.progress_every
 
-    # Rate limiting / courtesy pause optional (we rely on rxnorm_client internal backoff)
+    # No pause needed here: rxnorm_client rate-limits RxNav calls and backs off between retries
     with db() as conn, conn.cursor() as cur:
         for pid, rec in target_set.items():
             rxcui_set: set[str] = set()
@@ -118,6 +120,7 @@ def compute(args):
                         missing.append(part)
             rxcuis_sorted = sorted(rxcui_set)
             batch_updates.append((pid, rxcuis_sorted))
+            affected_sigs.update(s for s in (rec["existing_sig"], "-".join(rxcuis_sorted)) if s)
             if missing:
                 unresolved += 1
             processed += 1
@@ -145,6 +148,11 @@ def compute(args):
             update_product_batch(cur, batch_updates)
             conn.commit()
 
+        # Keep the signature-level lookup table in step with the products just re-mapped
+        upserted, deleted = refresh_signatures(conn, None if args.recompute_all else affected_sigs)
+        conn.commit()
+        print(f"signatures table: upserted={upserted} deleted={deleted}")
+
     elapsed = time.time() - start_time
     rate_final = processed / elapsed if elapsed > 0 else 0.0
     print(
@@ -157,7 +165,7 @@ def parse_args(argv):
     ap = argparse.ArgumentParser(description="Compute RxNorm salt signatures for products_in")
     ap.add_argument("--recompute-all", action="store_true", help="Recompute even if salt_signature present")
     ap.add_argument("--limit", type=int, default=None, help="Limit number of products (debug)")
-    ap.add_argument("--db-batch", dest="db_batch", type=int, default=100, help="Rows per DB commit batch")
+    ap.add_argument("--db-batch", dest="db_batch", type=int, default=1000, help="Rows per DB commit batch (one bulk UPDATE each)")
     ap.add_argument(
         "--progress-every", type=int, default=2000, help="Progress logging interval (products)"
     )
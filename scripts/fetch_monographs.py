@@ -1,6 +1,30 @@
-import os, psycopg, json
+"""Precompute medline_monograph_by_signature for every salt signature.
+
+Signatures are composed on a worker pool (MedlinePlus / DailyMed / openFDA calls
+stay within each source's per-minute limit), results are upserted in batches and
+every stored signature is appended to a checkpoint file so a crashed run
+resumes where it stopped. The checkpoint is removed once a run finishes with no
+errors. Signatures with no upstream content are not checkpointed; later runs
+retry them. Monographs updated since ``--since`` are skipped.
+
+Usage:
+  python scripts/fetch_monographs.py --workers 8
+  python scripts/fetch_monographs.py --only-missing
+  python scripts/fetch_monographs.py --since 2025-08-01   # or 7d / 12h
+"""
+import os, sys, re, time, argparse, psycopg
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from dotenv import load_dotenv
-from app.monograph_service import compose_for_signature
+
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.monograph_service import compose_for_signature, upsert_monographs
+from app.normalization import norm_term
+from app import medline_client, dailymed_client, openfda_client
 
 load_dotenv()
 
@@ -22,34 +46,131 @@ def products_by_signature():
     with db() as conn, conn.cursor() as cur:
         cur.execute(sql)
         for sig, salts in cur.fetchall():
-            out[sig] = [s for s in salts if s]
+            # One entry per distinct ingredient (the aggregate spans every product of the signature)
+            uniq = {}
+            for s in salts:
+                if s and norm_term(s) not in uniq:
+                    uniq[norm_term(s)] = s
+            out[sig] = list(uniq.values())
     return out
 
-def put_monograph(sig: str, doc: dict):
+def existing_monographs():
     with db() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-          INSERT INTO medline_monograph_by_signature (salt_signature, title, sources, sections, updated_at)
-          VALUES (%s,%s,%s,%s,NOW())
-          ON CONFLICT (salt_signature) DO UPDATE SET
-            title=excluded.title, sources=excluded.sources, sections=excluded.sections, updated_at=NOW()
-        """,
-            (sig, doc.get("title"), json.dumps(doc.get("sources")), json.dumps(doc.get("sections"))),
-        )
-
-def main():
-    sig_map = products_by_signature()
-    ok, miss = 0, 0
+        cur.execute("SELECT salt_signature, updated_at FROM medline_monograph_by_signature")
+        return {sig: ts for sig, ts in cur.fetchall()}
+
+def parse_since(value):
+    """Accept an ISO date/datetime (naive = local time) or a relative age like ``7d`` / ``12h``.
+
+    Returns an aware UTC datetime, comparable with ``updated_at`` (timestamptz).
+    """
+    if not value:
+        return None
+    m = re.fullmatch(r"(\d+)([dh])", value.strip())
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        return datetime.now(timezone.utc) - (timedelta(days=n) if unit == "d" else timedelta(hours=n))
+    return datetime.fromisoformat(value).astimezone(timezone.utc)
+
+def load_checkpoint(path: Path):
+    if not path.exists():
+        return set()
+    # MISS lines written by older runs are ignored so those signatures get retried
+    rows = (line.split("\t") for line in path.read_text().splitlines() if line.strip())
+    return {r[0] for r in rows if len(r) < 2 or r[1] == "OK"}
+
+def select_targets(sig_map, existing, done, only_missing, since):
+    targets = []
     for sig, salts in sig_map.items():
-        doc = compose_for_signature(salts)
-        if doc:
-            put_monograph(sig, doc)
-            ok += 1
-            print(f"[OK] {sig} <- {salts}")
-        else:
-            miss += 1
-            print(f"[MISS] {sig} <- {salts}")
-    print(f"\nDONE. monographs={ok}, missing={miss}")
+        if sig in done:
+            continue
+        ts = existing.get(sig)
+        if only_missing and sig in existing:
+            continue
+        if since and ts is not None:
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            if ts >= since:
+                continue
+        targets.append((sig, salts))
+    return targets
+
+def apply_rate_limits(args):
+    # Batch mode: wait for a free slot instead of the request-path soft cap
+    for mod, rpm in ((medline_client, args.medline_rpm), (dailymed_client, args.dailymed_rpm), (openfda_client, args.openfda_rpm)):
+        if rpm:
+            mod._limiter.per_min = rpm
+        mod._limiter.max_wait = None
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Compose and store monographs per salt signature")
+    ap.add_argument("--workers", type=int, default=4, help="Parallel compose workers")
+    ap.add_argument("--only-missing", action="store_true", help="Only signatures without any stored monograph")
+    ap.add_argument("--since", default="7d", help="Skip monographs updated since (ISO date or 7d/12h); '' to disable")
+    ap.add_argument("--batch", type=int, default=50, help="Monographs per upsert batch")
+    ap.add_argument("--limit", type=int, default=None, help="Max signatures this run (debug)")
+    ap.add_argument("--checkpoint", default="data_cache/fetch_monographs.checkpoint", help="Progress file for resume")
+    ap.add_argument("--reset-checkpoint", action="store_true", help="Ignore and truncate the checkpoint file")
+    ap.add_argument("--medline-rpm", type=int, default=None, help="MedlinePlus requests/minute")
+    ap.add_argument("--dailymed-rpm", type=int, default=None, help="DailyMed requests/minute")
+    ap.add_argument("--openfda-rpm", type=int, default=None, help="openFDA requests/minute")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    apply_rate_limits(args)
+    ckpt = Path(args.checkpoint)
+    ckpt.parent.mkdir(parents=True, exist_ok=True)
+    if args.reset_checkpoint and ckpt.exists():
+        ckpt.unlink()
+    done = load_checkpoint(ckpt)
+
+    targets = select_targets(products_by_signature(), existing_monographs(), done, args.only_missing, parse_since(args.since))
+    truncated = bool(args.limit) and len(targets) > args.limit
+    if args.limit:
+        targets = targets[: args.limit]
+    print(f"Composing {len(targets)} signatures (checkpointed={len(done)}) workers={args.workers}")
+
+    ok, miss, failed = 0, 0, 0
+    started = time.time()
+    pending: list = []
+
+    def flush(log):
+        if not pending:
+            return
+        with db() as conn:
+            upsert_monographs(conn, pending)
+        # Only checkpoint after the batch is committed
+        log.writelines(f"{sig}\tOK\n" for sig, _ in pending)
+        log.flush()
+        pending.clear()
+
+    with ckpt.open("a") as log, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(compose_for_signature, salts): (sig, salts) for sig, salts in targets}
+        for i, fut in enumerate(as_completed(futures), start=1):
+            sig, salts = futures[fut]
+            try:
+                doc = fut.result()
+            except Exception as e:
+                failed += 1  # not checkpointed: retried on the next run
+                print(f"[ERR] {sig} <- {salts}: {e.__class__.__name__}: {e}")
+                continue
+            if doc:
+                pending.append((sig, doc))
+                ok += 1
+                print(f"[OK] {sig} <- {salts}")
+            else:
+                miss += 1  # not checkpointed: upstream may gain the topic later
+                print(f"[MISS] {sig} <- {salts}")
+            if len(pending) >= args.batch:
+                flush(log)
+            if i % 100 == 0:
+                rate = i / max(time.time() - started, 1e-6)
+                print(f"[PROGRESS] {i}/{len(targets)} rate={rate:.1f}/s")
+        flush(log)
+    if not failed and not truncated:
+        ckpt.unlink(missing_ok=True)  # complete: the next run starts from --since/--only-missing again
+    print(f"\nDONE. monographs={ok}, missing={miss}, errors={failed}")
 
 if __name__ == "__main__":
     main()
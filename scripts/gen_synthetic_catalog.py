@@ -0,0 +1,334 @@
+"""Generate a synthetic India catalog for benchmarks and capacity planning.
+
+Fills ``products_in``, ``product_salts``, ``janaushadhi_products``, ``nppa_ceiling_prices``
+and the lookup caches (``rxnorm_cache``, ``medline_cache_by_ingredient``,
+``medline_monograph_by_signature``, ``dailymed_/openfda_cache_by_ingredient``) with data
+shaped like the real one:
+
+- salt usage is Zipf-distributed (a paracetamol-like salt appears in a large share of brands),
+- signatures are mostly single salts with 2-4 salt combos drawn from popular salts, and their
+  product counts are Zipfian too (thousands of brands for the top ones, one for the long tail),
+- brand heads are reused across strengths / forms / "Forte"-style variants, some products
+  stay unmapped (no signature), and salt spellings vary in case and whitespace as in the CSVs,
+- reference tables contain several strengths per generic and a share of unmapped rows.
+
+Everything is streamed through COPY, so ``--scale 50`` (5M products) needs little memory.
+``--scale 1`` is 100k products. The same ``--seed`` always produces the same catalog.
+Existing rows are only replaced with ``--truncate``. Loading into the app's own
+``DATABASE_URL`` (the default target) also needs ``--yes``.
+
+Usage:
+  python scripts/gen_synthetic_catalog.py --scale 1 --database-url postgresql://.../medbot_synth
+  python scripts/gen_synthetic_catalog.py --products 5000000 --truncate --database-url postgresql://.../medbot_scale
+  python scripts/gen_synthetic_catalog.py --scale 1 --yes          # into $DATABASE_URL
+"""
+import os, sys, json, math, time, random, argparse, itertools
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+import psycopg
+from dotenv import load_dotenv
+
+from app.dbio import refresh_signatures
+
+load_dotenv()
+
+PRODUCTS_PER_SCALE = 100_000
+
+# Real salts first (most common first), synthetic INN-style names extend the vocabulary
+BASE_SALTS = [
+    "Paracetamol", "Amoxicillin", "Clavulanic Acid", "Pantoprazole", "Cetirizine", "Azithromycin",
+    "Metformin", "Domperidone", "Ibuprofen", "Diclofenac", "Aceclofenac", "Cefixime", "Levocetirizine",
+    "Montelukast", "Ofloxacin", "Ornidazole", "Omeprazole", "Rabeprazole", "Ondansetron", "Telmisartan",
+    "Amlodipine", "Atorvastatin", "Glimepiride", "Vitamin D3", "Calcium Carbonate", "Methylcobalamin",
+    "Folic Acid", "Ciprofloxacin", "Metronidazole", "Phenylephrine", "Chlorpheniramine", "Caffeine",
+    "Dextromethorphan", "Ambroxol", "Guaifenesin", "Losartan", "Rosuvastatin", "Clopidogrel", "Aspirin",
+    "Thyroxine", "Sitagliptin", "Vildagliptin", "Voglibose", "Fexofenadine", "Esomeprazole", "Ranitidine",
+    "Famotidine", "Itopride", "Levosulpiride", "Cefpodoxime", "Cefuroxime", "Ceftriaxone", "Doxycycline",
+    "Levofloxacin", "Linezolid", "Fluconazole", "Itraconazole", "Terbinafine", "Albendazole", "Ivermectin",
+    "Prednisolone", "Methylprednisolone", "Deflazacort", "Dexamethasone", "Hydrocortisone", "Salbutamol",
+    "Budesonide", "Formoterol", "Levosalbutamol", "Tramadol", "Nimesulide", "Serratiopeptidase",
+    "Thiocolchicoside", "Etoricoxib", "Pregabalin", "Gabapentin", "Nortriptyline", "Amitriptyline",
+    "Escitalopram", "Sertraline", "Clonazepam", "Alprazolam", "Olmesartan", "Metoprolol", "Bisoprolol",
+    "Nebivolol", "Cilnidipine", "Hydrochlorothiazide", "Chlorthalidone", "Furosemide", "Spironolactone",
+    "Torsemide", "Ramipril", "Enalapril", "Dapagliflozin", "Empagliflozin", "Gliclazide", "Pioglitazone",
+    "Teneligliptin", "Insulin Glargine", "Zinc", "Iron", "Vitamin C", "Vitamin B12", "Pyridoxine",
+    "Lactic Acid Bacillus", "Racecadotril", "Loperamide", "Mebeverine", "Drotaverine", "Dicyclomine",
+    "Simethicone", "Sucralfate", "Lactulose", "Bisacodyl", "Mupirocin", "Clotrimazole", "Ketoconazole",
+    "Luliconazole", "Beclomethasone", "Clobetasol", "Mometasone", "Adapalene", "Tretinoin", "Minoxidil",
+]
+_STEMS = ["bexa", "cor", "dal", "fen", "galo", "hex", "ira", "lor", "mera", "nova", "oxa", "pira",
+          "quina", "rami", "sola", "tora", "vala", "xelo", "zeta", "lumi", "dora", "tri", "seli", "ami"]
+_SUFFIXES = ["olol", "pril", "sartan", "mycin", "azole", "statin", "prazole", "floxacin", "dipine",
+             "cillin", "tidine", "gliptin", "lukast", "setron", "triptan", "vastatin", "parin"]
+_BRAND_SYL = ["ra", "zo", "cin", "vel", "mox", "tri", "pan", "lo", "dol", "cef", "ex", "al", "ni", "tor",
+              "sar", "mi", "fen", "ox", "ace", "glu", "lev", "cal", "vit", "neu", "zy", "ta", "ri", "no"]
+_VARIANTS = ["", "", "", "", " Forte", " Plus", " DS", " XR", " SR", " Kid", " MD", " LS", " CV"]
+FORMS = ["Tablet", "Tablet", "Tablet", "Capsule", "Syrup", "Suspension", "Injection", "Drops", "Cream", "Gel"]
+STRENGTHS = ["2.5mg", "5mg", "10mg", "20mg", "25mg", "40mg", "50mg", "100mg", "200mg", "250mg", "400mg", "500mg", "625mg", "650mg"]
+PACKS = ["strip of 10 tablets", "strip of 15 tablets", "bottle of 60 ml", "bottle of 100 ml", "vial of 1 ml", "tube of 15 gm"]
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+
+
+def topic_sections(name: str) -> Dict[str, str]:
+    """MedlinePlus-style sections used for cache rows (and the benchmark's fake pages)."""
+    return {
+        "uses": f"{name} is used to treat common conditions.",
+        "how_to_take": f"Take {name} as directed, usually with water.",
+        "precautions": f"Tell your doctor about allergies before taking {name}.",
+        "side_effects": f"{name} may cause nausea or headache.",
+    }
+
+
+class SyntheticCatalog:
+    """Deterministic catalog shape for a given size and seed; rows are produced lazily."""
+
+    def __init__(self, products: int, seed: int = 42, unmapped_frac: float = 0.03,
+                 salts: Optional[int] = None, signatures: Optional[int] = None):
+        self.products = products
+        self.seed = seed
+        self.unmapped_frac = unmapped_frac
+        rng = random.Random(seed)
+        scale = max(products / PRODUCTS_PER_SCALE, 0.01)
+        n_salts = salts or int(300 + 200 * math.sqrt(scale))
+        self.salts = self._salt_vocab(rng, n_salts)
+        self.rxcui = [str(1000 + i * 37) for i in range(len(self.salts))]
+        self.combos = self._combos(rng, signatures or max(len(self.salts), products // 15))
+        self.signatures = ["-".join(sorted(self.rxcui[i] for i in c)) for c in self.combos]
+        self._combo_cw = zipf_cum_weights(len(self.combos), 1.1)
+        self._combo_of = array("I")  # product index -> combo index, filled by product_rows()
+
+    @staticmethod
+    def _salt_vocab(rng: random.Random, n: int) -> List[str]:
+        names = list(dict.fromkeys(BASE_SALTS))[:n]
+        seen = set(names)
+        while len(names) < n:
+            name = (rng.choice(_STEMS) + rng.choice(_STEMS[:12]) + rng.choice(_SUFFIXES)).capitalize()
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+        return names
+
+    def _combos(self, rng: random.Random, n: int) -> List[Tuple[int, ...]]:
+        """Every salt alone plus combos of popular salts, interleaved; list order is popularity rank."""
+        salt_cw = zipf_cum_weights(len(self.salts), 1.0)
+        singles = [(i,) for i in range(len(self.salts))]
+        combos = set(singles)
+        multi: List[Tuple[int, ...]] = []
+        attempts = 0
+        while len(combos) < n and attempts < n * 20:
+            attempts += 1
+            k = rng.choices((2, 3, 4), (75, 20, 5))[0]
+            picked = tuple(sorted(set(rng.choices(range(len(self.salts)), cum_weights=salt_cw, k=k))))
+            if len(picked) > 1 and picked not in combos:
+                combos.add(picked)
+                multi.append(picked)
+        out: List[Tuple[int, ...]] = []
+        for i in range(max(len(singles), len(multi))):
+            if i < len(singles):
+                out.append(singles[i])
+            if i < len(multi):
+                out.append(multi[i])
+        return out
+
+    def combo_name(self, idx: int) -> str:
+        return " + ".join(self.salts[i] for i in self.combos[idx])
+
+    @staticmethod
+    def _brand_head(sig_idx: int, head_idx: int) -> str:
+        h = ((sig_idx * 1000003 + head_idx * 7919 + 17) * 2654435761) % (1 << 32)
+        parts = []
+        for _ in range(2 + h % 2):
+            h //= 3
+            parts.append(_BRAND_SYL[h % len(_BRAND_SYL)])
+            h //= len(_BRAND_SYL)
+        return "".join(parts).capitalize()
+
+    def product_rows(self) -> Iterator[tuple]:
+        """(id, brand_name, strength, dosage_form, pack, mrp_inr, manufacturer, discontinued, rxcuis, salt_signature)."""
+        rng = random.Random(self.seed + 1)
+        makers = [f"{w} {t}" for w in ("Sun", "Alkem", "Cipla", "Lupin", "Zydus", "Mankind", "Intas", "Torrent",
+                                        "Micro", "Glen", "Ipca", "Macleods", "Ajanta", "Emcure", "Abbott")
+                  for t in ("Pharma", "Labs", "Healthcare", "Lifesciences")]
+        maker_cw = zipf_cum_weights(len(makers), 1.2)
+        self._combo_of = array("I")
+        batch = 10_000
+        pid = 0
+        while pid < self.products:
+            n = min(batch, self.products - pid)
+            combo_idx = rng.choices(range(len(self.combos)), cum_weights=self._combo_cw, k=n)
+            maker_idx = rng.choices(range(len(makers)), cum_weights=maker_cw, k=n)
+            for ci, mi in zip(combo_idx, maker_idx):
+                pid += 1
+                self._combo_of.append(ci)
+                head = self._brand_head(ci, min(int(rng.paretovariate(1.3)), 40))
+                strength = rng.choice(STRENGTHS)
+                name = f"{head}{rng.choice(_VARIANTS)} {strength.upper()} {rng.choice(FORMS)}"
+                mapped = rng.random() >= self.unmapped_frac
+                rxcuis = sorted({self.rxcui[i] for i in self.combos[ci]}) if mapped else None
+                mrp = round(math.exp(rng.gauss(4.2, 0.9)) * len(self.combos[ci]) ** 0.5, 2)
+                yield (
+                    pid, name, strength, name.rsplit(" ", 1)[-1], rng.choice(PACKS), mrp, makers[mi],
+                    rng.random() < 0.03, rxcuis, self.signatures[ci] if mapped else None,
+                )
+
+    def salt_rows(self) -> Iterator[tuple]:
+        """(product_id, salt_name, salt_pos); call after product_rows() has been consumed."""
+        rng = random.Random(self.seed + 2)
+        for pid, ci in enumerate(self._combo_of, start=1):
+            for pos, si in enumerate(self.combos[ci], start=1):
+                name = self.salts[si]
+                r = rng.random()
+                if r < 0.02:
+                    name = name.upper()
+                elif r < 0.04:
+                    name = f" {name}  ".replace(" ", "  ", 1)
+                yield (pid, name, pos)
+
+    def _reference_rows(self, seed_offset: int, n: int) -> Iterator[Tuple[str, str, Optional[str], random.Random]]:
+        rng = random.Random(self.seed + seed_offset)
+        top = max(1, min(len(self.combos), n))
+        cw = zipf_cum_weights(top, 1.1)
+        made = 0
+        while made < n:
+            ci = rng.choices(range(top), cum_weights=cw)[0]
+            generic = self.combo_name(ci)
+            sig = self.signatures[ci] if rng.random() >= 0.1 else None  # left for the mapping scripts
+            for strength in rng.sample(STRENGTHS, rng.randint(1, 4)):
+                if made >= n:
+                    break
+                made += 1
+                yield generic, strength.replace("mg", " mg"), sig, rng
+
+    def jana_rows(self, n: int) -> Iterator[tuple]:
+        """(generic_name, strength, dosage_form, pack, mrp_inr, salt_signature)."""
+        for generic, strength, sig, rng in self._reference_rows(3, n):
+            yield generic, strength, rng.choice(FORMS[:4]), rng.choice(("10", "15", "30")), round(rng.uniform(5, 120), 2), sig
+
+    def nppa_rows(self, n: int) -> Iterator[tuple]:
+        """(generic_name, strength, pack, ceiling_price, salt_signature)."""
+        for generic, strength, sig, rng in self._reference_rows(4, n):
+            yield generic, strength, "1 Tablet", round(rng.uniform(0.5, 40), 2), sig
+
+    def cached_salts(self, frac: float) -> List[int]:
+        rng = random.Random(self.seed + 5)
+        return [i for i in range(len(self.salts)) if rng.random() < frac]
+
+
+CATALOG_TABLES = [
+    "products_in", "product_salts", "janaushadhi_products", "nppa_ceiling_prices", "rxnorm_cache",
+    "medline_cache_by_ingredient", "medline_monograph_by_signature", "medline_negative_cache",
+    "dailymed_cache_by_ingredient", "openfda_cache_by_ingredient", "signatures",
+]
+
+
+def _copy(cur, sql: str, rows) -> int:
+    n = 0
+    with cur.copy(sql) as cp:
+        for row in rows:
+            cp.write_row(row)
+            n += 1
+    return n
+
+
+def load(db_url: str, cat: SyntheticCatalog, truncate: bool = False, jana: Optional[int] = None,
+         nppa: Optional[int] = None, cache_frac: float = 0.8, monograph_frac: float = 0.3,
+         analyze: bool = True, log=print) -> Dict[str, int]:
+    """COPY the catalog into ``db_url``; returns rows written per table."""
+    scale_root = math.sqrt(max(cat.products / PRODUCTS_PER_SCALE, 0.01))
+    jana = int(2000 * scale_root) if jana is None else jana
+    nppa = int(900 * scale_root) if nppa is None else nppa
+    counts: Dict[str, int] = {}
+    with psycopg.connect(db_url) as cx, cx.cursor() as cur:
+        if truncate:
+            cur.execute(f"TRUNCATE {', '.join(CATALOG_TABLES)} RESTART IDENTITY CASCADE")
+        elif cur.execute("SELECT EXISTS (SELECT 1 FROM products_in)").fetchone()[0]:
+            raise SystemExit("products_in is not empty; pass --truncate to replace the catalog")
+
+        def step(table, sql, rows):
+            t0 = time.perf_counter()
+            counts[table] = counts.get(table, 0) + _copy(cur, sql, rows)
+            dt = time.perf_counter() - t0
+            log(f"  {table:<34}{counts[table]:>10} rows {dt:7.1f}s")
+
+        step("products_in", "COPY products_in (id, brand_name, strength, dosage_form, pack, mrp_inr, manufacturer, "
+             "discontinued, rxcuis, salt_signature) FROM STDIN", cat.product_rows())
+        step("product_salts", "COPY product_salts (product_id, salt_name, salt_pos) FROM STDIN", cat.salt_rows())
+        cur.execute("SELECT setval('products_in_id_seq', GREATEST(%s, 1))", (cat.products,))
+        step("janaushadhi_products", "COPY janaushadhi_products (generic_name, strength, dosage_form, pack, mrp_inr, "
+             "salt_signature) FROM STDIN", cat.jana_rows(jana))
+        step("nppa_ceiling_prices", "COPY nppa_ceiling_prices (generic_name, strength, pack, ceiling_price, "
+             "salt_signature) FROM STDIN", cat.nppa_rows(nppa))
+
+        step("rxnorm_cache", "COPY rxnorm_cache (term_norm, rxcuis) FROM STDIN",
+             ((s.lower(), [cat.rxcui[i]]) for i, s in enumerate(cat.salts)))
+        cached = cat.cached_salts(cache_frac)
+        step("medline_cache_by_ingredient", "COPY medline_cache_by_ingredient (term_norm, topic_title, topic_url, sections) FROM STDIN",
+             ((cat.salts[i].lower(), cat.salts[i], f"https://medlineplus.gov/druginfo/{cat.rxcui[i]}.html",
+               json.dumps(topic_sections(cat.salts[i]))) for i in cached))
+        for table in ("dailymed_cache_by_ingredient", "openfda_cache_by_ingredient"):
+            step(table, f"COPY {table} (term_norm, payload) FROM STDIN",
+                 ((cat.salts[i].lower(), json.dumps({k: [v] for k, v in topic_sections(cat.salts[i]).items() if k != "how_to_take"}))
+                  for i in cached))
+        cached_set = set(cached)
+        step("medline_negative_cache", "COPY medline_negative_cache (term_norm, reason) FROM STDIN",
+             ((cat.salts[i].lower(), "no_topic") for i in range(len(cat.salts)) if i not in cached_set and i % 4 == 0))
+        top = int(len(cat.combos) * monograph_frac)
+        step("medline_monograph_by_signature", "COPY medline_monograph_by_signature (salt_signature, title, sources, sections) FROM STDIN",
+             ((cat.signatures[ci], cat.combo_name(ci), json.dumps([]), json.dumps(topic_sections(cat.combo_name(ci))))
+              for ci in range(top)))
+        t0 = time.perf_counter()
+        counts["signatures"], _ = refresh_signatures(cx)
+        log(f"  {'signatures':<34}{counts['signatures']:>10} rows {time.perf_counter() - t0:7.1f}s")
+    if analyze:
+        with psycopg.connect(db_url, autocommit=True) as cx:
+            for table in CATALOG_TABLES:
+                cx.execute(f"ANALYZE {table}")
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load a synthetic catalog for benchmarks / capacity planning")
+    ap.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="Target database (default: DATABASE_URL)")
+    ap.add_argument("--scale", type=float, default=1.0, help=f"Scale factor ({PRODUCTS_PER_SCALE} products per unit)")
+    ap.add_argument("--products", type=int, help="Exact product count (overrides --scale)")
+    ap.add_argument("--salts", type=int, help="Distinct salts (default grows with sqrt(scale))")
+    ap.add_argument("--signatures", type=int, help="Distinct signatures (default products/15)")
+    ap.add_argument("--jana", type=int, help="Jan Aushadhi rows (default 2000*sqrt(scale))")
+    ap.add_argument("--nppa", type=int, help="NPPA rows (default 900*sqrt(scale))")
+    ap.add_argument("--unmapped-frac", type=float, default=0.03, help="Products left without a signature")
+    ap.add_argument("--cache-frac", type=float, default=0.8, help="Salts with warm MedlinePlus/DailyMed/openFDA cache rows")
+    ap.add_argument("--monograph-frac", type=float, default=0.3, help="Most popular signatures with a stored monograph")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--truncate", action="store_true", help="Replace existing catalog and cache rows")
+    ap.add_argument("--yes", action="store_true", help="Confirm loading into DATABASE_URL (the app's database)")
+    ap.add_argument("--no-analyze", action="store_true")
+    args = ap.parse_args(argv)
+    if not args.database_url:
+        ap.error("--database-url (or DATABASE_URL) is required")
+    if args.database_url == os.getenv("DATABASE_URL") and not args.yes:
+        ap.error("target is DATABASE_URL (the app's database); pass --yes to confirm or --database-url for another one")
+
+    products = args.products if args.products is not None else int(args.scale * PRODUCTS_PER_SCALE)
+    t0 = time.perf_counter()
+    cat = SyntheticCatalog(products, seed=args.seed, unmapped_frac=args.unmapped_frac,
+                           salts=args.salts, signatures=args.signatures)
+    print(f"catalog: {products} products, {len(cat.salts)} salts, {len(cat.combos)} signatures (seed={args.seed})")
+    counts = load(args.database_url, cat, truncate=args.truncate, jana=args.jana, nppa=args.nppa,
+                  cache_frac=args.cache_frac, monograph_frac=args.monograph_frac, analyze=not args.no_analyze)
+    dt = time.perf_counter() - t0
+    total = sum(counts.values())
+    print(f"done: {total} rows in {dt:.1f}s ({total / dt:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,12 @@ from pathlib import Path
 from dotenv import load_dotenv
 import psycopg
 
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.dbio import refresh_signatures
+
 load_dotenv()
 CSV_PATH = Path("data/india_catalog_sample.csv")
 if not CSV_PATH.exists():
@@ -22,10 +28,13 @@ def split_salts(s: str):
             cleaned.append(x)
     return cleaned
 
-conn = psycopg.connect(
-    host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
-    dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS")
-)
+def connect():
+    return psycopg.connect(
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS")
+    )
+
+conn = connect()
 
 inserted = 0
 skipped = 0
@@ -63,4 +72,8 @@ with conn:
                     """, (pid, sname, i))
                 inserted += 1
 
-print(f"INGEST COMPLETE: inserted={inserted}, skipped={skipped}")
+# Re-ingested products may already carry signatures; keep the signature-level table in step
+with connect() as conn:
+    sig_upserted, sig_deleted = refresh_signatures(conn)
+
+print(f"INGEST COMPLETE: inserted={inserted}, skipped={skipped}, signatures upserted={sig_upserted} deleted={sig_deleted}")
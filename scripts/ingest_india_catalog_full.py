@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
+import os
+import sys
 import csv
 import psycopg
 import re
 from pathlib import Path
 from dotenv import load_dotenv
 
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.dbio import refresh_signatures
+
 load_dotenv()
 
 def db():
@@ -116,9 +124,14 @@ def main():
         inserted += process_batch(cur, batch_data)
     
     conn.commit()
+
+    # Products that already carry a signature may have new prices/salts
+    sig_upserted, sig_deleted = refresh_signatures(conn)
+    conn.commit()
     conn.close()
     
-    print(f"[DONE] India Catalog: inserted={inserted}, skipped={skipped}, total_processed={processed}")
+    print(f"[DONE] India Catalog: inserted={inserted}, skipped={skipped}, total_processed={processed}, "
+          f"signatures upserted={sig_upserted} deleted={sig_deleted}")
 
 def process_batch(cur, batch_data):
     """Process a batch of data for better performance"""
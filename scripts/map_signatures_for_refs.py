@@ -1,10 +1,35 @@
-import os, re, psycopg
+"""Map RxNorm salt signatures onto the reference tables (Jan Aushadhi, NPPA).
+
+Rows are grouped by their normalized salt set (the same generic at different strengths,
+packs or forms is one group). Every distinct salt across all targets is resolved once on a
+worker pool, and the signatures are written with one bulk UPDATE per ``--batch`` rows.
+
+The command can be resumed: each batch is committed, RxNorm results are cached in
+``rxnorm_cache``, and without ``--recompute-all`` only rows with no signature are
+selected. Unresolved rows are never written. They stay NULL, or keep their old signature,
+and the next run retries them.
+
+Usage:
+  python scripts/map_signatures_for_refs.py                 # both targets, missing only
+  python scripts/map_signatures_for_refs.py --targets nppa --workers 16
+  python scripts/map_signatures_for_refs.py --recompute-all
+"""
+import os, re, sys, time, argparse, psycopg
+from pathlib import Path
 from dotenv import load_dotenv
-from app.rxnorm_client import rxnorm_lookup
+
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.rxnorm_client import resolve_terms
 from app.normalization import norm_term
+from app.dbio import bulk_update_signatures
 
 load_dotenv()
 
+TARGETS = {"jana": "janaushadhi_products", "nppa": "nppa_ceiling_prices"}
+
 def db():
     return psycopg.connect(
         host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"),
@@ -18,44 +43,72 @@ def split_salts(generic_name: str):
     out = [norm_term(x) for x in parts if x and norm_term(x)]
     return [re.sub(r"\s+", " ", x).title() for x in out]
 
-def signature_for(generic_name: str):
-    salts = split_salts(generic_name)
-    rxcui_set = set()
-    for s in salts:
-        rxcuis, _ = rxnorm_lookup(s)
-        if rxcuis:
-            rxcui_set.add(rxcuis[0])
-    if not rxcui_set:
-        return None
-    return "-".join(sorted(rxcui_set))
-
-def update_janaushadhi():
-    with db() as conn, conn.cursor() as cur:
-        cur.execute("SELECT id, generic_name FROM janaushadhi_products WHERE salt_signature IS NULL")
-        rows = cur.fetchall()
-        ok = 0
-        for _id, name in rows:
-            sig = signature_for(name)
-            cur.execute("UPDATE janaushadhi_products SET salt_signature=%s, updated_at=NOW() WHERE id=%s", (sig, _id))
-            if sig:
-                ok += 1
-    print(f"JANA updated signatures. ok={ok}")
-
-def update_nppa():
+def group_by_salts(rows):
+    """{sorted salt tuple: [ids]} for (id, generic_name) rows; names without salts are dropped."""
+    groups: dict[tuple[str, ...], list[int]] = {}
+    for _id, name in rows:
+        salts = tuple(sorted(set(split_salts(name))))
+        if salts:
+            groups.setdefault(salts, []).append(_id)
+    return groups
+
+def signature_from(salts, resolved):
+    """Signature of a salt group from {salt: rxcuis}; None when no salt resolved."""
+    rxcui_set = {resolved[s][0] for s in salts if resolved.get(s)}
+    return "-".join(sorted(rxcui_set)) if rxcui_set else None
+
+def select_rows(table, recompute_all, limit):
+    sql = f"SELECT id, generic_name FROM {table}"
+    if not recompute_all:
+        sql += " WHERE salt_signature IS NULL"
+    sql += " ORDER BY id"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
     with db() as conn, conn.cursor() as cur:
-        cur.execute("SELECT id, generic_name FROM nppa_ceiling_prices WHERE salt_signature IS NULL")
-        rows = cur.fetchall()
-        ok = 0
-        for _id, name in rows:
-            sig = signature_for(name)
-            cur.execute("UPDATE nppa_ceiling_prices SET salt_signature=%s, updated_at=NOW() WHERE id=%s", (sig, _id))
-            if sig:
-                ok += 1
-    print(f"NPPA updated signatures. ok={ok}")
-
-def main():
-    update_janaushadhi()
-    update_nppa()
+        cur.execute(sql)
+        return cur.fetchall()
+
+def write_signatures(table, groups, resolved, batch):
+    """Bulk-update resolved groups, committing every ``batch`` rows; returns (ok, changed)."""
+    updates = [
+        (_id, None, sig)
+        for salts, ids in groups.items()
+        if (sig := signature_from(salts, resolved))
+        for _id in ids
+    ]
+    changed = 0
+    with db() as conn:
+        for i in range(0, len(updates), batch):
+            changed += bulk_update_signatures(conn, table, updates[i:i + batch])
+            conn.commit()
+    return len(updates), changed
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Map salt signatures onto Jan Aushadhi / NPPA rows")
+    ap.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS), help="Tables to map")
+    ap.add_argument("--workers", type=int, default=8, help="Concurrent RxNorm lookups")
+    ap.add_argument("--batch", type=int, default=1000, help="Rows per DB commit batch (one bulk UPDATE each)")
+    ap.add_argument("--recompute-all", action="store_true", help="Remap rows that already have a signature")
+    ap.add_argument("--limit", type=int, default=None, help="Max rows per table (debug)")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    started = time.time()
+    groups = {}
+    for key in args.targets:
+        rows = select_rows(TARGETS[key], args.recompute_all, args.limit)
+        groups[key] = group_by_salts(rows)
+        print(f"{key.upper()}: rows={len(rows)} distinct_generics={len(groups[key])}")
+
+    salts = {s for g in groups.values() for group in g for s in group}
+    print(f"Resolving {len(salts)} distinct salts workers={args.workers}")
+    resolved = resolve_terms(salts, workers=args.workers)
+    print(f"Resolved {sum(1 for s in salts if resolved.get(s))}/{len(salts)} salts in {time.time() - started:.1f}s")
+
+    for key in args.targets:
+        ok, changed = write_signatures(TARGETS[key], groups[key], resolved, args.batch)
+        print(f"{key.upper()} updated signatures. ok={ok} changed={changed}")
 
 if __name__ == "__main__":
     main()
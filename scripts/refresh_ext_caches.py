@@ -0,0 +1,58 @@
+"""Background refresher daemon for the DailyMed / openFDA ingredient caches.
+
+Keeps popular ingredients warm so they never expire on the request path:
+every ``--interval-sec`` it scans entries expiring within ``--margin-hours``,
+ranks them by advise_logs traffic + product counts and refreshes the top
+``--budget`` per source (defaults to one minute of that source's rate limit).
+
+Usage:
+  python -m scripts.refresh_ext_caches            # loop forever
+  python -m scripts.refresh_ext_caches --once     # single pass (cron friendly)
+"""
+import sys, time, argparse, logging
+from pathlib import Path
+from dotenv import load_dotenv
+
+_ROOT = Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+from app.cache_refresher import refresh_pass, DB_URL
+
+load_dotenv()
+
+
+def parse_args(argv):
+    ap = argparse.ArgumentParser(description="Refresh hot DailyMed/openFDA cache entries before they expire")
+    ap.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    ap.add_argument("--interval-sec", type=int, default=900, help="Seconds between passes")
+    ap.add_argument("--margin-hours", type=int, default=24, help="Refresh entries expiring within this window")
+    ap.add_argument("--budget", type=int, default=None, help="Max refreshes per source per pass")
+    ap.add_argument("--scan-limit", type=int, default=2000, help="Max expiring rows scanned per source")
+    ap.add_argument("--min-score", type=int, default=1, help="Skip entries below this popularity score")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    while True:
+        started = time.time()
+        try:
+            done = refresh_pass(
+                DB_URL,
+                margin_hours=args.margin_hours,
+                budget=args.budget,
+                scan_limit=args.scan_limit,
+                min_score=args.min_score,
+            )
+            print(f"[REFRESH] {done} elapsed={time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"[REFRESH] pass failed: {e.__class__.__name__}: {e}")
+        if args.once:
+            return 0
+        time.sleep(max(0.0, args.interval_sec - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
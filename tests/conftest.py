@@ -2,3 +2,7 @@ import sys, os
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+# Requests that reach /advise must not start the real advise_logs writer thread (no DB here);
+# tests of the writer build their own AdviseLogWriter.
+os.environ.setdefault("ADVISE_LOG", "0")
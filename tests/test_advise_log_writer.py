@@ -0,0 +1,104 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import app.advise_log_writer as alw
+from app import metrics
+
+
+class _FakeCopy:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write_row(self, row):
+        self.sink.append(row)
+
+
+class _FakeConn:
+    def __init__(self, batches):
+        self.batches = batches
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def copy(self, sql):
+        assert sql.startswith("COPY advise_logs")
+        self.batches.append([])
+        return _FakeCopy(self.batches[-1])
+
+
+def test_rows_are_batched_by_size_and_time(monkeypatch):
+    batches = []
+    monkeypatch.setattr(alw.psycopg, "connect", lambda *a, **k: _FakeConn(batches))
+    w = alw.AdviseLogWriter(db_url="x", batch_size=3, flush_ms=100, queue_max=100)
+    try:
+        for i in range(4):
+            assert w.log(f"q{i}", "Crocin", "sig", "uses")
+        deadline = time.time() + 3
+        while sum(len(b) for b in batches) < 4 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        w.close()
+    assert [len(b) for b in batches] == [3, 1]  # full batch at once, the rest after flush_ms
+    assert batches[0][0][1:] == ("q0", "Crocin", "sig", "uses", True, None)
+
+
+def test_queue_full_drops_and_close_drains(monkeypatch):
+    metrics.reset()
+    batches = []
+    monkeypatch.setattr(alw.psycopg, "connect", lambda *a, **k: _FakeConn(batches))
+    w = alw.AdviseLogWriter(db_url="x", batch_size=10, queue_max=2, start=False)
+    assert w.log("a", None, "s", "uses") and w.log("b", None, "s", "uses")
+    assert not w.log("c", None, "s", "uses")
+    w.close()
+    assert [r[1] for r in batches[0]] == ["a", "b"]
+    text = metrics.render_prometheus()
+    assert 'advise_log_dropped_total{reason="queue_full"} 1' in text
+    assert "advise_log_written_total 2" in text
+    assert "advise_log_latency_seconds_count 2" in text
+
+
+def test_db_error_drops_batch(monkeypatch):
+    metrics.reset()
+
+    def boom(*a, **k):
+        raise OSError("db down")
+
+    monkeypatch.setattr(alw.psycopg, "connect", boom)
+    w = alw.AdviseLogWriter(db_url="x", start=False)
+    w.log("a", None, "s", "uses")
+    assert w.flush() == 0
+    assert w.pending() == 0
+    assert 'advise_log_dropped_total{reason="db_error"} 1' in metrics.render_prometheus()
+
+
+def test_connects_with_db_settings_and_stamps_utc(monkeypatch):
+    batches, kwargs = [], []
+
+    def connect(*a, **k):
+        kwargs.append((a, k))
+        return _FakeConn(batches)
+
+    for key, val in {"DB_HOST": "db.internal", "DB_PORT": "6543", "DB_NAME": "medbot", "DB_USER": "u", "DB_PASS": "p"}.items():
+        monkeypatch.setenv(key, val)
+    monkeypatch.setenv("DATABASE_URL", "postgresql://elsewhere/other")
+    monkeypatch.setattr(alw.psycopg, "connect", connect)
+    w = alw.AdviseLogWriter(start=False)
+    w.log("a", None, "s", "uses")
+    assert w.flush() == 1
+    args, k = kwargs[0]
+    assert args == () and (k["host"], k["port"], k["dbname"], k["user"]) == ("db.internal", "6543", "medbot", "u")
+    asked_at = batches[0][0][0]
+    assert asked_at.tzinfo is None
+    assert abs(asked_at - datetime.now(timezone.utc).replace(tzinfo=None)) < timedelta(minutes=1)
@@ -0,0 +1,143 @@
+import threading, time, pytest
+import app.langgraph_agent as agent
+
+
+@pytest.fixture(autouse=True)
+def _no_catalog_matcher(monkeypatch):
+    # exercise the /search + /resolve path regardless of what the local DB holds
+    monkeypatch.setattr(agent, "get_brand_matcher", lambda: None)
+
+
+def test_branches_run_concurrently_and_compose_uses_state(monkeypatch):
+    calls = []
+    in_flight = {"n": 0, "max": 0}
+    lock = threading.Lock()
+
+    def fake_http_get(path, params, allow_404=False, timeout=None):
+        calls.append(path)
+        if path == "/search":
+            return {"query": params["query"], "hits": [{"brand_name": "Augmentin 625 Duo"}]}
+        if path == "/resolve":
+            return {"matches": [{"salt_signature": "sig-amox", "brand_name": "Augmentin"}]}
+        with lock:
+            in_flight["n"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["n"])
+        time.sleep(0.05)
+        with lock:
+            in_flight["n"] -= 1
+        if path == "/monograph":
+            return {"signature": "sig-amox", "sources": ["medlineplus"], "sections": {"uses": "Treats bacterial infections."}}
+        if path == "/alternatives":
+            return {"signature": "sig-amox", "salts": [{"salt_name": "Amoxicillin"}], "brands": [], "janaushadhi": []}
+        raise AssertionError(f"unexpected call {path}")
+
+    monkeypatch.setattr(agent, "http_get", fake_http_get)
+    monkeypatch.setattr(agent, "_LLM", None)
+    r = agent.run_turn("t-parallel", "What is Augmentin used for?")
+
+    assert "bacterial infections" in r["answer"]
+    assert "/advise" not in calls  # answer built from fetched state, no second round-trip
+    assert calls.count("/monograph") == 1 and calls.count("/alternatives") == 1
+    assert in_flight["max"] == 2
+    assert r["have_monograph"] and r["have_alternatives"]
+    for node in ("parse", "resolve_signature", "fetch_monograph", "fetch_alternatives", "compose", "total"):
+        assert node in r["timings_ms"]
+
+
+def _fake_api(delay_alternatives):
+    def fake_http_get(path, params, allow_404=False, timeout=None):
+        if path == "/search":
+            return {"query": params["query"], "hits": []}
+        if path == "/resolve":
+            return {"matches": [{"salt_signature": "sig-amox"}]}
+        if path == "/monograph":
+            return {"signature": "sig-amox", "sources": [], "sections": {"uses": "Treats bacterial infections."}}
+        if path == "/alternatives":
+            time.sleep(delay_alternatives)
+            return {"signature": "sig-amox", "salts": [], "brands": []}
+        raise AssertionError(path)
+    return fake_http_get
+
+
+def test_arun_turn_concurrent_chats(monkeypatch):
+    import asyncio
+    monkeypatch.setattr(agent, "http_get", _fake_api(0.1))
+    monkeypatch.setattr(agent, "_LLM", None)
+
+    async def many():
+        return await asyncio.gather(*[agent.arun_turn(f"t-async-{i}", "What is Augmentin used for?") for i in range(4)])
+
+    started = time.perf_counter()
+    replies = asyncio.run(many())
+    assert time.perf_counter() - started < 0.35  # turns overlap instead of queueing
+    assert all("bacterial infections" in r["answer"] and not r["timed_out"] for r in replies)
+
+
+def test_arun_turn_deadline_returns_partial_answer(monkeypatch):
+    import asyncio
+    monkeypatch.setattr(agent, "http_get", _fake_api(2.0))
+    monkeypatch.setattr(agent, "_LLM", None)
+
+    async def turn():
+        started = time.perf_counter()
+        reply = await agent.arun_turn("t-deadline", "What is Augmentin used for?", timeout_ms=200)
+        return reply, time.perf_counter() - started
+
+    # (asyncio.run itself still joins the blocked executor thread on shutdown)
+    r, elapsed = asyncio.run(turn())
+    assert elapsed < 1.0
+    assert r["timed_out"] is True
+    assert r["signature"] == "sig-amox"
+    assert r["answer"]  # built from what was fetched before the deadline
+
+
+def test_nodes_skip_work_after_deadline(monkeypatch):
+    calls = []
+
+    def fake_http_get(path, params, allow_404=False, timeout=None):
+        calls.append(path)
+        return {}
+
+    monkeypatch.setattr(agent, "http_get", fake_http_get)
+    monkeypatch.setattr(agent, "_LLM", None)
+    r = agent.run_turn("t-late", "What is Augmentin used for?", timeout_ms=0.001)
+    assert calls == [] and r["timed_out"] is True
+
+
+def test_local_monograph_miss_is_bounded_by_the_turn_budget(monkeypatch):
+    from types import SimpleNamespace
+    budgets = []
+
+    def compose_on_miss(sig, terms, budget_s, wait_s=0.0):
+        budgets.append((sig, terms, budget_s, wait_s))
+        return None, "pending"
+
+    monkeypatch.setattr(agent, "AGENT_LOCAL", True)
+    monkeypatch.setattr(agent, "_LOCAL", SimpleNamespace(
+        get_monograph_by_signature=lambda sig: None,
+        salts_by_signature=lambda sig: [{"salt_name": "Amoxicillin"}],
+        compose_on_miss=compose_on_miss,
+        compose_budget_s=0.3,
+    ))
+    assert agent.http_get("/monograph", {"signature": "sig-amox"}, allow_404=True, timeout=0.1) is None
+    assert budgets == [("sig-amox", ["Amoxicillin"], 0.1, 0.1)]
+    assert agent.http_get("/monograph", {"signature": "sig-amox"}, allow_404=True, timeout=2.0) is None
+    assert budgets[-1] == ("sig-amox", ["Amoxicillin"], 0.3, 2.0)  # cache phase capped, upstream waits the rest
+
+
+def test_compose_applies_red_flags_and_logs_the_turn(monkeypatch):
+    logged = []
+
+    class _Writer:
+        def log(self, *row):
+            logged.append(row)
+            return True
+
+    monkeypatch.setattr(agent, "get_advise_log_writer", lambda: _Writer())
+    state = agent.AgentState(
+        user_text="Can I take Augmentin during pregnancy?", brand="Augmentin", signature="sig-amox", intent="precautions",
+        monograph={"sections": {"precautions": "Take with food."}, "sources": []}, alternatives={"salts": []},
+    )
+    answer = agent.node_compose(state)["answer"]
+    assert "consult a licensed clinician" in answer
+    assert logged == [("Can I take Augmentin during pregnancy?", "Augmentin", "sig-amox", "precautions", True, "agent")]
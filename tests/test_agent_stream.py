@@ -0,0 +1,88 @@
+import json, pytest
+from fastapi.testclient import TestClient
+from app.main import app
+import app.langgraph_agent as agent
+from app.llm_service import LLMService
+
+
+@pytest.fixture(autouse=True)
+def _no_catalog_matcher(monkeypatch):
+    # exercise the /search + /resolve path regardless of what the local DB holds
+    monkeypatch.setattr(agent, "get_brand_matcher", lambda: None)
+
+
+def _fake_http_get(path, params, allow_404=False, timeout=None):
+    if path == "/search":
+        return {"query": params["query"], "hits": []}
+    if path == "/resolve":
+        return {"matches": [{"salt_signature": "sig-amox"}]}
+    if path == "/monograph":
+        return {"signature": "sig-amox", "sources": [], "sections": {"uses": "Treats bacterial infections."}}
+    if path == "/alternatives":
+        return {"signature": "sig-amox", "salts": [], "brands": [], "price_summary": {"min_price": 10.0, "count": 3}}
+    raise AssertionError(path)
+
+
+class _ChunkedLLM(LLMService):
+    def stream_rewrite(self, answer):
+        yield from ["This medicine treats ", "bacterial infections. ", "Educational information only."]
+
+
+def _events(body: str):
+    out = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_stream_emits_node_events_then_tokens(monkeypatch):
+    monkeypatch.setattr(agent, "http_get", _fake_http_get)
+    monkeypatch.setattr(agent, "_LLM", _ChunkedLLM())
+    r = TestClient(app).post("/agent/stream", json={"session_id": "t-stream", "message": "What is Augmentin used for?"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    names = [e for e, _ in events]
+    assert names[0] == "resolved" and events[0][1]["signature"] == "sig-amox"
+    assert names.index("price_summary") < names.index("answer") < names.index("token")
+    assert events[names.index("price_summary")][1]["price_summary"]["min_price"] == 10.0
+    assert "bacterial infections" in events[names.index("answer")][1]["answer"]
+    assert names.count("token") == 3 and names[-1] == "done"
+    done = events[-1][1]
+    assert done["answer"] == "This medicine treats bacterial infections. Educational information only."
+    assert "rewrite_fluency" in done["timings_ms"]
+
+
+def test_stream_without_llm_ends_with_deterministic_answer(monkeypatch):
+    monkeypatch.setattr(agent, "http_get", _fake_http_get)
+    monkeypatch.setattr(agent, "_LLM", None)
+    r = TestClient(app).post("/agent/stream", json={"session_id": "t-stream-2", "message": "What is Augmentin used for?"})
+    events = _events(r.text)
+    names = [e for e, _ in events]
+    assert "token" not in names and names[-1] == "done"
+    assert events[-1][1]["answer"] == events[names.index("answer")][1]["answer"]
+
+
+def test_stream_turn_is_bounded_by_deadline(monkeypatch):
+    import asyncio, time
+
+    def slow_http_get(path, params, allow_404=False, timeout=None):
+        if path == "/alternatives":
+            time.sleep(2.0)
+        return _fake_http_get(path, params, allow_404, timeout)
+
+    monkeypatch.setattr(agent, "http_get", slow_http_get)
+    monkeypatch.setattr(agent, "_LLM", _ChunkedLLM())
+
+    async def collect():
+        started = time.perf_counter()
+        events = [e async for e in agent.astream_turn("t-stream-deadline", "What is Augmentin used for?", timeout_ms=200)]
+        return events, time.perf_counter() - started
+
+    events, elapsed = asyncio.run(collect())
+    assert elapsed < 1.0
+    names = [e for e, _ in events]
+    assert "token" not in names and names[-1] == "done"
+    done = events[-1][1]
+    assert done["timed_out"] is True and done["signature"] == "sig-amox" and done["answer"]
@@ -0,0 +1,48 @@
+import app.langgraph_agent as agent
+from app.brand_matcher import BrandMatcher
+
+BRANDS = [
+    ("Augmentin 625 Duo Tablet", "sig-amox-clav"),
+    ("Augmentin 375 Tablet", "sig-amox-clav"),
+    ("Dolo 650 Tablet", "sig-para"),
+    ("Crocin Advance", "sig-para"),
+    ("Crocin Cold & Flu", "sig-para-phen"),
+]
+SALTS = [("Paracetamol", "sig-para"), ("Azithromycin", "sig-azi")]
+
+
+def test_lowercase_mentions_and_heads_map_to_signature():
+    m = BrandMatcher.from_rows(BRANDS, SALTS)
+    hit = m.find("what is augmentin used for?")
+    assert hit.name == "Augmentin" and hit.signature == "sig-amox-clav"
+    assert m.find("side effects of dolo 650").signature == "sig-para"
+    assert m.find("is AZITHROMYCIN safe").kind == "salt"
+    assert m.find("what is this used for") is None
+
+
+def test_longest_mention_wins_and_ambiguous_heads_have_no_signature():
+    m = BrandMatcher.from_rows(BRANDS, SALTS)
+    assert m.find("crocin cold & flu dose").signature == "sig-para-phen"
+    ambiguous = m.find("crocin for fever")
+    assert ambiguous.name == "Crocin" and ambiguous.signature is None
+    assert set(ambiguous.signatures) == {"sig-para", "sig-para-phen"}
+
+
+def test_agent_exact_hit_skips_search_round_trip(monkeypatch):
+    calls = []
+
+    def fake_http_get(path, params, allow_404=False, timeout=None):
+        calls.append(path)
+        if path == "/monograph":
+            return {"sources": [], "sections": {"uses": "Bacterial infections."}}
+        return {"salts": [], "brands": []}
+
+    matcher = BrandMatcher.from_rows(BRANDS, SALTS)
+    monkeypatch.setattr(agent, "get_brand_matcher", lambda: matcher)
+    monkeypatch.setattr(agent, "http_get", fake_http_get)
+    monkeypatch.setattr(agent, "_LLM", None)
+    r = agent.run_turn("t-matcher", "what is augmentin used for?")
+    assert r["signature"] == "sig-amox-clav" and r["brand"] == "Augmentin"
+    assert "/search" not in calls and "/resolve" not in calls
+    # remembered for the follow-up turn
+    assert agent.run_turn("t-matcher", "any cheaper option?")["signature"] == "sig-amox-clav"
@@ -0,0 +1,76 @@
+import pytest
+
+from app import dbio
+
+
+class _Copy:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write_row(self, row):
+        self.sink.append(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Cursor:
+    def __init__(self):
+        self.sql = []
+        self.copied = []
+        self.rowcount = 7
+
+    def execute(self, sql, params=None):
+        self.sql.append(" ".join(sql.split()))
+
+    def copy(self, sql):
+        self.sql.append(sql)
+        return _Copy(self.copied)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Conn:
+    def __init__(self):
+        self.cur = _Cursor()
+
+    def cursor(self):
+        return self.cur
+
+
+def test_products_update_is_one_statement_skipping_unchanged():
+    conn = _Conn()
+    rows = [(1, ["161"], "161"), (2, None, None)]
+    assert dbio.bulk_update_signatures(conn, "products_in", iter(rows)) == 7
+    assert conn.cur.copied == rows
+    updates = [s for s in conn.cur.sql if s.startswith("UPDATE")]
+    assert updates == [
+        "UPDATE products_in t SET (rxcuis, salt_signature, updated_at) = (u.rxcuis, u.salt_signature, NOW()) "
+        "FROM _signature_updates u WHERE t.id = u.id AND (t.rxcuis, t.salt_signature) IS DISTINCT FROM (u.rxcuis, u.salt_signature)"
+    ]
+
+
+def test_reference_tables_ignore_rxcuis():
+    conn = _Conn()
+    dbio.bulk_update_signatures(conn, "nppa_ceiling_prices", [(5, None, "161")])
+    update = [s for s in conn.cur.sql if s.startswith("UPDATE")][0]
+    assert "rxcuis" not in update.split("FROM")[0]
+    assert "(t.salt_signature) IS DISTINCT FROM (u.salt_signature)" in update
+
+
+def test_empty_batch_skips_update():
+    conn = _Conn()
+    assert dbio.bulk_update_signatures(conn, "janaushadhi_products", []) == 0
+    assert not any(s.startswith("UPDATE") for s in conn.cur.sql)
+
+
+def test_rejects_unknown_table():
+    with pytest.raises(ValueError):
+        dbio.bulk_update_signatures(_Conn(), "products_in; DROP TABLE x", [])
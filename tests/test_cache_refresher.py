@@ -0,0 +1,126 @@
+import os
+from datetime import datetime, timedelta
+
+import psycopg
+import pytest
+
+import app.cache_refresher as cr
+from app.cache_refresher import rank_candidates
+from app.ext_http import UpstreamError
+from app.normalization import norm_term
+
+
+def test_rank_prefers_popular_then_oldest():
+    now = datetime(2025, 1, 1)
+    cands = [
+        ("cold", now - timedelta(days=9)),
+        ("amoxicillin", now - timedelta(days=6)),
+        ("paracetamol", now - timedelta(days=7)),
+        ("ibuprofen", now - timedelta(days=8)),
+    ]
+    scores = {"cold": 0, "amoxicillin": 250, "paracetamol": 90, "ibuprofen": 90}
+    assert rank_candidates(cands, scores, budget=3) == ["amoxicillin", "ibuprofen", "paracetamol"]
+    # budget caps the pass; zero-score entries are left to expire naturally
+    assert rank_candidates(cands, scores, budget=1) == ["amoxicillin"]
+    assert "cold" not in rank_candidates(cands, scores, budget=10)
+
+
+class _Cx:
+    """Answers the refresher's queries from fixed rows (no DB)."""
+
+    def __init__(self, expiring, catalog, advise):
+        self.expiring, self.catalog, self.advise = expiring, catalog, advise
+        self.sql = []
+
+    def execute(self, sql, params=None):
+        self.sql.append((sql, params))
+        if "advise_logs" in sql:
+            self._rows = self.advise
+        elif "FROM product_salts" in sql:
+            self._rows = self.catalog
+        elif "SELECT term_norm, fetched_at" in sql:
+            self._rows = self.expiring
+        else:
+            self._rows = []
+        return self
+
+    def fetchall(self):
+        return self._rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Client:
+    def __init__(self, db_url=None, answers=None):
+        self.refreshed = []
+        self.answers = answers or {}
+
+    def refresh(self, term):
+        self.refreshed.append(term)
+        got = self.answers.get(term, {"uses": ["x"]})
+        if isinstance(got, Exception):
+            raise got
+        return got
+
+
+def test_refresh_pass_refreshes_popular_expiring_terms(monkeypatch):
+    old = datetime(2025, 1, 1)
+    cx = _Cx(
+        expiring=[("cold", old), ("augmentin", old + timedelta(hours=1)), ("amoxicillin", old + timedelta(hours=2))],
+        catalog=[("Amoxicillin", 3)],
+        advise=[("augmentin", 2)],  # term_norm already normalized by _NORM_SQL
+    )
+    clients = {}
+    monkeypatch.setattr(cr.psycopg, "connect", lambda url: cx)
+    monkeypatch.setattr(cr, "DailyMedClient", lambda url: clients.setdefault("dailymed", _Client()))
+    monkeypatch.setattr(cr, "OpenFDAClient", lambda url: clients.setdefault("openfda", _Client()))
+    done = cr.refresh_pass("postgresql://unused", budget=5)
+    assert done == {"dailymed": 2, "openfda": 2}
+    assert clients["dailymed"].refreshed == ["augmentin", "amoxicillin"]  # 200 > 3; "cold" has no traffic
+    expiring_sql, params = next((q, p) for q, p in cx.sql if "SELECT term_norm, fetched_at" in q)
+    assert "FROM dailymed_cache_by_ingredient" in expiring_sql and params == (cr.DAILYMED_TTL_DAYS, 24, 2000)
+
+
+def test_only_confirmed_empty_answers_restamp_fetched_at(monkeypatch):
+    old = datetime(2025, 1, 1)
+    cx = _Cx(expiring=[("augmentin", old), ("amoxicillin", old)], catalog=[("Amoxicillin", 3), ("Augmentin", 3)], advise=[])
+    answers = {"augmentin": None, "amoxicillin": UpstreamError("openfda HTTP 429")}
+    monkeypatch.setattr(cr.psycopg, "connect", lambda url: cx)
+    monkeypatch.setattr(cr, "DailyMedClient", lambda url: _Client(answers=answers))
+    monkeypatch.setattr(cr, "OpenFDAClient", lambda url: _Client(answers=answers))
+    assert cr.refresh_pass("postgresql://unused", budget=5) == {"dailymed": 1, "openfda": 1}
+    stamped = [p for q, p in cx.sql if q.startswith("UPDATE")]
+    assert stamped == [("augmentin",), ("augmentin",)]
+
+
+def test_refresh_pass_is_skipped_without_external_calls(monkeypatch):
+    monkeypatch.setattr(cr, "NO_EXTERNAL", True)
+    monkeypatch.setattr(cr.psycopg, "connect", lambda url: pytest.fail("no DB work when NO_EXTERNAL=1"))
+    assert cr.refresh_pass("postgresql://unused") == {}
+
+
+def _connect():
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return psycopg.connect(url, connect_timeout=3)
+    return psycopg.connect(
+        host=os.getenv("DB_HOST", "localhost"), port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "medbot"), user=os.getenv("DB_USER", "appuser"),
+        password=os.getenv("DB_PASS", "apppass"), connect_timeout=3,
+    )
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("name", ["Augmentin™", "  Amoxicillin®  Trihydrate ", "PARACETAMOL", "Clavulanic\tAcid"])
+def test_sql_normalization_matches_norm_term(name):
+    try:
+        cx = _connect()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"database not reachable: {e}")
+    with cx:
+        got = cx.execute(f"SELECT {cr._NORM_SQL} FROM (VALUES (%s::text)) AS ps(salt_name)", (name,)).fetchone()[0]
+    assert got == norm_term(name)
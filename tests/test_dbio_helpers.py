@@ -0,0 +1,29 @@
+from app.dbio import dedup_salt_rows, price_summary
+
+
+def test_dedup_salt_rows_normalizes_case_and_whitespace():
+    rows = [("Amoxicillin", 1), (" AMOXICILLIN  ", 1), ("Clavulanic  Acid", 2), ("clavulanic acid", 2), ("Amoxicillin", 2)]
+    assert dedup_salt_rows(rows) == [
+        {"salt_pos": 1, "salt_name": "Amoxicillin"},
+        {"salt_pos": 2, "salt_name": "Clavulanic Acid"},
+    ]
+
+
+def test_dedup_salt_rows_keeps_reordered_combo_salts_once():
+    # Paracetamol+Caffeine and Caffeine+Paracetamol products of one signature
+    rows = [("Caffeine", 1), ("Paracetamol", 1), ("caffeine", 2), ("Paracetamol ", 2)]
+    assert dedup_salt_rows(rows) == [
+        {"salt_pos": 1, "salt_name": "Caffeine"},
+        {"salt_pos": 1, "salt_name": "Paracetamol"},
+    ]
+    assert dedup_salt_rows(reversed(rows)) == dedup_salt_rows(rows)
+
+
+def test_price_summary_quartiles_and_counts():
+    s = price_summary([8.0, 1.0, 5.0, 3.0, 7.0, 2.0], [6.0, 4.0], 2.5)
+    assert (s["min_price"], s["q1"], s["median"], s["q3"], s["max_price"]) == (1.0, 3.0, 4.5, 7.0, 8.0)
+    assert (s["count"], s["n_brands"], s["n_jana"], s["nppa_ceiling"]) == (8, 6, 2, 2.5)
+
+
+def test_price_summary_empty():
+    assert price_summary([], [], None) is None
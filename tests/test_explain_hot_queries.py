@@ -0,0 +1,87 @@
+"""EXPLAIN every hot request-path query and fail on full scans of the large tables.
+
+Runs against the configured database (schema chunks + ``alembic upgrade head`` applied);
+skipped when it is unreachable. Sequential scans are disabled for the session, so the
+planner only picks one (or walks a whole index without a condition) when no index can
+serve the query, independent of how much data the test database holds.
+"""
+import os
+
+import psycopg
+import pytest
+
+LARGE_TABLES = {"products_in", "product_salts", "advise_logs", "signatures"}
+SIG = "723-21216"
+
+# (name, sql, params, needs_trgm): copies of the queries in app/main.py, app/dbio.py,
+# app/search_service.py and app/cache_refresher.py
+HOT_QUERIES = [
+    ("signatures_pk", "SELECT salts FROM signatures WHERE salt_signature=%s", (SIG,), False),
+    ("brands_by_signature",
+     "SELECT id, brand_name, manufacturer, mrp_inr FROM products_in WHERE salt_signature=%s ORDER BY brand_name",
+     (SIG,), False),
+    ("salts_by_signature_join",
+     "SELECT ps.salt_name, ps.salt_pos FROM products_in p JOIN product_salts ps ON ps.product_id=p.id "
+     "WHERE p.salt_signature=%s ORDER BY ps.salt_pos, ps.salt_name", (SIG,), False),
+    ("resolve_salts", "SELECT product_id, salt_pos, salt_name FROM product_salts WHERE product_id = ANY(%s) "
+     "ORDER BY product_id, salt_pos", ([1, 2, 3],), False),
+    ("jana_by_signature", "SELECT generic_name, strength, dosage_form, pack, mrp_inr FROM janaushadhi_products "
+     "WHERE salt_signature=%s ORDER BY generic_name", (SIG,), False),
+    ("nppa_by_signature", "SELECT MIN(ceiling_price) FROM nppa_ceiling_prices WHERE salt_signature=%s", (SIG,), False),
+    ("monograph_by_signature", "SELECT title, sources, sections FROM medline_monograph_by_signature "
+     "WHERE salt_signature=%s", (SIG,), False),
+    ("advise_traffic_window",
+     "SELECT signature, count(*) FROM advise_logs WHERE asked_at > (NOW() AT TIME ZONE 'UTC') - make_interval(days => %s) "
+     "AND signature IS NOT NULL GROUP BY signature", (14,), False),
+    ("signature_by_name",
+     "SELECT salt_signature FROM products_in WHERE brand_name ILIKE %s AND salt_signature IS NOT NULL "
+     "ORDER BY brand_name LIMIT 1", ("%augmentin%",), True),
+    ("resolve_brands",
+     "SELECT id, brand_name FROM products_in WHERE brand_name ILIKE %s ORDER BY brand_name LIMIT %s OFFSET %s",
+     ("%augmentin%", 21, 0), True),
+]
+
+
+def _connect():
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return psycopg.connect(url, connect_timeout=3)
+    return psycopg.connect(
+        host=os.getenv("DB_HOST", "localhost"), port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "medbot"), user=os.getenv("DB_USER", "appuser"),
+        password=os.getenv("DB_PASS", "apppass"), connect_timeout=3,
+    )
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        cx = _connect()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"database not reachable: {e}")
+    yield cx
+    cx.close()
+
+
+def full_scans(plan, found=None):
+    """(node type, relation) for every scan that reads a large table without a condition."""
+    found = [] if found is None else found
+    rel = plan.get("Relation Name")
+    if rel in LARGE_TABLES:
+        node = plan["Node Type"]
+        if node == "Seq Scan" or (node in ("Index Scan", "Index Only Scan") and "Index Cond" not in plan):
+            found.append((node, rel))
+    for child in plan.get("Plans", []):
+        full_scans(child, found)
+    return found
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("name,sql,params,needs_trgm", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_indexes(conn, name, sql, params, needs_trgm):
+    if needs_trgm and not conn.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'idx_products_in_brand_trgm'").fetchone():
+        pytest.skip("pg_trgm index not available on this server")
+    with conn.transaction(force_rollback=True):
+        conn.execute("SET LOCAL enable_seqscan = off")
+        plan = conn.execute(f"EXPLAIN (FORMAT JSON) {sql}", params).fetchone()[0][0]["Plan"]
+    assert full_scans(plan) == [], f"{name} scans a large table without an index: {plan}"
@@ -0,0 +1,46 @@
+import contextlib
+import importlib.util
+import os
+from datetime import datetime, timedelta, timezone
+
+_spec = importlib.util.spec_from_file_location(
+    "fetch_monographs",
+    os.path.join(os.path.dirname(__file__), "..", "scripts", "fetch_monographs.py"),
+)
+fm = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fm)
+
+
+def _run(monkeypatch, tmp_path, docs, argv=()):
+    stored = []
+    monkeypatch.setattr(fm, "products_by_signature", lambda: {sig: [sig] for sig in docs})
+    monkeypatch.setattr(fm, "existing_monographs", lambda: {})
+    monkeypatch.setattr(fm, "compose_for_signature", lambda salts: docs[salts[0]])
+    monkeypatch.setattr(fm, "db", lambda: contextlib.nullcontext(None))
+    monkeypatch.setattr(fm, "upsert_monographs", lambda conn, rows: stored.extend(sig for sig, _ in rows))
+    monkeypatch.setattr(fm, "apply_rate_limits", lambda args: None)
+    ckpt = tmp_path / "ckpt"
+    fm.main(["--checkpoint", str(ckpt), "--since", "", *argv])
+    return stored, ckpt
+
+
+def test_checkpoint_removed_after_clean_run(monkeypatch, tmp_path):
+    stored, ckpt = _run(monkeypatch, tmp_path, {"1": {"t": 1}, "2": None})
+    assert stored == ["1"]
+    assert not ckpt.exists()
+
+
+def test_limited_run_keeps_ok_checkpoint_and_retries_misses(monkeypatch, tmp_path):
+    (tmp_path / "ckpt").write_text("9\tMISS\n")
+    stored, ckpt = _run(monkeypatch, tmp_path, {"1": {"t": 1}, "2": None, "9": {"t": 9}, "4": {"t": 4}}, ["--limit", "3"])
+    assert sorted(stored) == ["1", "9"]
+    assert fm.load_checkpoint(ckpt) == {"1", "9"}
+
+
+def test_since_compares_aware_utc():
+    since = fm.parse_since("7d")
+    assert since.tzinfo is not None
+    fresh = datetime.now(timezone(timedelta(hours=-8))) - timedelta(days=1)
+    stale = datetime.now(timezone.utc) - timedelta(days=8)
+    targets = fm.select_targets({"a": ["x"], "b": ["y"]}, {"a": fresh, "b": stale}, set(), False, since)
+    assert targets == [("b", ["y"])]
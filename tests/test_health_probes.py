@@ -0,0 +1,75 @@
+import time
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import metrics
+from app.health import HealthProber
+
+
+def _prober(db_ok=True):
+    calls = {"db": 0, "ext": 0}
+
+    def db():
+        calls["db"] += 1
+        if not db_ok:
+            raise OSError("connection refused")
+        return True
+
+    def ext():
+        calls["ext"] += 1
+        return True
+
+    p = HealthProber(stale_sec=30)
+    p.register("db", db, interval=60)
+    p.register("search", lambda: True, interval=60)
+    p.register("dailymed", ext, interval=60, critical=False)
+    return p, calls
+
+
+def test_endpoints_serve_cached_state(monkeypatch):
+    p, calls = _prober()
+    monkeypatch.setattr(main, "_health", p)
+    client = TestClient(main.app)
+    try:
+        assert client.get("/livez").json()["ok"] is True
+        assert calls["db"] == 0  # liveness never probes
+        assert client.get("/readyz").status_code == 200
+        for _ in range(20):
+            h = client.get("/health").json()
+        assert calls["db"] == 1  # one probe, many checks
+        assert h["ok"] is True and h["db"] is True and h["search_ok"] is True
+        deadline = time.time() + 2
+        while calls["ext"] == 0 and time.time() < deadline:  # externals are probed in the background
+            time.sleep(0.02)
+        assert client.get("/health").json()["external"] == {"dailymed": "ok"}
+    finally:
+        p.stop()
+
+
+def test_readyz_503_when_critical_component_down(monkeypatch):
+    metrics.reset()
+    p, _ = _prober(db_ok=False)
+    monkeypatch.setattr(main, "_health", p)
+    client = TestClient(main.app)
+    try:
+        r = client.get("/readyz")
+        assert r.status_code == 503
+        assert r.json()["reasons"] == ["db: down"]
+        assert client.get("/health").json()["db_error"].startswith("OSError")
+        text = metrics.render_prometheus()
+        assert 'health_component_up{component="db"} 0' in text
+        assert 'health_probe_seconds_count{component="db"} 1' in text
+    finally:
+        p.stop()
+
+
+def test_stale_probe_is_not_ready():
+    p, _ = _prober()
+    p.stale_sec = 0.05
+    p.probe("db")
+    p.probe("search")
+    assert p.ready()[0] is True
+    time.sleep(0.1)
+    ready, reasons = p.ready()
+    assert not ready and reasons[0].startswith("db: stale")
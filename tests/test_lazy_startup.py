@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import subprocess
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.health import HealthProber
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_import_does_not_load_heavy_subsystems():
+    code = (
+        "import sys, app.main as m\n"
+        "heavy = [x for x in ('langgraph', 'opensearchpy', 'lxml') if x in sys.modules]\n"
+        "print(heavy, m._SEARCH is None, m.get_monograph_service.__module__)\n"
+    )
+    env = dict(os.environ, SEARCH_BACKEND="os", OS_URL="http://127.0.0.1:1")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split("\n")[0] == "[] True app.monograph_service"
+
+
+def test_warm_up_runs_steps_concurrently_and_tolerates_failures(monkeypatch):
+    def slow():
+        time.sleep(0.3)
+
+    def broken():
+        raise RuntimeError("opensearch down")
+
+    monkeypatch.setattr(main, "_WARMUP_STEPS", {"a": slow, "b": slow, "c": slow, "bad": broken})
+    client_started = time.perf_counter()
+    with TestClient(main.app) as client:  # runs the lifespan
+        assert time.perf_counter() - client_started < 0.8
+        assert client.get("/livez").status_code == 200
+
+
+def test_warm_up_timeout_reports_unfinished_steps(monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(main, "_WARMUP_STEPS", {"fast": lambda: None, "slow": lambda: time.sleep(0.5)})
+    steps = asyncio.run(main.warm_up(timeout=0.1))
+    assert steps["fast"] is not None
+    assert steps["slow"] is None
+
+
+def test_shutdown_stops_prober_and_drains_writer(monkeypatch):
+    p = HealthProber()
+    p.register("db", lambda: True, interval=60)
+    p.register("search", lambda: True, interval=60)
+    closed = []
+    monkeypatch.setattr(main, "_health", p)
+    monkeypatch.setattr(main, "_WARMUP_STEPS", {"health": lambda: main._health.start()})
+    monkeypatch.setattr(main, "close_advise_log_writer", lambda: closed.append(True))
+    with TestClient(main.app) as client:
+        assert client.get("/readyz").status_code == 200
+    assert closed == [True]
+    assert p._stop.is_set()
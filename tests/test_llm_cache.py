@@ -0,0 +1,96 @@
+import threading, time
+import pytest
+import app.llm_service as llm
+
+ANSWER = (
+    "Amoxicillin treats bacterial infections.\n\n"
+    "Disclaimer: Educational information only, not medical advice."
+)
+
+
+def _svc(delay_ms=0, **kw):
+    return llm.CachedLLMService(llm._StubService(delay_ms=delay_ms), db_url=None, **kw)
+
+
+def test_second_rewrite_is_served_from_cache():
+    svc = _svc()
+    first = svc.rewrite(ANSWER)
+    assert first.startswith("In plain words:")
+    assert svc.rewrite(ANSWER) == first
+    assert svc.inner.calls == 1
+
+
+def test_key_covers_model_temperature_and_prompt_version(monkeypatch):
+    base = llm.rewrite_key(ANSWER, "m", 0.2)
+    assert base == llm.rewrite_key(ANSWER, "m", 0.2)
+    assert base != llm.rewrite_key(ANSWER, "m2", 0.2)
+    assert base != llm.rewrite_key(ANSWER, "m", 0.7)
+    monkeypatch.setattr(llm, "PROMPT_VERSION", "next")
+    assert base != llm.rewrite_key(ANSWER, "m", 0.2)
+
+
+def test_slow_provider_falls_back_and_is_not_cached():
+    svc = _svc(delay_ms=300, timeout_ms=50)
+    started = time.monotonic()
+    assert svc.rewrite(ANSWER) == ANSWER
+    assert time.monotonic() - started < 0.25
+    assert svc.cached(ANSWER) is None
+
+
+def test_concurrency_limiter_caps_outbound_calls():
+    svc = _svc(delay_ms=150, timeout_ms=1000, max_concurrency=1)
+    in_flight = {"n": 0, "max": 0}
+    lock = threading.Lock()
+    inner_rewrite = svc.inner.rewrite
+
+    def tracked(answer):
+        with lock:
+            in_flight["n"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["n"])
+        try:
+            return inner_rewrite(answer)
+        finally:
+            with lock:
+                in_flight["n"] -= 1
+
+    svc.inner.rewrite = tracked
+    threads = [threading.Thread(target=svc.rewrite, args=(f"{ANSWER} #{i}",)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert in_flight["max"] == 1
+
+
+def test_stream_timeout_raises_and_cache_hit_streams_whole_text():
+    slow = _svc(delay_ms=200, timeout_ms=50)
+    with pytest.raises(TimeoutError):
+        list(slow.stream_rewrite(ANSWER))
+    fast = _svc()
+    streamed = "".join(fast.stream_rewrite(ANSWER))
+    assert len(list(fast.stream_rewrite(ANSWER))) == 1
+    assert fast.cached(ANSWER) == streamed.strip()
+
+
+def test_slow_db_lookup_is_bounded_by_the_rewrite_budget():
+    svc = llm.CachedLLMService(llm._StubService(), db_url="postgresql://unused", timeout_ms=100)
+    svc._db_get = lambda key: time.sleep(0.5)
+    started = time.monotonic()
+    assert svc.rewrite(ANSWER) == ANSWER  # budget spent on the lookup: deterministic answer
+    assert time.monotonic() - started < 0.25
+
+
+def test_db_row_is_written_off_the_request_path():
+    svc = llm.CachedLLMService(llm._StubService(), db_url="postgresql://unused", timeout_ms=1000)
+    wrote = threading.Event()
+    svc._db_get = lambda key: None
+
+    def slow_put(key, out):
+        time.sleep(0.3)
+        wrote.set()
+
+    svc._db_put = slow_put
+    started = time.monotonic()
+    assert svc.rewrite(ANSWER).startswith("In plain words:")
+    assert time.monotonic() - started < 0.25
+    assert wrote.wait(2.0)
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import threading
+
+from app import rxnorm_client
+
+_spec = importlib.util.spec_from_file_location(
+    "map_signatures_for_refs",
+    os.path.join(os.path.dirname(__file__), "..", "scripts", "map_signatures_for_refs.py"),
+)
+refs = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(refs)
+
+
+def test_same_generic_at_different_strengths_is_one_group():
+    rows = [
+        (1, "Paracetamol"),
+        (2, "PARACETAMOL "),
+        (3, "Amoxicillin + Clavulanic Acid"),
+        (4, "Clavulanic acid, Amoxicillin"),
+        (5, ""),
+    ]
+    groups = refs.group_by_salts(rows)
+    assert sorted(groups.values()) == [[1, 2], [3, 4]]
+
+
+def test_each_distinct_salt_is_looked_up_once(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_lookup(term):
+        with lock:
+            calls.append(term)
+        return ({"Paracetamol": ["161"], "Amoxicillin": ["723"]}.get(term, []), None)
+
+    monkeypatch.setattr(rxnorm_client, "rxnorm_lookup", fake_lookup)
+    resolved = rxnorm_client.resolve_terms(["Paracetamol", "paracetamol", "Amoxicillin", "Unknownium"], workers=4)
+    assert sorted(calls) == ["Amoxicillin", "Paracetamol", "Unknownium"]
+    assert resolved["paracetamol"] == ["161"]
+    assert refs.signature_from(("Amoxicillin", "Paracetamol"), resolved) == "161-723"
+    assert refs.signature_from(("Unknownium",), resolved) is None
+
+
+def test_failed_lookup_counts_as_unresolved(monkeypatch):
+    def boom(term):
+        raise RuntimeError("rxnav down")
+
+    monkeypatch.setattr(rxnorm_client, "rxnorm_lookup", boom)
+    assert rxnorm_client.resolve_terms(["Paracetamol"]) == {"Paracetamol": []}
@@ -0,0 +1,31 @@
+from app.medline_client import extract_sections_from_html
+
+PAGE = """
+<html><body>
+<h3>On this page</h3><ul><li>Why is this medication prescribed?</li></ul>
+<h2>Why is this   medication prescribed?</h2>
+<p>Amoxicillin is used to   treat infections.</p><!-- note --><span>ignored</span>
+<ul><li>ear</li><li>throat</li></ul>
+<h2>How should this medicine be used?</h2><p>   </p>
+<h2>What special precautions should I follow?</h2><div>Tell your doctor.</div>
+<h3>What side effects can this medication cause?</h3><p>Nausea.</p>
+<h2>What is the side effect of overdose?</h2><p>Uses wins over side effects.</p>
+</body></html>
+"""
+
+
+def test_extract_sections_buckets_and_priority():
+    out = extract_sections_from_html(PAGE)
+    # later matching headings overwrite earlier ones; "what is" outranks "side effects"
+    assert out["uses"] == "Uses wins over side effects."
+    assert out["precautions"] == "Tell your doctor."
+    assert out["side_effects"] == "Nausea."
+    # headings without any text content are dropped
+    assert "how_to_take" not in out
+
+
+def test_extract_sections_joins_blocks():
+    out = extract_sections_from_html(
+        "<html><body><h2>Why is it prescribed?</h2><p>a  b</p><ul><li>c</li></ul><h2>x</h2><p>y</p></body></html>"
+    )
+    assert out == {"uses": "a b\nc"}
@@ -0,0 +1,52 @@
+import app.medline_client as mc
+
+XML_MATCH = b"""<?xml version="1.0" encoding="UTF-8"?>
+<nlmSearchResult><list num="2">
+  <document rank="0" url="https://medlineplus.gov/infectiousmononucleosis.html">
+    <content name="title">Infectious Mononucleosis</content>
+  </document>
+  <document rank="1" url="https://medlineplus.gov/druginfo/meds/a685001.html">
+    <content name="title">Amoxicillin</content><content name="FullSummary">long text</content>
+  </document>
+</list></nlmSearchResult>"""
+XML_OTHER = b"""<nlmSearchResult><list num="1">
+  <document url="https://medlineplus.gov/antibiotics.html"><content name="title">Antibiotics</content></document>
+</list></nlmSearchResult>"""
+XML_EMPTY = b"<nlmSearchResult><list num='0'/></nlmSearchResult>"
+
+
+class _Resp:
+    def __init__(self, content):
+        self.content = content
+
+
+def _setup(monkeypatch, by_query):
+    calls = []
+
+    def fake_get(url, params=None, **kw):
+        calls.append(params["term"])
+        return _Resp(by_query.get(params["term"], XML_EMPTY))
+
+    monkeypatch.setenv("NO_EXTERNAL", "0")
+    monkeypatch.setattr(mc, "http_get", fake_get)
+    monkeypatch.setattr(mc, "_neg_mem", {})
+    stored = []
+    monkeypatch.setattr(mc, "negative_cache_put", lambda t, reason="no_topic": stored.append(t))
+    monkeypatch.setattr(mc, "negative_cache_hit", lambda t: t in stored)
+    return calls, stored
+
+
+def test_title_match_outranks_earlier_url_only_hit(monkeypatch):
+    _setup(monkeypatch, {"amoxicillin": XML_OTHER, "amoxicillin tablet": XML_MATCH})
+    title, url, raw = mc.medline_search("amoxicillin")
+    assert (title, url) == ("Amoxicillin", "https://medlineplus.gov/druginfo/meds/a685001.html")
+    assert raw["query"] == "amoxicillin tablet"
+
+
+def test_definitive_miss_goes_to_negative_cache(monkeypatch):
+    calls, stored = _setup(monkeypatch, {})
+    assert mc.medline_search("unknownium")[1] is None
+    assert stored == ["unknownium"] and len(calls) == 4
+    # second lookup is answered by the negative cache without any HTTP call
+    assert mc.medline_search("Unknownium")[1] is None
+    assert len(calls) == 4
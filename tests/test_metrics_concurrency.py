@@ -0,0 +1,72 @@
+import os, subprocess, sys, threading
+import pytest
+from app import metrics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_no_increments_lost_across_threads():
+    metrics.reset()
+    n_threads, per_thread = 8, 20000
+    barrier = threading.Barrier(n_threads)
+
+    def work():
+        barrier.wait()
+        for _ in range(per_thread):
+            metrics.inc("race_total", {"k": "v"})
+            metrics.observe("race_seconds", 0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out = metrics.render_prometheus()  # also folds the finished threads' shards
+    assert f'race_total{{k="v"}} {n_threads * per_thread}' in out
+    assert f"race_seconds_count {n_threads * per_thread}" in out
+    assert f'race_total{{k="v"}} {n_threads * per_thread}' in metrics.render_prometheus()
+
+
+def test_multiprocess_files_are_aggregated(tmp_path, monkeypatch):
+    env = dict(os.environ, METRICS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=ROOT)
+    child = (
+        "from app import metrics\n"
+        "metrics.inc('jobs_total', {'src': 'w'}, 5)\n"
+        "metrics.observe('job_seconds', 0.2)\n"
+        "metrics.set_gauge('workers_busy', 1)\n"
+        "metrics.flush_to_file()\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", child], env=env, check=True, cwd=ROOT)
+    assert len(list(tmp_path.glob("metrics_*.db"))) == 2
+
+    metrics.reset()
+    monkeypatch.setattr(metrics, "MULTIPROC_DIR", str(tmp_path))
+    metrics.inc("jobs_total", {"src": "w"}, 1)
+    out = metrics.render_prometheus()
+    assert 'jobs_total{src="w"} 11' in out
+    assert 'job_seconds_bucket{le="0.25"} 2' in out
+    assert "workers_busy" not in out  # both writers exited: their gauges no longer count
+
+
+def test_multiprocess_gauges_merge_by_mode(tmp_path, monkeypatch):
+    env = dict(os.environ, METRICS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=ROOT)
+    for up, warmup, busy in ((1.0, 0.5, 1), (0.0, 1.5, 2)):
+        child = (
+            "from app import metrics\n"
+            f"metrics.set_gauge('health_component_up', {up}, {{'component': 'db'}}, merge='min')\n"
+            f"metrics.set_gauge('startup_warmup_total_seconds', {warmup}, merge='max')\n"
+            f"metrics.set_gauge('workers_busy', {busy})\n"
+            "metrics.flush_to_file()\n"
+        )
+        subprocess.run([sys.executable, "-c", child], env=env, check=True, cwd=ROOT)
+
+    metrics.reset()
+    monkeypatch.setattr(metrics, "MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_pid_alive", lambda pid: True)  # treat both writers as live workers
+    out = metrics.render_prometheus()
+    assert 'health_component_up{component="db"} 0' in out
+    assert "startup_warmup_total_seconds 1.5" in out
+    assert "workers_busy 3" in out
+    with pytest.raises(ValueError):
+        metrics.set_gauge("g", 1, merge="avg")
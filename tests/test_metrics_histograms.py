@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+from app import metrics
+from app.main import app
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics.reset()
+    for v in (0.003, 0.04, 0.04, 7.0):
+        metrics.observe("stage_seconds", v, {"stage": "db"})
+    out = metrics.render_prometheus()
+    assert "# TYPE stage_seconds histogram" in out
+    assert 'stage_seconds_bucket{stage="db",le="0.005"} 1' in out
+    assert 'stage_seconds_bucket{stage="db",le="0.05"} 3' in out
+    assert 'stage_seconds_bucket{stage="db",le="10.0"} 4' in out
+    assert 'stage_seconds_bucket{stage="db",le="+Inf"} 4' in out
+    assert 'stage_seconds_count{stage="db"} 4' in out
+
+
+def test_timer_decorator_and_gauges():
+    metrics.reset()
+
+    @metrics.timer("work_seconds", {"kind": "unit"})
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4
+    with metrics.timer("work_seconds", {"kind": "unit"}):
+        pass
+    metrics.set_gauge("queue_depth", 3)
+    metrics.inc_gauge("queue_depth", -1)
+    out = metrics.render_prometheus()
+    assert 'work_seconds_count{kind="unit"} 2' in out
+    assert "queue_depth 2" in out
+
+
+def test_handlers_are_timed_by_route_template():
+    metrics.reset()
+    client = TestClient(app)
+    client.get("/metrics")
+    out = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/metrics",status="200"} 1' in out
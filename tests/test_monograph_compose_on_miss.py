@@ -0,0 +1,79 @@
+from concurrent.futures import Future
+from fastapi.testclient import TestClient
+from app.main import app
+import app.main as m
+import app.monograph_service as ms
+
+
+class _InlinePool:
+    def submit(self, fn, *args):
+        fut = Future()
+        fut.set_result(fn(*args))
+        return fut
+
+
+def test_miss_composes_from_cache_and_persists(monkeypatch):
+    persisted = []
+    doc = {"title": "Amoxicillin", "sources": ["u"], "sections": {"uses": "x", "precautions": ["p"], "side_effects": ["s"]}}
+    monkeypatch.setattr(m, "get_monograph_by_signature", lambda sig: None)
+    monkeypatch.setattr(m, "salts_by_signature", lambda sig: [{"salt_pos": 1, "salt_name": "Amoxicillin"}])
+    monkeypatch.setattr(ms, "compose_from_cache", lambda ings: (doc, True))
+    monkeypatch.setattr(ms, "persist_monograph_async", lambda sig, d: persisted.append(sig))
+    r = TestClient(app).get("/monograph?signature=sig1")
+    assert r.status_code == 200
+    assert r.json()["title"] == "Amoxicillin"
+    assert persisted == ["sig1"]
+
+
+def test_miss_needing_upstream_returns_202(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(m, "get_monograph_by_signature", lambda sig: None)
+    monkeypatch.setattr(m, "salts_by_signature", lambda sig: [{"salt_pos": 1, "salt_name": "Unknownium"}])
+    monkeypatch.setattr(ms, "NO_EXTERNAL", False)
+    monkeypatch.setattr(ms, "compose_from_cache", lambda ings: (None, False))
+    monkeypatch.setattr(ms, "_compose_and_persist", lambda sig, ings: scheduled.append(sig))
+    monkeypatch.setattr(ms, "_INFLIGHT", {})
+    monkeypatch.setattr(ms, "_COMPOSE_POOL", _InlinePool())
+    r = TestClient(app).get("/monograph?signature=sig2")
+    assert r.status_code == 202
+    assert r.headers["Retry-After"] == str(m.MONOGRAPH_RETRY_AFTER_SEC)
+    assert scheduled == ["sig2"]
+
+
+def test_upstream_miss_is_remembered_as_404(monkeypatch):
+    composed = []
+
+    def compose(ings):
+        composed.append(ings)
+        return None
+
+    monkeypatch.setattr(m, "get_monograph_by_signature", lambda sig: None)
+    monkeypatch.setattr(m, "salts_by_signature", lambda sig: [{"salt_pos": 1, "salt_name": "Unknownium"}])
+    monkeypatch.setattr(ms, "NO_EXTERNAL", False)
+    monkeypatch.setattr(ms, "compose_from_cache", lambda ings: (None, False))
+    monkeypatch.setattr(ms, "compose_for_signature", compose)
+    monkeypatch.setattr(ms, "_INFLIGHT", {})
+    monkeypatch.setattr(ms, "_MISSES", {})
+    monkeypatch.setattr(ms, "_COMPOSE_POOL", _InlinePool())
+    client = TestClient(app)
+    assert client.get("/monograph?signature=sig3").status_code == 202
+    assert client.get("/monograph?signature=sig3").status_code == 404
+    assert len(composed) == 1
+    monkeypatch.setitem(ms._MISSES, "sig3", 0.0)  # expired: upstream is tried again
+    assert client.get("/monograph?signature=sig3").status_code == 202
+    assert len(composed) == 2
+
+
+def test_caller_with_time_left_gets_the_upstream_compose(monkeypatch):
+    doc = {"title": "Unknownium", "sources": ["u"], "sections": {"uses": "x"}}
+    persisted = []
+    monkeypatch.setattr(ms, "NO_EXTERNAL", False)
+    monkeypatch.setattr(ms, "compose_from_cache", lambda ings: (None, False))
+    monkeypatch.setattr(ms, "compose_for_signature", lambda ings: doc)
+    monkeypatch.setattr(ms, "_persist", lambda sig, d: persisted.append(sig))
+    monkeypatch.setattr(ms, "_INFLIGHT", {})
+    monkeypatch.setattr(ms, "_MISSES", {})
+    monkeypatch.setattr(ms, "_COMPOSE_POOL", _InlinePool())
+    assert ms.compose_on_miss("sig4", ["Unknownium"], 0.3, wait_s=2.0) == (doc, "composed")
+    assert persisted == ["sig4"] and ms._INFLIGHT == {}
+    assert ms.compose_on_miss("sig5", ["Unknownium"], 0.3) == (None, "pending")  # /monograph does not wait
@@ -0,0 +1,54 @@
+import time
+from fastapi.testclient import TestClient
+from app import metrics, profiling
+import app.main as m
+
+TOKEN = "t0ken"
+
+
+def _fake_advise(sig, name, intent, red_flag=False):
+    with profiling.stage("advise.salts"):
+        time.sleep(0.01)
+    metrics.observe("external_request_seconds", 0.02, {"source": "dailymed"})
+    metrics.cache_hit("medline", layer="db")
+    metrics.cache_miss("openfda")
+    return {"answer": "ok", "signature": sig}
+
+
+def _client(monkeypatch, sample_rate=0.0):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", sample_rate)
+    monkeypatch.setattr(m, "advise_for", _fake_advise)
+    return TestClient(m.app)
+
+
+def test_profiled_request_returns_breakdown_and_server_timing(monkeypatch):
+    r = _client(monkeypatch).get("/advise?signature=s1&query=uses", headers={"X-Profile": "1", "X-Admin-Token": TOKEN})
+    assert r.status_code == 200
+    prof = r.json()["_profile"]
+    assert prof["stages"]["advise.salts"]["ms"] >= 10
+    assert prof["external"]["dailymed"]["count"] == 1
+    assert prof["cache"] == {"hits": {"medline/db": 1}, "misses": {"openfda": 1}}
+    timing = r.headers["server-timing"]
+    assert "advise.salts;dur=" in timing and "ext_dailymed;dur=20.0" in timing and "total;dur=" in timing
+
+
+def test_profiling_requires_admin_token(monkeypatch):
+    client = _client(monkeypatch)
+    for headers in ({"X-Profile": "1"}, {"X-Profile": "1", "X-Admin-Token": "wrong"}):
+        r = client.get("/advise?signature=s1", headers=headers)
+        assert "_profile" not in r.json() and "server-timing" not in r.headers
+    assert client.get("/admin/profiles/slowest").status_code == 403
+
+
+def test_sampling_keeps_slowest_requests(monkeypatch):
+    profiling.reset_samples()
+    monkeypatch.setattr(profiling, "SLOWEST_N", 2)
+    client = _client(monkeypatch, sample_rate=1.0)
+    for i in range(3):
+        r = client.get(f"/advise?signature=s{i}")
+        assert "_profile" not in r.json()  # sampled requests are not altered
+    out = client.get("/admin/profiles/slowest", headers={"X-Admin-Token": TOKEN}).json()
+    assert len(out["requests"]) == 2
+    assert out["requests"][0]["total_ms"] >= out["requests"][1]["total_ms"]
+    assert "advise.salts" in out["requests"][0]["profile"]["stages"]
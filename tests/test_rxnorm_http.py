@@ -0,0 +1,52 @@
+import pytest
+import requests
+
+from app import rxnorm_client
+
+
+class _Resp:
+    def __init__(self, status):
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code), response=self)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    log = {"get": [], "sleep": [], "wait": 0}
+
+    class _Limiter:
+        def wait(self):
+            log["wait"] += 1
+
+    monkeypatch.setattr(rxnorm_client, "_limiter", _Limiter())
+    monkeypatch.setattr(rxnorm_client.time, "sleep", lambda s: log["sleep"].append(s))
+    return log
+
+
+def _responses(monkeypatch, calls, statuses):
+    it = iter(statuses)
+
+    def fake_get(url, params=None, timeout=None):
+        calls["get"].append(url)
+        return _Resp(next(it))
+
+    monkeypatch.setattr(rxnorm_client.requests, "get", fake_get)
+
+
+def test_429_is_not_retried(monkeypatch, calls):
+    _responses(monkeypatch, calls, [429, 200])
+    with pytest.raises(requests.HTTPError):
+        rxnorm_client.http_get("u", {})
+    assert len(calls["get"]) == 1
+    assert calls["sleep"] == []
+
+
+def test_5xx_retries_back_off_and_go_through_limiter(monkeypatch, calls):
+    _responses(monkeypatch, calls, [503, 502, 200])
+    assert rxnorm_client.http_get("u", {}, pause=1.0).status_code == 200
+    assert calls["wait"] == 3
+    assert len(calls["sleep"]) == 2
+    assert 1.0 <= calls["sleep"][0] < calls["sleep"][1]
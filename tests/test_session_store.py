@@ -0,0 +1,67 @@
+import app.session_store as ss
+
+
+def test_lru_bound_evicts_least_recent():
+    store = ss.MemorySessionStore(ttl_sec=60, max_sessions=2)
+    store.update("a", last_brand="A")
+    store.update("b", last_brand="B")
+    store.get("a")  # touch: b is now least recent
+    store.update("c", last_brand="C")
+    assert len(store) == 2
+    assert store.get("b")["last_brand"] is None
+    assert store.get("a")["last_brand"] == "A"
+
+
+def test_idle_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ss.time, "time", lambda: now[0])
+    store = ss.MemorySessionStore(ttl_sec=10, max_sessions=10)
+    store.update("s", last_signature="sig")
+    now[0] += 5
+    assert store.get("s")["last_signature"] == "sig"  # refreshes idle timer
+    now[0] += 9
+    assert store.get("s")["last_signature"] == "sig"
+    now[0] += 11
+    assert store.get("s") == ss.EMPTY_SESSION
+
+
+class _FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, params):
+        self.rows.append(list(params))
+
+
+def test_pg_store_batches_writes_and_reads_through(monkeypatch):
+    batches = []
+    monkeypatch.setattr(ss.psycopg, "connect", lambda *a, **k: _FakeConn(batches))
+    store = ss.PgSessionStore(db_url="unused", start_flusher=False)
+    persisted = {}
+    monkeypatch.setattr(store, "_load", lambda sid: persisted.get(sid))
+
+    store.update("s1", last_brand="Augmentin")
+    store.update("s1", last_signature="sig-1")
+    store.update("s2", last_brand="Crocin")
+    assert store.get("s1")["last_signature"] == "sig-1"
+    assert batches == []  # nothing written on the turn path
+
+    assert store.flush() == 2
+    assert len(batches) == 1 and {row[0] for row in batches[0]} == {"s1", "s2"}
+    assert store.flush() == 0
+
+    # another worker with an empty local cache reads the persisted session
+    persisted["s1"] = (0.0, {**ss.EMPTY_SESSION, "last_brand": "Augmentin", "last_signature": "sig-1"})
+    other = ss.PgSessionStore(db_url="unused", start_flusher=False)
+    monkeypatch.setattr(other, "_load", lambda sid: persisted.get(sid))
+    monkeypatch.setattr(ss.time, "time", lambda: 1.0)
+    assert other.get("s1")["last_signature"] == "sig-1"
@@ -0,0 +1,125 @@
+import os
+
+import psycopg
+import pytest
+
+import app.main as main
+from app import dbio
+
+
+class _FakeConn:
+    """Enough of a psycopg connection for the lookup paths (no DB)."""
+
+    def __init__(self, salts=None, missing_table=False):
+        self.salts = salts
+        self.missing_table = missing_table
+        self.queries = []
+        self.rolled_back = False
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        if self.missing_table:
+            raise psycopg.errors.UndefinedTable('relation "signatures" does not exist')
+        return self
+
+    def fetchone(self):
+        return (self.salts,) if self.salts is not None else None
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def cursor(self):
+        raise AssertionError("join fallback should not run")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_salts_by_signature_uses_pk_lookup(monkeypatch):
+    salts = [{"salt_pos": 1, "salt_name": "Amoxicillin"}, {"salt_pos": 2, "salt_name": "Clavulanic Acid"}]
+    conn = _FakeConn(salts=salts)
+    monkeypatch.setattr(main, "db", lambda: conn)
+    assert main.salts_by_signature("723-21216") == salts
+    assert conn.queries == ["SELECT salts FROM signatures WHERE salt_signature=%s"]
+
+
+def test_signature_salts_miss_and_missing_table():
+    assert dbio.signature_salts(_FakeConn(salts=None), "x") is None
+    conn = _FakeConn(missing_table=True)
+    assert dbio.signature_salts(conn, "x") is None
+    assert conn.rolled_back  # connection usable for the join fallback
+
+
+def test_refresh_signatures_empty_scope_is_noop():
+    assert dbio.refresh_signatures(object(), ["", None]) == (0, 0)
+
+
+def test_refresh_sql_scopes_both_aggregates():
+    sql = dbio._REFRESH_SIGNATURES_SQL.format(scope="AND p.salt_signature = ANY(%(sigs)s)")
+    assert sql.count("ANY(%(sigs)s)") == 2
+    assert "IS DISTINCT FROM" in sql  # unchanged rows are not rewritten
+
+
+class _JoinConn(_FakeConn):
+    """Signatures miss; the join fallback returns raw per-product rows."""
+
+    def __init__(self, rows):
+        super().__init__(salts=None)
+        self.rows = rows
+
+    def cursor(self):
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_get_salts_fallback_matches_signatures_row_shape(monkeypatch):
+    rows = [("Amoxicillin", 1), ("amoxicillin ", 1), ("Amoxicillin", 2), ("Clavulanic  Acid", 2)]
+    monkeypatch.setattr(dbio, "db", lambda: _JoinConn(rows))
+    assert dbio.get_salts("723-21216") == [
+        {"salt_pos": 1, "salt_name": "Amoxicillin"},
+        {"salt_pos": 2, "salt_name": "Clavulanic Acid"},
+    ]
+
+
+def _connect():
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return psycopg.connect(url, connect_timeout=3)
+    return psycopg.connect(
+        host=os.getenv("DB_HOST", "localhost"), port=os.getenv("DB_PORT", "5432"),
+        dbname=os.getenv("DB_NAME", "medbot"), user=os.getenv("DB_USER", "appuser"),
+        password=os.getenv("DB_PASS", "apppass"), connect_timeout=3,
+    )
+
+
+@pytest.mark.integration
+def test_refresh_sql_dedups_reordered_combos_like_python():
+    try:
+        cx = _connect()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"database not reachable: {e}")
+    # Temp tables shadow the real ones (pg_temp comes first on search_path); rolled back below
+    salt_rows = [(1, "Paracetamol", 1), (1, "Caffeine", 2), (2, "caffeine ", 1), (2, "PARACETAMOL", 2), (3, "Caffeine", 1)]
+    with cx:
+        cx.execute("CREATE TEMP TABLE products_in (id INT, salt_signature TEXT, rxcuis TEXT[], mrp_inr NUMERIC)")
+        cx.execute("CREATE TEMP TABLE product_salts (product_id INT, salt_name TEXT, salt_pos SMALLINT)")
+        cx.execute(
+            "CREATE TEMP TABLE signatures (salt_signature TEXT PRIMARY KEY, salts JSONB NOT NULL, rxcuis TEXT[], "
+            "product_count INT NOT NULL, min_mrp NUMERIC, median_mrp NUMERIC, max_mrp NUMERIC, updated_at TIMESTAMPTZ)"
+        )
+        cx.execute("INSERT INTO products_in VALUES (1, '161-1886', NULL, 10), (2, '161-1886', NULL, 12), (3, '161-1886', NULL, 9)")
+        with cx.cursor() as cur:
+            cur.executemany("INSERT INTO product_salts VALUES (%s, %s, %s)", salt_rows)
+        cx.execute(dbio._REFRESH_SIGNATURES_SQL.format(scope=""))
+        got = cx.execute("SELECT salts FROM signatures WHERE salt_signature='161-1886'").fetchone()[0]
+        cx.rollback()
+    ordered = sorted(((name, pos) for _, name, pos in salt_rows), key=lambda r: (r[1], r[0]))
+    assert got == dbio.dedup_salt_rows(ordered) == [
+        {"salt_pos": 1, "salt_name": "Caffeine"},
+        {"salt_pos": 1, "salt_name": "Paracetamol"},
+    ]